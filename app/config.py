@@ -64,6 +64,21 @@ class LLMSettings(BaseSettings):
     default_provider: LLMProvider = Field(default=LLMProvider.MOCK, env="LLM_PROVIDER")
     temperature: float = Field(default=0.3, env="LLM_TEMPERATURE")
     max_tokens: int = Field(default=4096, env="LLM_MAX_TOKENS")
+    timeout: int = Field(default=60, env="LLM_TIMEOUT")  # read timeout per request, seconds
+    pool_maxsize: int = Field(default=16, env="LLM_POOL_SIZE")  # keep-alive connections per provider
+    
+    # Response cache: in-memory LRU plus optional SQLite file; only temperature 0 calls
+    # are cached unless cache_sampled is set
+    cache_size: int = Field(default=256, env="LLM_CACHE_SIZE")  # 0 = no in-memory tier
+    cache_ttl: float = Field(default=86400.0, env="LLM_CACHE_TTL")  # seconds, 0 = no expiry
+    cache_path: str = Field(default="", env="LLM_CACHE_PATH")
+    cache_sampled: bool = Field(default=False, env="LLM_CACHE_SAMPLED")
+    
+    # Routing: comma-separated providers tried after default_provider when it is slow or down
+    fallback_providers: str = Field(default="", env="LLM_FALLBACK_PROVIDERS")
+    hedge_after_ms: float = Field(default=0.0, env="LLM_HEDGE_AFTER_MS")  # 0 = no hedging
+    breaker_failures: int = Field(default=3, env="LLM_BREAKER_FAILURES")
+    breaker_cooldown: float = Field(default=30.0, env="LLM_BREAKER_COOLDOWN")  # seconds
     
     # API Keys for various providers
     groq_api_key: str = Field(default="", env="GROQ_API_KEY")
@@ -98,10 +113,38 @@ class RAGSettings(BaseSettings):
     
     chunk_size: int = Field(default=1000, env="RAG_CHUNK_SIZE")
     chunk_overlap: int = Field(default=200, env="RAG_CHUNK_OVERLAP")
+    chunk_unit: str = Field(default="chars", env="RAG_CHUNK_UNIT")  # "chars" or "tokens" for size and overlap
     embedding_model: str = Field(default="all-MiniLM-L6-v2", env="RAG_EMBEDDING_MODEL")
     top_k_results: int = Field(default=5, env="RAG_TOP_K")
     similarity_threshold: float = Field(default=0.7, env="RAG_SIMILARITY_THRESHOLD")
     use_hybrid_search: bool = Field(default=True, env="RAG_HYBRID_SEARCH")
+    hybrid_fusion: str = Field(default="rrf", env="RAG_HYBRID_FUSION")  # "rrf" or "linear"
+    query_cache_size: int = Field(default=512, env="RAG_QUERY_CACHE_SIZE")  # 0 = disabled
+    query_cache_ttl: float = Field(default=300.0, env="RAG_QUERY_CACHE_TTL")  # seconds, 0 = no expiry
+    persist_directory: str = Field(default="", env="RAG_PERSIST_DIR")
+    embedding_cache_path: str = Field(default="", env="RAG_EMBEDDING_CACHE")
+    
+    # Vector index: "flat" (exact) or "ivf" (approximate, for very large corpora)
+    vector_index: str = Field(default="flat", env="RAG_VECTOR_INDEX")
+    ivf_nlist: int = Field(default=0, env="RAG_IVF_NLIST")  # 0 = sqrt(number of chunks)
+    ivf_nprobe: int = Field(default=8, env="RAG_IVF_NPROBE")
+    ivf_min_train_size: int = Field(default=1024, env="RAG_IVF_MIN_TRAIN_SIZE")
+    
+    # In-memory vector storage: "float32", "float16" or "int8"; rerank_factor > 0 re-scores
+    # the top_k * rerank_factor candidates in float32 (keeps a float32 copy)
+    vector_quantization: str = Field(default="float32", env="RAG_VECTOR_QUANTIZATION")
+    rerank_factor: int = Field(default=0, env="RAG_RERANK_FACTOR")
+    
+    # Token budget for generated LLM context (0 = no limit)
+    context_max_tokens: int = Field(default=0, env="RAG_CONTEXT_MAX_TOKENS")
+    
+    # Chunks at least this similar (word-shingle Jaccard) to a stored chunk are aliased to it (0 = off, e.g. 0.9)
+    dedup_threshold: float = Field(default=0.0, env="RAG_DEDUP_THRESHOLD")
+    
+    # Optional cross-encoder re-ranking of the top candidates (empty model = off)
+    cross_encoder_model: str = Field(default="", env="RAG_CROSS_ENCODER_MODEL")
+    rerank_candidates: int = Field(default=20, env="RAG_RERANK_CANDIDATES")
+    rerank_budget_ms: float = Field(default=250.0, env="RAG_RERANK_BUDGET_MS")  # 0 = no limit
     
     class Config:
         env_file = ".env"
@@ -6,11 +6,39 @@ Supports: Groq, Together AI, OpenRouter, Google AI, Ollama, Anthropic, OpenAI
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import Optional, Dict, Any, List, Generator, Callable
+from typing import Optional, Dict, Any, List, Generator, Callable, AsyncIterator, Sequence, Tuple, Union
 from enum import Enum
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import asyncio
 import logging
-import json
+import math
 import os
+import statistics
+import time
+
+from .response_cache import LLMResponseCache, response_key
+from .routing import ProviderHealth, rate_limit_retry_after
+from .streaming import (
+    NDJSON,
+    SSE,
+    StreamDelta,
+    StreamMeter,
+    StreamParser,
+    StreamStats,
+    iter_events,
+    openai_stream_delta,
+    raise_stream_error
+)
+from .transport import (
+    AsyncHTTPTransport,
+    HTTPTransport,
+    aclose_transports,
+    close_transports,
+    get_async_transport,
+    get_transport,
+    provider_semaphore,
+    run_sync
+)
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +65,8 @@ class LLMConfig:
     temperature: float = 0.3
     max_tokens: int = 4096
     timeout: int = 60
+    # Keep-alive connections per provider endpoint (shared by all clients of that provider)
+    pool_maxsize: int = 16
     
     # Provider-specific defaults
     DEFAULT_MODELS: Dict[LLMProvider, str] = field(default_factory=lambda: {
@@ -114,11 +144,45 @@ class LLMStrategy(ABC):
         messages: List[Message],
         temperature: float = 0.3,
         max_tokens: int = 4096,
+        include_stats: bool = False,
         **kwargs
-    ) -> Generator[str, None, None]:
-        """Stream response (default implementation uses non-streaming)"""
+    ) -> Generator[Union[str, StreamStats], None, None]:
+        """
+        Stream response text (default implementation uses non-streaming)
+        With include_stats, a StreamStats event follows the last text.
+        """
+        meter = StreamMeter(self.provider_name, getattr(self, "model", ""))
         response = self.generate(messages, temperature, max_tokens, **kwargs)
+        meter.update(StreamDelta(response.content, response.tokens_used or None, response.finish_reason))
         yield response.content
+        if include_stats:
+            yield meter.stats()
+    
+    async def agenerate(
+        self,
+        messages: List[Message],
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+        **kwargs
+    ) -> LLMResponse:
+        """Generate without blocking the event loop (default runs generate in a worker thread)"""
+        return await asyncio.to_thread(self.generate, messages, temperature, max_tokens, **kwargs)
+    
+    async def astream(
+        self,
+        messages: List[Message],
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+        include_stats: bool = False,
+        **kwargs
+    ) -> AsyncIterator[Union[str, StreamStats]]:
+        """Async stream (default implementation uses non-streaming)"""
+        meter = StreamMeter(self.provider_name, getattr(self, "model", ""))
+        response = await self.agenerate(messages, temperature, max_tokens, **kwargs)
+        meter.update(StreamDelta(response.content, response.tokens_used or None, response.finish_reason))
+        yield response.content
+        if include_stats:
+            yield meter.stats()
     
     def simple_generate(
         self,
@@ -134,10 +198,160 @@ class LLMStrategy(ABC):
         return self.generate(messages, **kwargs)
 
 
-class GroqStrategy(LLMStrategy):
+class HTTPStrategy(LLMStrategy):
+    """
+    Base for providers called over HTTP
+    Subclasses describe a request (_build_request) and read its response
+    (_parse_response); generate/agenerate send it through the endpoint's
+    shared pooled transport, sync or async, with the configured timeout as
+    read timeout. Providers with STREAMING stream over SSE or NDJSON
+    (STREAM_FORMAT); the shared StreamParser decodes events as bytes arrive
+    and _parse_stream_event reads each one (OpenAI chunk format by default).
+    """
+    
+    STREAMING = False
+    STREAM_FORMAT = SSE
+    
+    base_url: str = ""
+    timeout: float = 60
+    pool_maxsize: Optional[int] = None
+    transport: HTTPTransport
+    
+    def _setup_transport(self, base_url: str, timeout: float, pool_maxsize: Optional[int]):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.pool_maxsize = pool_maxsize
+        self.transport = get_transport(self.base_url, pool_maxsize=pool_maxsize)
+    
+    @property
+    def async_transport(self) -> AsyncHTTPTransport:
+        """Async transport for the running event loop"""
+        return get_async_transport(self.base_url, self.pool_maxsize)
+    
+    def _post(self, path: str, **kwargs):
+        return self.transport.post(f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+    
+    @abstractmethod
+    def _build_request(
+        self,
+        messages: List[Message],
+        temperature: float,
+        max_tokens: int,
+        stream: bool = False
+    ) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        """(path, headers, JSON body) of a generation request"""
+        pass
+    
+    @abstractmethod
+    def _parse_response(self, result: Dict[str, Any], latency_ms: float) -> LLMResponse:
+        pass
+    
+    def _parse_stream_event(self, event: Dict[str, Any]) -> StreamDelta:
+        """Text, usage and finish reason carried by one stream event"""
+        return openai_stream_delta(event)
+    
+    def _stream_delta(self, event: Dict[str, Any]) -> StreamDelta:
+        raise_stream_error(self.provider_name, event)
+        return self._parse_stream_event(event)
+    
+    def generate(
+        self,
+        messages: List[Message],
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+        **kwargs
+    ) -> LLMResponse:
+        start_time = time.time()
+        path, headers, data = self._build_request(messages, temperature, max_tokens)
+        
+        response = self._post(path, headers=headers, json=data)
+        response.raise_for_status()
+        result = response.json()
+        
+        return self._parse_response(result, (time.time() - start_time) * 1000)
+    
+    def stream(
+        self,
+        messages: List[Message],
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+        include_stats: bool = False,
+        **kwargs
+    ) -> Generator[Union[str, StreamStats], None, None]:
+        if not self.STREAMING:
+            yield from super().stream(messages, temperature, max_tokens, include_stats, **kwargs)
+            return
+        
+        meter = StreamMeter(self.provider_name, self.model)
+        parser = StreamParser(self.STREAM_FORMAT)
+        path, headers, data = self._build_request(messages, temperature, max_tokens, stream=True)
+        # Closing the response returns its connection to the pool
+        with self._post(path, headers=headers, json=data, stream=True) as response:
+            response.raise_for_status()
+            for event in iter_events(parser, response.iter_content(chunk_size=None)):
+                text = meter.update(self._stream_delta(event))
+                if text:
+                    yield text
+        if include_stats:
+            yield meter.stats()
+    
+    async def agenerate(
+        self,
+        messages: List[Message],
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+        **kwargs
+    ) -> LLMResponse:
+        start_time = time.time()
+        path, headers, data = self._build_request(messages, temperature, max_tokens)
+        
+        response = await self.async_transport.post(
+            f"{self.base_url}{path}", timeout=self.timeout, headers=headers, json=data
+        )
+        response.raise_for_status()
+        
+        return self._parse_response(response.json(), (time.time() - start_time) * 1000)
+    
+    async def astream(
+        self,
+        messages: List[Message],
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+        include_stats: bool = False,
+        **kwargs
+    ) -> AsyncIterator[Union[str, StreamStats]]:
+        if not self.STREAMING:
+            async for text in super().astream(messages, temperature, max_tokens, include_stats, **kwargs):
+                yield text
+            return
+        
+        meter = StreamMeter(self.provider_name, self.model)
+        parser = StreamParser(self.STREAM_FORMAT)
+        path, headers, data = self._build_request(messages, temperature, max_tokens, stream=True)
+        async with self.async_transport.stream(
+            "POST", f"{self.base_url}{path}", timeout=self.timeout, headers=headers, json=data
+        ) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                for event in parser.feed(chunk):
+                    text = meter.update(self._stream_delta(event))
+                    if text:
+                        yield text
+                if parser.done:
+                    break
+            for event in parser.close():
+                text = meter.update(self._stream_delta(event))
+                if text:
+                    yield text
+        if include_stats:
+            yield meter.stats()
+
+
+class GroqStrategy(HTTPStrategy):
     """Groq LLM Strategy - FASTEST FREE API"""
     
     BASE_URL = "https://api.groq.com/openai/v1"
+    STREAMING = True
     
     MODELS = [
         "llama-3.3-70b-versatile",
@@ -147,9 +361,16 @@ class GroqStrategy(LLMStrategy):
         "gemma2-9b-it"
     ]
     
-    def __init__(self, api_key: str, model: str = "llama-3.3-70b-versatile"):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "llama-3.3-70b-versatile",
+        timeout: float = 60,
+        pool_maxsize: Optional[int] = None
+    ):
         self.api_key = api_key
         self.model = model
+        self._setup_transport(self.BASE_URL, timeout, pool_maxsize)
     
     @property
     def provider_name(self) -> str:
@@ -159,18 +380,13 @@ class GroqStrategy(LLMStrategy):
     def available_models(self) -> List[str]:
         return self.MODELS
     
-    def generate(
+    def _build_request(
         self,
         messages: List[Message],
-        temperature: float = 0.3,
-        max_tokens: int = 4096,
-        **kwargs
-    ) -> LLMResponse:
-        import requests
-        import time
-        
-        start_time = time.time()
-        
+        temperature: float,
+        max_tokens: int,
+        stream: bool = False
+    ) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -182,75 +398,28 @@ class GroqStrategy(LLMStrategy):
             "temperature": temperature,
             "max_tokens": max_tokens
         }
+        if stream:
+            data["stream"] = True
         
-        response = requests.post(
-            f"{self.BASE_URL}/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=60
-        )
-        response.raise_for_status()
-        result = response.json()
-        
-        latency = (time.time() - start_time) * 1000
-        
+        return "/chat/completions", headers, data
+    
+    def _parse_response(self, result: Dict[str, Any], latency_ms: float) -> LLMResponse:
         return LLMResponse(
             content=result["choices"][0]["message"]["content"],
             model=self.model,
             provider=self.provider_name,
             tokens_used=result.get("usage", {}).get("total_tokens", 0),
             finish_reason=result["choices"][0].get("finish_reason", "stop"),
-            latency_ms=latency,
+            latency_ms=latency_ms,
             metadata={"usage": result.get("usage", {})}
         )
-    
-    def stream(
-        self,
-        messages: List[Message],
-        temperature: float = 0.3,
-        max_tokens: int = 4096,
-        **kwargs
-    ) -> Generator[str, None, None]:
-        import requests
-        
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": self.model,
-            "messages": [m.to_dict() for m in messages],
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-            "stream": True
-        }
-        
-        response = requests.post(
-            f"{self.BASE_URL}/chat/completions",
-            headers=headers,
-            json=data,
-            stream=True,
-            timeout=60
-        )
-        
-        for line in response.iter_lines():
-            if line:
-                line = line.decode('utf-8')
-                if line.startswith('data: ') and line != 'data: [DONE]':
-                    try:
-                        chunk = json.loads(line[6:])
-                        delta = chunk["choices"][0]["delta"]
-                        if delta.get("content"):
-                            yield delta["content"]
-                    except:
-                        pass
 
 
-class TogetherStrategy(LLMStrategy):
+class TogetherStrategy(HTTPStrategy):
     """Together AI Strategy - Free credits on signup"""
     
     BASE_URL = "https://api.together.xyz/v1"
+    STREAMING = True
     
     MODELS = [
         "meta-llama/Llama-3.3-70B-Instruct-Turbo",
@@ -260,9 +429,16 @@ class TogetherStrategy(LLMStrategy):
         "deepseek-ai/DeepSeek-V3"
     ]
     
-    def __init__(self, api_key: str, model: str = "meta-llama/Llama-3.3-70B-Instruct-Turbo"):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "meta-llama/Llama-3.3-70B-Instruct-Turbo",
+        timeout: float = 60,
+        pool_maxsize: Optional[int] = None
+    ):
         self.api_key = api_key
         self.model = model
+        self._setup_transport(self.BASE_URL, timeout, pool_maxsize)
     
     @property
     def provider_name(self) -> str:
@@ -272,18 +448,13 @@ class TogetherStrategy(LLMStrategy):
     def available_models(self) -> List[str]:
         return self.MODELS
     
-    def generate(
+    def _build_request(
         self,
         messages: List[Message],
-        temperature: float = 0.3,
-        max_tokens: int = 4096,
-        **kwargs
-    ) -> LLMResponse:
-        import requests
-        import time
-        
-        start_time = time.time()
-        
+        temperature: float,
+        max_tokens: int,
+        stream: bool = False
+    ) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -295,32 +466,27 @@ class TogetherStrategy(LLMStrategy):
             "temperature": temperature,
             "max_tokens": max_tokens
         }
+        if stream:
+            data["stream"] = True
         
-        response = requests.post(
-            f"{self.BASE_URL}/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=60
-        )
-        response.raise_for_status()
-        result = response.json()
-        
-        latency = (time.time() - start_time) * 1000
-        
+        return "/chat/completions", headers, data
+    
+    def _parse_response(self, result: Dict[str, Any], latency_ms: float) -> LLMResponse:
         return LLMResponse(
             content=result["choices"][0]["message"]["content"],
             model=self.model,
             provider=self.provider_name,
             tokens_used=result.get("usage", {}).get("total_tokens", 0),
             finish_reason=result["choices"][0].get("finish_reason", "stop"),
-            latency_ms=latency
+            latency_ms=latency_ms
         )
 
 
-class OpenRouterStrategy(LLMStrategy):
+class OpenRouterStrategy(HTTPStrategy):
     """OpenRouter Strategy - Multi-model access"""
     
     BASE_URL = "https://openrouter.ai/api/v1"
+    STREAMING = True
     
     MODELS = [
         "google/gemma-2-9b-it:free",
@@ -329,9 +495,16 @@ class OpenRouterStrategy(LLMStrategy):
         "meta-llama/llama-3.1-70b-instruct"
     ]
     
-    def __init__(self, api_key: str, model: str = "google/gemma-2-9b-it:free"):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "google/gemma-2-9b-it:free",
+        timeout: float = 60,
+        pool_maxsize: Optional[int] = None
+    ):
         self.api_key = api_key
         self.model = model
+        self._setup_transport(self.BASE_URL, timeout, pool_maxsize)
     
     @property
     def provider_name(self) -> str:
@@ -341,18 +514,13 @@ class OpenRouterStrategy(LLMStrategy):
     def available_models(self) -> List[str]:
         return self.MODELS
     
-    def generate(
+    def _build_request(
         self,
         messages: List[Message],
-        temperature: float = 0.3,
-        max_tokens: int = 4096,
-        **kwargs
-    ) -> LLMResponse:
-        import requests
-        import time
-        
-        start_time = time.time()
-        
+        temperature: float,
+        max_tokens: int,
+        stream: bool = False
+    ) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
@@ -366,29 +534,29 @@ class OpenRouterStrategy(LLMStrategy):
             "temperature": temperature,
             "max_tokens": max_tokens
         }
+        if stream:
+            data["stream"] = True
         
-        response = requests.post(
-            f"{self.BASE_URL}/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=60
-        )
-        response.raise_for_status()
-        result = response.json()
-        
-        latency = (time.time() - start_time) * 1000
-        
+        return "/chat/completions", headers, data
+    
+    def _parse_response(self, result: Dict[str, Any], latency_ms: float) -> LLMResponse:
         return LLMResponse(
             content=result["choices"][0]["message"]["content"],
             model=self.model,
             provider=self.provider_name,
             tokens_used=result.get("usage", {}).get("total_tokens", 0),
-            latency_ms=latency
+            latency_ms=latency_ms
         )
 
 
 class GoogleStrategy(LLMStrategy):
-    """Google AI Studio Strategy - Free Gemini"""
+    """
+    Google AI Studio Strategy - Free Gemini
+    Sync calls use the google-generativeai SDK; astream reads the REST
+    streamGenerateContent SSE stream over the pooled async transport.
+    """
+    
+    REST_URL = "https://generativelanguage.googleapis.com/v1beta"
     
     MODELS = [
         "gemini-2.0-flash-exp",
@@ -396,9 +564,11 @@ class GoogleStrategy(LLMStrategy):
         "gemini-1.5-pro"
     ]
     
-    def __init__(self, api_key: str, model: str = "gemini-2.0-flash-exp"):
+    def __init__(self, api_key: str, model: str = "gemini-2.0-flash-exp", timeout: float = 60):
         self.api_key = api_key
         self.model = model
+        self.timeout = timeout
+        self.base_url = self.REST_URL
         self._client = None
     
     @property
@@ -423,11 +593,72 @@ class GoogleStrategy(LLMStrategy):
         max_tokens: int = 4096,
         **kwargs
     ) -> LLMResponse:
-        import time
-        
         start_time = time.time()
-        client = self._get_client()
+        response = self._generate_content(messages, temperature, max_tokens)
+        
+        latency = (time.time() - start_time) * 1000
         
+        return LLMResponse(
+            content=response.text,
+            model=self.model,
+            provider=self.provider_name,
+            latency_ms=latency
+        )
+    
+    def stream(
+        self,
+        messages: List[Message],
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+        include_stats: bool = False,
+        **kwargs
+    ) -> Generator[Union[str, StreamStats], None, None]:
+        meter = StreamMeter(self.provider_name, self.model)
+        for chunk in self._generate_content(messages, temperature, max_tokens, stream=True):
+            text = meter.update(self._stream_delta(chunk))
+            if text:
+                yield text
+        if include_stats:
+            yield meter.stats()
+    
+    async def astream(
+        self,
+        messages: List[Message],
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+        include_stats: bool = False,
+        **kwargs
+    ) -> AsyncIterator[Union[str, StreamStats]]:
+        meter = StreamMeter(self.provider_name, self.model)
+        parser = StreamParser(SSE)
+        data = {
+            "contents": [{"role": "user", "parts": [{"text": self._prompt(messages)}]}],
+            "generationConfig": {"temperature": temperature, "maxOutputTokens": max_tokens}
+        }
+        
+        async with get_async_transport(self.base_url).stream(
+            "POST",
+            f"{self.base_url}/models/{self.model}:streamGenerateContent",
+            timeout=self.timeout,
+            params={"alt": "sse"},
+            headers={"x-goog-api-key": self.api_key},
+            json=data
+        ) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                for event in parser.feed(chunk):
+                    text = meter.update(self._rest_stream_delta(event))
+                    if text:
+                        yield text
+            for event in parser.close():
+                text = meter.update(self._rest_stream_delta(event))
+                if text:
+                    yield text
+        if include_stats:
+            yield meter.stats()
+    
+    @staticmethod
+    def _prompt(messages: List[Message]) -> str:
         # Convert messages to Gemini format
         prompt_parts = []
         for msg in messages:
@@ -436,29 +667,56 @@ class GoogleStrategy(LLMStrategy):
             else:
                 prompt_parts.append(msg.content)
         
-        full_prompt = "\n".join(prompt_parts)
+        return "\n".join(prompt_parts)
+    
+    def _generate_content(self, messages: List[Message], temperature: float, max_tokens: int, stream: bool = False):
+        client = self._get_client()
+        full_prompt = self._prompt(messages)
         
-        response = client.generate_content(
+        return client.generate_content(
             full_prompt,
             generation_config={
                 "temperature": temperature,
                 "max_output_tokens": max_tokens
-            }
+            },
+            request_options={"timeout": self.timeout},
+            stream=stream
         )
+    
+    def _rest_stream_delta(self, event: Dict[str, Any]) -> StreamDelta:
+        """Text, usage and finish reason of one streamGenerateContent SSE event"""
+        raise_stream_error(self.provider_name, event)
+        candidates = event.get("candidates") or [{}]
+        parts = (candidates[0].get("content") or {}).get("parts") or []
+        finish = candidates[0].get("finishReason")
+        return StreamDelta(
+            text="".join(part.get("text", "") for part in parts),
+            tokens=(event.get("usageMetadata") or {}).get("candidatesTokenCount"),
+            finish_reason=finish.lower() if finish else None
+        )
+    
+    @staticmethod
+    def _stream_delta(chunk) -> StreamDelta:
+        """Text, usage and finish reason of one streamed GenerateContentResponse"""
+        # chunk.text raises when a chunk has no parts (e.g. the final usage-only chunk)
+        candidates = getattr(chunk, "candidates", None) or []
+        parts = candidates[0].content.parts if candidates else []
+        usage = getattr(chunk, "usage_metadata", None)
+        finish = getattr(candidates[0], "finish_reason", None) if candidates else None
         
-        latency = (time.time() - start_time) * 1000
-        
-        return LLMResponse(
-            content=response.text,
-            model=self.model,
-            provider=self.provider_name,
-            latency_ms=latency
+        return StreamDelta(
+            text="".join(getattr(part, "text", "") for part in parts),
+            tokens=getattr(usage, "candidates_token_count", None) or None,
+            finish_reason=getattr(finish, "name", str(finish)).lower() if finish else None
         )
 
 
-class OllamaStrategy(LLMStrategy):
+class OllamaStrategy(HTTPStrategy):
     """Ollama Strategy - Local LLMs"""
     
+    STREAMING = True
+    STREAM_FORMAT = NDJSON
+    
     MODELS = [
         "llama3.2",
         "llama3.1",
@@ -468,9 +726,15 @@ class OllamaStrategy(LLMStrategy):
         "gemma2"
     ]
     
-    def __init__(self, base_url: str = "http://localhost:11434", model: str = "llama3.2"):
-        self.base_url = base_url
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434",
+        model: str = "llama3.2",
+        timeout: float = 120,
+        pool_maxsize: Optional[int] = None
+    ):
         self.model = model
+        self._setup_transport(base_url, timeout, pool_maxsize)
     
     @property
     def provider_name(self) -> str:
@@ -479,8 +743,7 @@ class OllamaStrategy(LLMStrategy):
     @property
     def available_models(self) -> List[str]:
         try:
-            import requests
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            response = self.transport.get(f"{self.base_url}/api/tags", timeout=5)
             if response.ok:
                 models = response.json().get("models", [])
                 return [m["name"] for m in models]
@@ -488,18 +751,13 @@ class OllamaStrategy(LLMStrategy):
             pass
         return self.MODELS
     
-    def generate(
+    def _build_request(
         self,
         messages: List[Message],
-        temperature: float = 0.3,
-        max_tokens: int = 4096,
-        **kwargs
-    ) -> LLMResponse:
-        import requests
-        import time
-        
-        start_time = time.time()
-        
+        temperature: float,
+        max_tokens: int,
+        stream: bool = False
+    ) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
         # Extract system and user messages
         system = ""
         prompt = ""
@@ -513,29 +771,30 @@ class OllamaStrategy(LLMStrategy):
             "model": self.model,
             "prompt": prompt,
             "system": system,
-            "stream": False,
+            "stream": stream,
             "options": {
                 "temperature": temperature,
                 "num_predict": max_tokens
             }
         }
         
-        response = requests.post(
-            f"{self.base_url}/api/generate",
-            json=data,
-            timeout=120
-        )
-        response.raise_for_status()
-        result = response.json()
-        
-        latency = (time.time() - start_time) * 1000
-        
+        return "/api/generate", {}, data
+    
+    def _parse_response(self, result: Dict[str, Any], latency_ms: float) -> LLMResponse:
         return LLMResponse(
             content=result.get("response", ""),
             model=self.model,
             provider=self.provider_name,
             tokens_used=result.get("eval_count", 0),
-            latency_ms=latency
+            latency_ms=latency_ms
+        )
+    
+    def _parse_stream_event(self, event: Dict[str, Any]) -> StreamDelta:
+        done = event.get("done", False)
+        return StreamDelta(
+            text=event.get("response", ""),
+            tokens=event.get("eval_count") if done else None,
+            finish_reason=event.get("done_reason", "stop") if done else None
         )
 
 
@@ -593,7 +852,7 @@ Based on the analysis, here are the identified risk areas:
 - Update transaction monitoring parameters
 
 *Response generated by AURIX Mock LLM*"""
-
+        
         elif "audit" in prompt_lower or "procedure" in prompt_lower:
             return """## Audit Procedures
 
@@ -606,7 +865,7 @@ Based on the analysis, here are the identified risk areas:
 | 5 | Analyze exception reports | Analytics | 100% |
 
 *Response generated by AURIX Mock LLM*"""
-
+        
         else:
             return """## Analysis Results
 
@@ -629,6 +888,14 @@ class LLMClient:
     """
     Main LLM Client using Strategy Pattern
     Provides unified interface to all LLM providers
+    
+    With a response cache, generate/chat/stream replay identical requests
+    (same provider, model, messages, temperature and max_tokens) from it;
+    pass use_cache=True/False to override the cache's temperature rule for
+    one call. metadata["cache"] reports the hit, hit rate and tokens saved.
+    
+    stream(..., include_stats=True) ends with a StreamStats event carrying
+    time-to-first-token and tokens/s.
     """
     
     STRATEGIES: Dict[LLMProvider, type] = {
@@ -640,8 +907,9 @@ class LLMClient:
         LLMProvider.MOCK: MockStrategy
     }
     
-    def __init__(self, config: LLMConfig):
+    def __init__(self, config: LLMConfig, cache: Optional[LLMResponseCache] = None):
         self.config = config
+        self.cache = cache
         self._strategy = self._create_strategy()
     
     def _create_strategy(self) -> LLMStrategy:
@@ -661,6 +929,12 @@ class LLMClient:
         if self.config.provider == LLMProvider.OLLAMA and self.config.base_url:
             kwargs["base_url"] = self.config.base_url
         
+        if issubclass(strategy_class, HTTPStrategy):
+            kwargs["timeout"] = self.config.timeout
+            kwargs["pool_maxsize"] = self.config.pool_maxsize
+        elif strategy_class is GoogleStrategy:
+            kwargs["timeout"] = self.config.timeout
+        
         try:
             return strategy_class(**kwargs)
         except Exception as e:
@@ -682,54 +956,497 @@ class LLMClient:
         **kwargs
     ) -> LLMResponse:
         """Generate response from prompt"""
+        return self.chat(self._messages(prompt, system_prompt), **kwargs)
+    
+    def chat(self, messages: List[Message], **kwargs) -> LLMResponse:
+        """Chat with message history"""
+        key = self._cache_key(messages, kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        
+        return self._remember(key, self._strategy.generate(messages, **self._options(kwargs)))
+    
+    def stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        **kwargs
+    ) -> Generator[Union[str, StreamStats], None, None]:
+        """Stream response (a cached response is replayed)"""
+        include_stats = kwargs.pop("include_stats", False)
+        messages = self._messages(prompt, system_prompt)
+        key = self._cache_key(messages, kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            yield from self._replay(cached, include_stats)
+            return
+        
+        pieces, stats = [], None
+        for item in self._strategy.stream(messages, include_stats=True, **self._options(kwargs)):
+            if isinstance(item, StreamStats):
+                stats = item
+                if not include_stats:
+                    continue
+            else:
+                pieces.append(item)
+            yield item
+        # Only completed streams are cached
+        self._remember(key, self._streamed_response(pieces, stats))
+    
+    @staticmethod
+    def _messages(prompt: str, system_prompt: Optional[str]) -> List[Message]:
         messages = []
         if system_prompt:
             messages.append(Message("system", system_prompt))
         messages.append(Message("user", prompt))
+        return messages
+    
+    def _options(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Strategy keyword arguments, with config defaults for temperature and max_tokens"""
+        options = {k: v for k, v in kwargs.items() if k != "use_cache"}
+        options["temperature"] = kwargs.get("temperature", self.config.temperature)
+        options["max_tokens"] = kwargs.get("max_tokens", self.config.max_tokens)
+        return options
+    
+    def _cache_key(self, messages: List[Message], kwargs: Dict[str, Any]) -> Optional[str]:
+        """Response cache key, or None when this call bypasses the cache"""
+        if self.cache is None:
+            return None
+        options = self._options(kwargs)
+        if not self.cache.cacheable(options["temperature"], kwargs.get("use_cache")):
+            return None
+        return response_key(
+            self.config.provider.value,
+            getattr(self._strategy, "model", self.config.get_model()),
+            [m.to_dict() for m in messages],
+            options["temperature"],
+            options["max_tokens"]
+        )
+    
+    def _cached(self, key: Optional[str]) -> Optional[LLMResponse]:
+        if key is None:
+            return None
+        start_time = time.time()
+        payload = self.cache.get(key)
+        if payload is None:
+            return None
         
-        return self._strategy.generate(
-            messages,
-            temperature=kwargs.get("temperature", self.config.temperature),
-            max_tokens=kwargs.get("max_tokens", self.config.max_tokens),
-            **kwargs
+        response = LLMResponse(**payload, latency_ms=(time.time() - start_time) * 1000)
+        return self._annotate(response, hit=True)
+    
+    def _remember(self, key: Optional[str], response: LLMResponse) -> LLMResponse:
+        if key is None:
+            return response
+        self.cache.put(key, {
+            "content": response.content,
+            "model": response.model,
+            "provider": response.provider,
+            "tokens_used": response.tokens_used,
+            "finish_reason": response.finish_reason,
+            "metadata": response.metadata
+        })
+        return self._annotate(response, hit=False)
+    
+    def _annotate(self, response: LLMResponse, hit: bool) -> LLMResponse:
+        response.metadata = {
+            **response.metadata,
+            "cache": {"hit": hit, "hit_rate": round(self.cache.hit_rate, 4), "saved_tokens": self.cache.saved_tokens}
+        }
+        return response
+    
+    def _streamed_response(self, pieces: List[str], stats: Optional[StreamStats]) -> LLMResponse:
+        return LLMResponse(
+            content="".join(pieces),
+            model=getattr(self._strategy, "model", self.config.get_model()),
+            provider=self.provider_name,
+            tokens_used=stats.tokens if stats else 0,
+            finish_reason=stats.finish_reason if stats else "stop",
+            latency_ms=stats.duration_ms if stats else 0.0
         )
     
-    def chat(self, messages: List[Message], **kwargs) -> LLMResponse:
+    def _replay(self, cached: LLMResponse, include_stats: bool) -> Generator[Union[str, StreamStats], None, None]:
+        """A cached response as a one-chunk stream"""
+        meter = StreamMeter(cached.provider, cached.model)
+        meter.update(StreamDelta(cached.content, cached.tokens_used or None, cached.finish_reason))
+        yield cached.content
+        if include_stats:
+            yield meter.stats()
+
+
+class AsyncLLMClient(LLMClient):
+    """
+    LLMClient with an asyncio surface for multi-call workloads
+    
+    agenerate/achat/astream do not block the event loop: HTTP providers use
+    a pooled httpx client, others run in a worker thread. Calls to one
+    provider share a semaphore of config.pool_maxsize per event loop, so
+    fan-out never queues more requests than the pool has connections.
+    From synchronous code (e.g. a Streamlit script) run them with
+    run_sync(client.generate_many(prompts)), which keeps one background
+    event loop and so reuses its pooled connections; asyncio.run starts a
+    new loop, and connection pool, on every call.
+    """
+    
+    @property
+    def _semaphore(self) -> asyncio.Semaphore:
+        return provider_semaphore(self.config.provider.value, self.config.pool_maxsize)
+    
+    async def agenerate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        **kwargs
+    ) -> LLMResponse:
+        """Generate response from prompt"""
+        return await self.achat(self._messages(prompt, system_prompt), **kwargs)
+    
+    async def achat(self, messages: List[Message], **kwargs) -> LLMResponse:
         """Chat with message history"""
-        return self._strategy.generate(
-            messages,
-            temperature=kwargs.get("temperature", self.config.temperature),
-            max_tokens=kwargs.get("max_tokens", self.config.max_tokens),
-            **kwargs
+        key = self._cache_key(messages, kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        
+        async with self._semaphore:
+            response = await self._strategy.agenerate(messages, **self._options(kwargs))
+        return self._remember(key, response)
+    
+    async def astream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        **kwargs
+    ) -> AsyncIterator[Union[str, StreamStats]]:
+        """Stream response (a cached response is replayed)"""
+        include_stats = kwargs.pop("include_stats", False)
+        messages = self._messages(prompt, system_prompt)
+        key = self._cache_key(messages, kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            for item in self._replay(cached, include_stats):
+                yield item
+            return
+        
+        pieces, stats = [], None
+        async with self._semaphore:
+            async for item in self._strategy.astream(messages, include_stats=True, **self._options(kwargs)):
+                if isinstance(item, StreamStats):
+                    stats = item
+                    if not include_stats:
+                        continue
+                else:
+                    pieces.append(item)
+                yield item
+        self._remember(key, self._streamed_response(pieces, stats))
+    
+    async def generate_many(
+        self,
+        prompts: Sequence[str],
+        system_prompt: Optional[str] = None,
+        concurrency: int = 4,
+        return_exceptions: bool = False,
+        **kwargs
+    ) -> List[Union[LLMResponse, BaseException]]:
+        """
+        Generate responses for several prompts concurrently, in prompt order
+        At most `concurrency` of these calls run at once (and never more than
+        the provider semaphore allows across all callers).
+        """
+        limit = asyncio.Semaphore(max(1, concurrency))
+        
+        async def run(prompt: str) -> LLMResponse:
+            async with limit:
+                return await self.agenerate(prompt, system_prompt, **kwargs)
+        
+        return await asyncio.gather(*(run(p) for p in prompts), return_exceptions=return_exceptions)
+
+
+async def compare_models(
+    clients: Sequence[AsyncLLMClient],
+    prompt: str,
+    system_prompt: Optional[str] = None,
+    **kwargs
+) -> List[Union[LLMResponse, BaseException]]:
+    """
+    Send one prompt to several clients at once (model arena)
+    Takes as long as the slowest client; a failing client yields its exception.
+    """
+    return await asyncio.gather(
+        *(client.agenerate(prompt, system_prompt, **kwargs) for client in clients),
+        return_exceptions=True
+    )
+
+
+class _HedgeFailed(Exception):
+    """Every call of a hedged attempt failed; the errors are already recorded"""
+
+
+class RoutingLLMClient:
+    """
+    LLM client routing each request across several providers
+    
+    routes is an ordered list of LLMConfig, or (LLMConfig, weight) pairs.
+    Each request goes to the available provider with the lowest rolling p50
+    latency divided by its weight; a provider without samples yet is scored
+    at the median p50 of the measured ones, and order breaks ties.
+    Providers whose error rate exceeds max_error_rate go last. A route whose
+    provider cannot be built (e.g. a missing API key) is dropped with an
+    error logged rather than silently answered by the mock. A failed call falls through to the next
+    provider. Each provider has a circuit breaker (see ProviderHealth) that
+    a rate limit or failure_threshold consecutive failures opens; when
+    every breaker is open, LLMRateLimitError is raised with the shortest
+    wait. With hedge_after_ms, a request still running after that long is
+    also sent to the next provider and the first answer wins; hedged calls
+    run on a pool of hedge_workers threads shared by all callers, so size it
+    for the number of concurrent requests (each uses up to two threads).
+    """
+    
+    def __init__(
+        self,
+        routes: Sequence[Union[LLMConfig, Tuple[LLMConfig, float]]],
+        window: int = 50,
+        failure_threshold: int = 3,
+        cooldown_seconds: float = 30.0,
+        max_error_rate: float = 0.5,
+        hedge_after_ms: Optional[float] = None,
+        cache: Optional[LLMResponseCache] = None,
+        hedge_workers: int = 32
+    ):
+        if not routes:
+            raise ValueError("RoutingLLMClient needs at least one route")
+        
+        self.clients: List[LLMClient] = []
+        self.health: List[ProviderHealth] = []
+        self.weights: List[float] = []
+        for route in routes:
+            config, weight = route if isinstance(route, tuple) else (route, 1.0)
+            client = LLMClient(config, cache=cache)
+            if isinstance(client._strategy, MockStrategy) and config.provider != LLMProvider.MOCK:
+                logger.error(f"Dropping route {config.provider.value}: provider could not be created")
+                continue
+            self.clients.append(client)
+            self.health.append(ProviderHealth(
+                f"{config.provider.value}:{config.get_model()}",
+                window=window,
+                failure_threshold=failure_threshold,
+                cooldown_seconds=cooldown_seconds
+            ))
+            self.weights.append(weight)
+        
+        if not self.clients:
+            raise ValueError("RoutingLLMClient has no usable route (check provider API keys)")
+        
+        self.max_error_rate = max_error_rate
+        self.hedge_after_ms = hedge_after_ms
+        # Hedged requests run on worker threads; a losing request finishes in the background
+        self._executor = (
+            ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix="llm-route")
+            if hedge_after_ms is not None else None
         )
     
+    @classmethod
+    def from_settings(cls, settings, cache: Optional[LLMResponseCache] = None) -> "RoutingLLMClient":
+        """Build the LLM_PROVIDER + LLM_FALLBACK_PROVIDERS chain from LLMSettings (app.config)"""
+        names = [getattr(settings.default_provider, "value", settings.default_provider)]
+        names += [name.strip().lower() for name in settings.fallback_providers.split(",") if name.strip()]
+        
+        routes = []
+        for name in dict.fromkeys(names):
+            provider = LLMProvider(name)
+            routes.append(LLMConfig(
+                provider=provider,
+                api_key=settings.get_api_key(provider.value) or None,
+                base_url=settings.ollama_base_url if provider == LLMProvider.OLLAMA else None,
+                temperature=settings.temperature,
+                max_tokens=settings.max_tokens,
+                timeout=settings.timeout,
+                pool_maxsize=settings.pool_maxsize
+            ))
+        
+        return cls(
+            routes,
+            failure_threshold=settings.breaker_failures,
+            cooldown_seconds=settings.breaker_cooldown,
+            hedge_after_ms=settings.hedge_after_ms or None,
+            cache=cache
+        )
+    
+    @property
+    def provider_name(self) -> str:
+        return "Router(" + ", ".join(client.provider_name for client in self.clients) + ")"
+    
+    def _candidates(self) -> List[int]:
+        """Available routes, best first"""
+        latencies = [health.percentile(50) for health in self.health]
+        measured = [p50 for p50 in latencies if p50 is not None]
+        # Unmeasured routes get a neutral prior so weights still order them
+        prior = statistics.median(measured) if measured else 1.0
+        
+        def rank(index: int):
+            p50 = latencies[index] if latencies[index] is not None else prior
+            score = p50 / max(self.weights[index], 1e-9)
+            return (self.health[index].error_rate > self.max_error_rate, score, index)
+        
+        return sorted((i for i, health in enumerate(self.health) if health.available()), key=rank)
+    
+    def generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        **kwargs
+    ) -> LLMResponse:
+        """Generate response from prompt"""
+        return self.chat(LLMClient._messages(prompt, system_prompt), **kwargs)
+    
+    def chat(self, messages: List[Message], **kwargs) -> LLMResponse:
+        """Chat with message history on the best available provider"""
+        errors: List[Tuple[int, BaseException]] = []
+        pending = self._candidates()
+        attempts = 0
+        
+        while pending:
+            primary = pending.pop(0)
+            if not self.health[primary].acquire():
+                continue
+            attempts += 1
+            try:
+                if self.hedge_after_ms is not None and pending:
+                    index, response = self._hedged(primary, pending, messages, kwargs, errors)
+                else:
+                    index, response = primary, self._call(primary, messages, kwargs)
+            except _HedgeFailed:
+                continue
+            except Exception as e:
+                errors.append((primary, e))
+                continue
+            
+            response.metadata = {
+                **response.metadata,
+                "route": {"provider": self.health[index].name, "attempts": attempts, "hedged": index != primary}
+            }
+            return response
+        
+        raise self._failure(errors)
+    
     def stream(
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
         **kwargs
     ) -> Generator[str, None, None]:
-        """Stream response"""
-        messages = []
-        if system_prompt:
-            messages.append(Message("system", system_prompt))
-        messages.append(Message("user", prompt))
+        """Stream from the best available provider, falling back until the first text arrives"""
+        errors: List[Tuple[int, BaseException]] = []
+        for index in self._candidates():
+            health = self.health[index]
+            if not health.acquire():
+                continue
+            
+            start_time = time.time()
+            recorded = False
+            try:
+                pieces = self.clients[index].stream(prompt, system_prompt, **kwargs)
+                try:
+                    first = next(pieces, None)
+                except Exception as e:
+                    health.record_failure(rate_limit_retry_after(e))
+                    recorded = True
+                    errors.append((index, e))
+                    continue
+                
+                if first is not None:
+                    yield first
+                try:
+                    yield from pieces
+                except Exception as e:
+                    health.record_failure(rate_limit_retry_after(e))
+                    recorded = True
+                    raise
+                health.record_success((time.time() - start_time) * 1000)
+                recorded = True
+                return
+            finally:
+                if not recorded:
+                    health.release()
         
-        yield from self._strategy.stream(
-            messages,
-            temperature=kwargs.get("temperature", self.config.temperature),
-            max_tokens=kwargs.get("max_tokens", self.config.max_tokens),
-            **kwargs
-        )
+        raise self._failure(errors)
+    
+    def _call(self, index: int, messages: List[Message], kwargs: Dict[str, Any]) -> LLMResponse:
+        """One provider call, recorded in its health"""
+        start_time = time.time()
+        try:
+            response = self.clients[index].chat(messages, **kwargs)
+        except Exception as e:
+            self.health[index].record_failure(rate_limit_retry_after(e))
+            raise
+        
+        # A response-cache hit never reached the provider, so it says nothing about its latency
+        if response.metadata.get("cache", {}).get("hit"):
+            self.health[index].release()
+        else:
+            self.health[index].record_success((time.time() - start_time) * 1000)
+        return response
+    
+    def _hedged(
+        self,
+        primary: int,
+        pending: List[int],
+        messages: List[Message],
+        kwargs: Dict[str, Any],
+        errors: List[Tuple[int, BaseException]]
+    ) -> Tuple[int, LLMResponse]:
+        """Run primary; past the hedge deadline, race it against the next available provider"""
+        futures: Dict[Future, int] = {self._executor.submit(self._call, primary, messages, kwargs): primary}
+        done, _ = wait(futures, timeout=self.hedge_after_ms / 1000)
+        
+        if not done:
+            while pending:
+                backup = pending.pop(0)
+                if self.health[backup].acquire():
+                    futures[self._executor.submit(self._call, backup, messages, kwargs)] = backup
+                    break
+        
+        remaining = set(futures)
+        while remaining:
+            done, remaining = wait(remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    return futures[future], future.result()
+                errors.append((futures[future], error))
+        raise _HedgeFailed()
+    
+    def _failure(self, errors: List[Tuple[int, BaseException]]) -> Exception:
+        """Exception for a request no provider answered"""
+        from utils.exceptions import LLMError, LLMRateLimitError
+        
+        names = ", ".join(self.health[i].name for i in sorted({i for i, _ in errors})) if errors else ""
+        if not errors:
+            # Every breaker is open: report the shortest wait
+            wait_seconds = min(health.retry_after() for health in self.health)
+            return LLMRateLimitError(", ".join(h.name for h in self.health), retry_after=math.ceil(wait_seconds))
+        
+        limits = [rate_limit_retry_after(e) for _, e in errors]
+        if all(limit is not None for limit in limits):
+            return LLMRateLimitError(names, retry_after=max(limits))
+        
+        details = "; ".join(f"{self.health[i].name}: {e}" for i, e in errors)
+        return LLMError(f"All LLM providers failed ({details})", provider=names)
+    
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Rolling latency, error rate and breaker state per provider"""
+        return {health.name: health.get_stats() for health in self.health}
 
 
 def create_llm_client(
     provider: str = "groq",
     api_key: Optional[str] = None,
     model: Optional[str] = None,
+    client_class: type = LLMClient,
+    cache: Optional[LLMResponseCache] = None,
     **kwargs
 ) -> LLMClient:
-    """Factory function to create LLM client"""
+    """Factory function to create LLM client (client_class=AsyncLLMClient for the async surface)"""
     try:
         provider_enum = LLMProvider(provider.lower())
     except ValueError:
@@ -756,7 +1473,7 @@ def create_llm_client(
         **kwargs
     )
     
-    return LLMClient(config)
+    return client_class(config, cache=cache)
 
 
 # Provider metadata for UI
@@ -806,7 +1523,21 @@ __all__ = [
     'LLMResponse',
     'Message',
     'LLMStrategy',
+    'HTTPStrategy',
+    'HTTPTransport',
+    'AsyncHTTPTransport',
+    'get_transport',
+    'close_transports',
+    'aclose_transports',
+    'run_sync',
     'LLMClient',
+    'AsyncLLMClient',
+    'RoutingLLMClient',
+    'ProviderHealth',
+    'LLMResponseCache',
+    'StreamParser',
+    'StreamStats',
+    'compare_models',
     'create_llm_client',
     'LLM_PROVIDER_INFO',
     'GroqStrategy',
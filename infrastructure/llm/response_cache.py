@@ -0,0 +1,203 @@
+"""
+LLM Response Cache
+In-memory LRU with an optional SQLite tier, keyed by provider/model/messages/params
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def response_key(
+    provider: str,
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int
+) -> str:
+    """Stable SHA-256 of everything that determines a completion"""
+    payload = json.dumps(
+        [provider, model, messages, round(float(temperature), 6), int(max_tokens)],
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache of LLM responses
+    
+    Lookups hit the in-memory LRU (max_entries) first, then the SQLite file at
+    path if one is given; disk hits are promoted to memory. Entries older than
+    ttl_seconds are ignored and dropped. Sampled completions (temperature > 0)
+    are not cached unless cache_sampled is set, since callers asking for
+    randomness expect a fresh answer. Responses are stored as plain dicts of
+    LLMResponse fields.
+    """
+    
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: Optional[float] = None,
+        path: Optional[str] = None,
+        disk_max_entries: int = 10_000,
+        cache_sampled: bool = False
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.disk_max_entries = disk_max_entries
+        self.cache_sampled = cache_sampled
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        
+        if path:
+            if path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " payload TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)")
+            self._conn.commit()
+    
+    @classmethod
+    def from_settings(cls, settings) -> "LLMResponseCache":
+        """Build a cache from LLMSettings (app.config)"""
+        return cls(
+            max_entries=settings.cache_size,
+            ttl_seconds=settings.cache_ttl or None,
+            path=settings.cache_path or None,
+            cache_sampled=settings.cache_sampled
+        )
+    
+    def cacheable(self, temperature: float, use_cache: Optional[bool] = None) -> bool:
+        """Whether a call should use the cache (use_cache overrides the temperature rule)"""
+        if use_cache is not None:
+            return use_cache
+        return temperature <= 0 or self.cache_sampled
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            payload = self._memory_get(key, now)
+            if payload is None and self._conn is not None:
+                payload = self._disk_get(key, now)
+                if payload is not None:
+                    self._memory_put(key, payload, now)
+            
+            if payload is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_tokens += payload.get("tokens_used", 0)
+            return payload
+    
+    def put(self, key: str, payload: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            self._memory_put(key, payload, now)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, payload, created, last_used) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(payload, ensure_ascii=False), now, now)
+                )
+                self._evict()
+                self._conn.commit()
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM responses")
+                self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+    
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - stored_at > self.ttl_seconds
+    
+    def _memory_get(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, payload = entry
+        if self._expired(stored_at, now):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return payload
+    
+    def _memory_put(self, key: str, payload: Dict[str, Any], stored_at: float):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (stored_at, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def _disk_get(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute("SELECT payload, created FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        payload, created = row
+        if self._expired(created, now):
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+            return None
+        self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        return json.loads(payload)
+    
+    def _evict(self):
+        overflow = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.disk_max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE rowid IN "
+                "(SELECT rowid FROM responses ORDER BY last_used LIMIT ?)",
+                (overflow,)
+            )
+            logger.debug(f"Evicted {overflow} cached LLM responses")
+    
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters, hit rate, tokens saved by hits and current size"""
+        with self._lock:
+            disk = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] if self._conn else 0
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hit_rate, 4),
+                "saved_tokens": self.saved_tokens,
+                "entries": len(self._entries),
+                "disk_entries": disk
+            }
+
+
+__all__ = [
+    'response_key',
+    'LLMResponseCache'
+]
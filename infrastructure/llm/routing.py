@@ -0,0 +1,146 @@
+"""
+Provider Routing
+Rolling latency/error statistics and circuit breakers per LLM provider
+"""
+
+from collections import deque
+from typing import Any, Dict, Optional, Sequence
+import math
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def _percentile(values: Sequence[float], q: float) -> float:
+    """Linearly interpolated percentile, q in 0..100"""
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = math.floor(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def rate_limit_retry_after(error: BaseException) -> Optional[int]:
+    """Retry-After seconds if error is an HTTP 429 from requests or httpx (0 when unspecified)"""
+    response = getattr(error, "response", None)
+    if response is None or getattr(response, "status_code", None) != 429:
+        retry_after = getattr(error, "retry_after", None)
+        return retry_after if isinstance(retry_after, int) else None
+    try:
+        return int(float(response.headers.get("Retry-After", 0)))
+    except (TypeError, ValueError):
+        return 0
+
+
+class ProviderHealth:
+    """
+    Rolling health of one provider with a circuit breaker
+    
+    Latencies of the last `window` successful calls give p50/p95; the last
+    `window` outcomes give the error rate. After failure_threshold
+    consecutive failures (or any rate limit) the breaker opens for
+    cooldown_seconds, or the provider's Retry-After if longer. Once the
+    cooldown passes one trial call is let through (half-open): success
+    closes the breaker, failure opens it again.
+    """
+    
+    def __init__(self, name: str, window: int = 50, failure_threshold: int = 3, cooldown_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.latencies: "deque[float]" = deque(maxlen=window)
+        self.outcomes: "deque[bool]" = deque(maxlen=window)
+        self.requests = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.open_until = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+    
+    def acquire(self, now: Optional[float] = None) -> bool:
+        """Whether a call may go to this provider now (claims the half-open trial)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.state == OPEN and now >= self.open_until:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+    
+    def available(self, now: Optional[float] = None) -> bool:
+        """Like acquire() without claiming anything"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.state == OPEN:
+                return now >= self.open_until
+            return self.state == CLOSED or not self._trial_in_flight
+    
+    def record_success(self, latency_ms: float):
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(latency_ms)
+            self.outcomes.append(True)
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            self._trial_in_flight = False
+    
+    def release(self):
+        """Give back a claimed half-open trial without an outcome (e.g. an abandoned stream)"""
+        with self._lock:
+            self._trial_in_flight = False
+    
+    def record_failure(self, retry_after: Optional[int] = None, now: Optional[float] = None):
+        """Count a failure; retry_after (not None) marks a rate limit and opens the breaker at once"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.requests += 1
+            self.outcomes.append(False)
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if (
+                retry_after is not None
+                or self.state == HALF_OPEN
+                or self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = OPEN
+                self.open_until = now + max(self.cooldown_seconds, retry_after or 0)
+    
+    def retry_after(self, now: Optional[float] = None) -> float:
+        """Seconds until an open breaker lets a trial call through"""
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.open_until - now) if self.state == OPEN else 0.0
+    
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self.latencies:
+                return None
+            return _percentile(self.latencies, q)
+    
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "state": self.state,
+            "requests": self.requests,
+            "p50_ms": round(p50, 1) if p50 is not None else None,
+            "p95_ms": round(p95, 1) if p95 is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "retry_after": round(self.retry_after(), 1)
+        }
+
+
+__all__ = [
+    'ProviderHealth',
+    'rate_limit_retry_after'
+]
@@ -0,0 +1,197 @@
+"""
+Token Streaming
+Incremental SSE/NDJSON parsing and time-to-first-token / throughput metering
+"""
+
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterator, List, Optional, Union
+import codecs
+import json
+import time
+
+SSE = "sse"
+NDJSON = "ndjson"
+
+
+@dataclass
+class StreamDelta:
+    """What one stream event carries: text, and on the last events token usage / finish reason"""
+    text: str = ""
+    tokens: Optional[int] = None
+    finish_reason: Optional[str] = None
+
+
+@dataclass
+class StreamStats:
+    """
+    Final event of a stream (yielded when include_stats=True)
+    
+    ttft_ms is the wait until the first text; tokens_per_second is the
+    generation rate after it (over the whole call for a single chunk).
+    tokens comes from the provider's usage report when it sends one,
+    otherwise it is the number of text chunks and tokens_estimated is set.
+    """
+    provider: str
+    model: str
+    ttft_ms: float
+    duration_ms: float
+    tokens: int
+    tokens_per_second: float
+    chunks: int
+    tokens_estimated: bool = False
+    finish_reason: str = "stop"
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class StreamParser:
+    """
+    Incremental parser for Server-Sent Events or newline-delimited JSON
+    
+    feed() takes raw bytes as they arrive (chunk boundaries may fall inside
+    a line or a UTF-8 character) and returns the JSON events completed so
+    far; close() flushes the last unterminated event. SSE comments and
+    event/id/retry fields are skipped and the "[DONE]" sentinel ends the
+    stream. A malformed event raises ValueError instead of being dropped.
+    """
+    
+    def __init__(self, fmt: str = SSE):
+        if fmt not in (SSE, NDJSON):
+            raise ValueError(f"Unknown stream format: {fmt}")
+        self.format = fmt
+        self.done = False
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._data: List[str] = []
+    
+    def feed(self, chunk: Union[bytes, str]) -> List[Dict[str, Any]]:
+        if isinstance(chunk, bytes):
+            chunk = self._decoder.decode(chunk)
+        self._buffer += chunk
+        
+        events = []
+        *lines, self._buffer = self._buffer.split("\n")
+        for line in lines:
+            event = self._line(line.rstrip("\r"))
+            if event is not None:
+                events.append(event)
+        return events
+    
+    def close(self) -> List[Dict[str, Any]]:
+        events = self.feed(self._decoder.decode(b"", final=True) + "\n")
+        if self.format == SSE:
+            event = self._dispatch()
+            if event is not None:
+                events.append(event)
+        return events
+    
+    def _line(self, line: str) -> Optional[Dict[str, Any]]:
+        if self.done:
+            return None
+        if self.format == NDJSON:
+            return json.loads(line) if line.strip() else None
+        
+        if not line:
+            return self._dispatch()
+        if line.startswith(":"):
+            return None
+        field, _, value = line.partition(":")
+        if field == "data":
+            self._data.append(value[1:] if value.startswith(" ") else value)
+        return None
+    
+    def _dispatch(self) -> Optional[Dict[str, Any]]:
+        data, self._data = "\n".join(self._data), []
+        if not data:
+            return None
+        if data.strip() == "[DONE]":
+            self.done = True
+            return None
+        return json.loads(data)
+
+
+def raise_stream_error(provider: str, event: Dict[str, Any]):
+    """Raise LLMError if a stream event reports an error instead of content"""
+    error = event.get("error")
+    if error:
+        from utils.exceptions import LLMError
+        message = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+        raise LLMError(f"{provider} stream error: {message}", provider=provider)
+
+
+def openai_stream_delta(event: Dict[str, Any]) -> StreamDelta:
+    """Delta of an OpenAI-style chat.completion.chunk (Groq, Together, OpenRouter)"""
+    choices = event.get("choices") or [{}]
+    usage = event.get("usage") or event.get("x_groq", {}).get("usage") or {}
+    return StreamDelta(
+        text=(choices[0].get("delta") or {}).get("content") or "",
+        tokens=usage.get("completion_tokens"),
+        finish_reason=choices[0].get("finish_reason")
+    )
+
+
+class StreamMeter:
+    """Clock and counters of one stream, turned into StreamStats at the end"""
+    
+    def __init__(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+        self.start = time.perf_counter()
+        self.first_token: Optional[float] = None
+        self.chunks = 0
+        self.tokens: Optional[int] = None
+        self.finish_reason = "stop"
+    
+    def update(self, delta: StreamDelta) -> str:
+        """Record a delta; returns its text"""
+        if delta.text:
+            if self.first_token is None:
+                self.first_token = time.perf_counter()
+            self.chunks += 1
+        if delta.tokens is not None:
+            self.tokens = delta.tokens
+        if delta.finish_reason:
+            self.finish_reason = delta.finish_reason
+        return delta.text
+    
+    def stats(self) -> StreamStats:
+        end = time.perf_counter()
+        first = self.first_token if self.first_token is not None else end
+        tokens = self.tokens if self.tokens is not None else self.chunks
+        # A single chunk (non-streaming fallback, cache replay) has no generation phase to time
+        generating = end - first if self.chunks > 1 else end - self.start
+        
+        return StreamStats(
+            provider=self.provider,
+            model=self.model,
+            ttft_ms=round((first - self.start) * 1000, 2),
+            duration_ms=round((end - self.start) * 1000, 2),
+            tokens=tokens,
+            tokens_per_second=round(tokens / generating, 2) if generating > 0 else 0.0,
+            chunks=self.chunks,
+            tokens_estimated=self.tokens is None,
+            finish_reason=self.finish_reason
+        )
+
+
+def iter_events(parser: StreamParser, chunks: Iterator[bytes]) -> Iterator[Dict[str, Any]]:
+    """Events parsed from a byte stream as it arrives"""
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+        if parser.done:
+            return
+    yield from parser.close()
+
+
+__all__ = [
+    'SSE',
+    'NDJSON',
+    'StreamDelta',
+    'StreamStats',
+    'StreamParser',
+    'StreamMeter',
+    'raise_stream_error',
+    'openai_stream_delta',
+    'iter_events'
+]
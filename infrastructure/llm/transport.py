@@ -0,0 +1,249 @@
+"""
+HTTP Transport
+Pooled keep-alive sessions shared per LLM provider endpoint, sync and async
+"""
+
+from typing import Any, Dict, Optional
+import asyncio
+import logging
+import threading
+import weakref
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPTransport:
+    """
+    requests.Session with a sized connection pool
+    
+    Every strategy talking to the same endpoint shares one transport (see
+    get_transport), so consecutive and concurrent calls reuse open TCP/TLS
+    connections instead of handshaking on each request. pool_maxsize is the
+    number of connections kept alive per host. The timeout passed to each
+    request is the read timeout; connecting is capped at connect_timeout.
+    """
+    
+    def __init__(
+        self,
+        pool_connections: int = 4,
+        pool_maxsize: int = 16,
+        max_retries: int = 0,
+        connect_timeout: float = 10.0
+    ):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.connect_timeout = connect_timeout
+        self._session = None
+        self._lock = threading.Lock()
+    
+    @property
+    def session(self):
+        """Lazily created session with the pooled adapter mounted"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    
+                    session = requests.Session()
+                    self._mount(session)
+                    self._session = session
+        return self._session
+    
+    def resize(self, pool_maxsize: int):
+        """Grow the pool, closing the previous adapter's idle connections"""
+        with self._lock:
+            self.pool_maxsize = pool_maxsize
+            if self._session is not None:
+                previous = {id(adapter): adapter for adapter in self._session.adapters.values()}
+                self._mount(self._session)
+                # Connections checked out by requests in flight are closed when released
+                for adapter in previous.values():
+                    adapter.close()
+    
+    def _mount(self, session):
+        from requests.adapters import HTTPAdapter
+        
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=self.max_retries
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+    
+    def request(self, method: str, url: str, timeout: float = 60, **kwargs):
+        connect = min(self.connect_timeout, timeout) if timeout else self.connect_timeout
+        return self.session.request(method, url, timeout=(connect, timeout), **kwargs)
+    
+    def post(self, url: str, timeout: float = 60, **kwargs):
+        return self.request("POST", url, timeout, **kwargs)
+    
+    def get(self, url: str, timeout: float = 60, **kwargs):
+        return self.request("GET", url, timeout, **kwargs)
+    
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+_transports: Dict[str, HTTPTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(endpoint: str, pool_maxsize: Optional[int] = None, **options: Any) -> HTTPTransport:
+    """
+    Shared transport for a provider endpoint, created on first use
+    
+    A later call asking for a larger pool grows it; other options only apply
+    when the transport is created.
+    """
+    key = endpoint.rstrip("/")
+    with _transports_lock:
+        transport = _transports.get(key)
+        if transport is None:
+            if pool_maxsize is not None:
+                options["pool_maxsize"] = pool_maxsize
+            transport = _transports[key] = HTTPTransport(**options)
+        elif pool_maxsize is not None and pool_maxsize > transport.pool_maxsize:
+            transport.resize(pool_maxsize)
+    return transport
+
+
+class AsyncHTTPTransport:
+    """
+    httpx.AsyncClient with the same pooling and timeouts as HTTPTransport
+    
+    An AsyncClient belongs to the event loop it was first used on, so shared
+    instances are kept per loop (see get_async_transport).
+    """
+    
+    def __init__(self, pool_maxsize: int = 16, connect_timeout: float = 10.0):
+        self.pool_maxsize = pool_maxsize
+        self.connect_timeout = connect_timeout
+        self._client = None
+    
+    @property
+    def client(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.pool_maxsize,
+                    max_keepalive_connections=self.pool_maxsize
+                )
+            )
+        return self._client
+    
+    def _timeout(self, timeout: float):
+        import httpx
+        connect = min(self.connect_timeout, timeout) if timeout else self.connect_timeout
+        # Waiting for a pooled connection is bounded by the provider semaphore, not a timeout
+        return httpx.Timeout(timeout, connect=connect, pool=None)
+    
+    async def post(self, url: str, timeout: float = 60, **kwargs):
+        return await self.client.post(url, timeout=self._timeout(timeout), **kwargs)
+    
+    async def get(self, url: str, timeout: float = 60, **kwargs):
+        return await self.client.get(url, timeout=self._timeout(timeout), **kwargs)
+    
+    def stream(self, method: str, url: str, timeout: float = 60, **kwargs):
+        """Async context manager yielding a streamed response"""
+        return self.client.stream(method, url, timeout=self._timeout(timeout), **kwargs)
+    
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Per event loop: async transports by endpoint and provider semaphores by provider
+_loop_transports: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, AsyncHTTPTransport]]" = (
+    weakref.WeakKeyDictionary()
+)
+_loop_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_transport(endpoint: str, pool_maxsize: Optional[int] = None) -> AsyncHTTPTransport:
+    """Shared async transport for a provider endpoint on the running event loop"""
+    transports = _loop_transports.setdefault(asyncio.get_running_loop(), {})
+    key = endpoint.rstrip("/")
+    transport = transports.get(key)
+    if transport is None:
+        transport = transports[key] = AsyncHTTPTransport(pool_maxsize or 16)
+    return transport
+
+
+def provider_semaphore(provider: str, limit: int) -> asyncio.Semaphore:
+    """
+    Concurrency limit shared by all async calls to one provider on the running loop
+    The limit is fixed by the first caller on each loop.
+    """
+    semaphores = _loop_semaphores.setdefault(asyncio.get_running_loop(), {})
+    semaphore = semaphores.get(provider)
+    if semaphore is None:
+        semaphore = semaphores[provider] = asyncio.Semaphore(max(1, limit))
+    return semaphore
+
+
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_lock = threading.Lock()
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-async", daemon=True).start()
+            _background_loop = loop
+        return _background_loop
+
+
+def run_sync(coro, timeout: Optional[float] = None):
+    """
+    Run a coroutine from synchronous code (e.g. a Streamlit script)
+    
+    Every call uses one long-lived background event loop, so its async
+    transports and their keep-alive connections are reused across calls,
+    where asyncio.run would open (and leak) a new pool per call.
+    """
+    loop = _get_background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        raise RuntimeError("run_sync() called from the background loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+
+async def aclose_transports():
+    """Close the async transports of the running event loop"""
+    transports = _loop_transports.pop(asyncio.get_running_loop(), {})
+    for transport in transports.values():
+        await transport.aclose()
+
+
+def close_transports():
+    """Close every shared session (e.g. on shutdown)"""
+    with _transports_lock:
+        for transport in _transports.values():
+            transport.close()
+        _transports.clear()
+
+
+__all__ = [
+    'HTTPTransport',
+    'AsyncHTTPTransport',
+    'get_transport',
+    'get_async_transport',
+    'provider_semaphore',
+    'close_transports',
+    'aclose_transports',
+    'run_sync'
+]
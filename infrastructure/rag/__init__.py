@@ -4,19 +4,60 @@ Document processing, embedding, and retrieval for audit intelligence
 """
 
 from abc import ABC, abstractmethod
+from collections.abc import Mapping
 from dataclasses import dataclass, field
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Set, Tuple, Iterable, Iterator, Callable
 from datetime import datetime
 import hashlib
+import json
+import os
 import re
+import sys
 import logging
 
+import numpy as np
+
+from .ann import IVFIndex
+from .chunk_metadata import ChunkMetadata, DocumentMetadata, share_metadata
+from .chunking import StructuredChunker, format_path
+from .context import ContextPacker, PackedContext
+from .dedup import NearDuplicateIndex
+from .embedding_cache import EmbeddingCache, content_hash
+from .extraction import ExtractionResult, KeywordExtractor
+from .facets import FacetIndex, normalise_regulation
+from .fusion import SemanticScores, fuse_rankings
+from .keyword_index import BM25Index
+from .persistence import VectorIndexStorage
+from .quantization import QUANTIZATIONS, check_quantization, dequantize, quantize, scan_scores
+from .query_cache import QueryCache, freeze, normalise_query
+from .registry import DocumentRecord, DocumentRegistry, document_key
+from .rerank import CrossEncoderReranker
+
 logger = logging.getLogger(__name__)
 
+_NON_WORD_RE = re.compile(r'[^\w]')
 
-@dataclass
+# Metadata that changes on every processing run and does not affect retrieval
+_VOLATILE_METADATA = ("processed_at",)
+# Metadata that belongs to one chunk rather than to its whole document
+_CHUNK_FIELDS = ("chunk_index", "chunk_keywords", "section_path", "sections")
+
+
+def _same_metadata(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    """Compare chunk metadata, ignoring volatile fields"""
+    return (
+        {k: v for k, v in a.items() if k not in _VOLATILE_METADATA}
+        == {k: v for k, v in b.items() if k not in _VOLATILE_METADATA}
+    )
+
+
+@dataclass(slots=True)
 class DocumentChunk:
-    """Represents a chunk of processed document"""
+    """
+    Represents a chunk of processed document
+    Chunks from DocumentProcessor carry a ChunkMetadata view onto metadata
+    shared by the whole document; any plain dict works as well.
+    """
     id: str
     content: str
     metadata: Dict[str, Any] = field(default_factory=dict)
@@ -46,6 +87,9 @@ class ProcessedDocument:
     chunks: List[DocumentChunk]
     metadata: Dict[str, Any]
     processed_at: datetime = field(default_factory=datetime.now)
+    fingerprint: str = ""
+    # Near-duplicate chunk ID -> ID of the stored chunk it was folded into
+    aliases: Dict[str, str] = field(default_factory=dict)
     
     @property
     def chunk_count(self) -> int:
@@ -74,6 +118,16 @@ class DocumentProcessor:
         "financial": ["keuangan", "financial", "laporan", "akuntansi", "neraca"]
     }
     
+    # Risk keywords for risk indicator extraction
+    RISK_KEYWORDS = {
+        "high_risk": ["fraud", "penipuan", "kecurangan", "pelanggaran", "material", "critical"],
+        "control_weakness": ["kelemahan", "weakness", "gap", "deficiency", "kurang", "tidak memadai"],
+        "finding": ["temuan", "finding", "observasi", "catatan", "rekomendasi", "issue"]
+    }
+    
+    # Common Indonesian function words for language detection
+    INDONESIAN_WORDS = ["yang", "dan", "untuk", "dengan", "dari", "pada", "dalam", "adalah", "ini", "itu"]
+    
     # Regulation patterns
     REGULATION_PATTERNS = [
         r'POJK\s*(?:No\.?)?\s*\d+[\/\-](?:POJK\.\d+[\/\-])?\d+',
@@ -85,13 +139,37 @@ class DocumentProcessor:
         r'PSAK\s*\d+'
     ]
     
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, chunk_unit: str = "chars"):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.chunk_unit = chunk_unit
+        self.chunker = StructuredChunker(chunk_size, chunk_overlap, chunk_unit)
+        self._extractor: Optional[KeywordExtractor] = None
+        self._domain_terms: Optional[frozenset] = None
     
-    def process(self, content: str, filename: str, metadata: Dict = None) -> ProcessedDocument:
+    @property
+    def extractor(self) -> KeywordExtractor:
+        """Compiled single-pass scanner over all keyword lists and regulation patterns"""
+        if self._extractor is None:
+            keywords = [kw for kws in self.CATEGORY_KEYWORDS.values() for kw in kws]
+            keywords += [kw for kws in self.RISK_KEYWORDS.values() for kw in kws]
+            self._extractor = KeywordExtractor(
+                keywords,
+                function_words=self.INDONESIAN_WORDS,
+                regulation_patterns=self.REGULATION_PATTERNS
+            )
+        return self._extractor
+    
+    def process(
+        self,
+        content: str,
+        filename: str,
+        metadata: Dict = None,
+        doc_id: Optional[str] = None
+    ) -> ProcessedDocument:
         """Process document content into chunks with metadata"""
-        doc_id = self._generate_doc_id(content, filename)
+        fingerprint = content_hash(content)
+        doc_id = doc_id or self._generate_doc_id(fingerprint, filename)
         
         # Extract document-level metadata
         doc_metadata = self._extract_metadata(content, filename)
@@ -105,68 +183,58 @@ class DocumentProcessor:
             id=doc_id,
             filename=filename,
             chunks=chunks,
-            metadata=doc_metadata
+            metadata=doc_metadata,
+            fingerprint=fingerprint
         )
     
+    def process_stream(
+        self,
+        blocks: Iterable[str],
+        filename: str,
+        metadata: Dict = None,
+        doc_id: Optional[str] = None
+    ) -> "DocumentStream":
+        """
+        Process a document given as an iterator of text blocks (pages, paragraphs)
+        Chunks are yielded as soon as they fill; document-level metadata is
+        gathered along the way and complete once the stream is exhausted.
+        """
+        return DocumentStream(self, blocks, filename, metadata, doc_id)
+    
     def _create_chunks(
         self, 
         content: str, 
         doc_metadata: Dict, 
         filename: str
     ) -> List[DocumentChunk]:
-        """Split content into overlapping chunks"""
-        chunks = []
-        sentences = self._split_into_sentences(content)
-        
-        current_chunk = ""
-        current_sentences = []
-        
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) <= self.chunk_size:
-                current_chunk += sentence + " "
-                current_sentences.append(sentence)
-            else:
-                if current_chunk.strip():
-                    chunks.append(self._create_chunk(
-                        current_chunk.strip(), 
-                        doc_metadata, 
-                        filename,
-                        len(chunks)
-                    ))
-                
-                # Start new chunk with overlap
-                overlap_count = min(2, len(current_sentences))
-                overlap_text = " ".join(current_sentences[-overlap_count:]) if current_sentences else ""
-                current_chunk = overlap_text + " " + sentence + " "
-                current_sentences = [sentence]
-        
-        # Add final chunk
-        if current_chunk.strip():
-            chunks.append(self._create_chunk(
-                current_chunk.strip(), 
-                doc_metadata, 
-                filename,
-                len(chunks)
-            ))
-        
-        return chunks
+        """Split content into overlapping chunks along its article/heading structure"""
+        shared = DocumentMetadata({**doc_metadata, "filename": filename})
+        return [
+            self._create_chunk(text, shared, index, sections)
+            for index, (text, sections) in enumerate(self.chunker.split(content))
+        ]
     
     def _create_chunk(
         self, 
         content: str, 
-        doc_metadata: Dict, 
-        filename: str,
-        index: int
+        shared: DocumentMetadata,
+        index: int,
+        sections: List[Tuple[str, ...]] = ()
     ) -> DocumentChunk:
-        """Create a single document chunk"""
+        """Create a single document chunk; document-level metadata is shared, not copied"""
         chunk_id = self._generate_chunk_id(content)
         
-        chunk_metadata = {
-            **doc_metadata,
-            "filename": filename,
+        values = {
             "chunk_index": index,
             "chunk_keywords": self._extract_chunk_keywords(content)
         }
+        # Where the chunk sits in the document, e.g. "BAB II > Pasal 5 > Ayat (2)"
+        paths = [format_path(path) for path in sections if any(path)]
+        if paths:
+            values["section_path"] = paths[0]
+            if len(paths) > 1:
+                values["sections"] = paths
+        chunk_metadata = shared.append(values)
         
         return DocumentChunk(
             id=chunk_id,
@@ -181,99 +249,154 @@ class DocumentProcessor:
             "processed_at": datetime.now().isoformat(),
             "word_count": len(content.split()),
             "char_count": len(content),
-            "language": self._detect_language(content),
-            "categories": self._classify_document(content),
-            "regulations_mentioned": self._extract_regulations(content),
-            "risk_indicators": self._extract_risk_indicators(content)
+            **self._metadata_from_scan(self.extractor.scan(content))
         }
     
-    def _split_into_sentences(self, text: str) -> List[str]:
-        """Split text into sentences, handling Indonesian patterns"""
-        # Handle bullet points and numbered lists
-        text = re.sub(r'\n+', ' ', text)
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Split on sentence endings
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        return [s.strip() for s in sentences if s.strip()]
-    
-    def _detect_language(self, text: str) -> str:
-        """Detect if text is Indonesian or English"""
-        indonesian_words = ["yang", "dan", "untuk", "dengan", "dari", "pada", "dalam", "adalah", "ini", "itu"]
-        text_lower = text.lower()
-        indonesian_count = sum(1 for word in indonesian_words if f" {word} " in f" {text_lower} ")
-        return "id" if indonesian_count >= 3 else "en"
-    
-    def _classify_document(self, text: str) -> List[str]:
-        """Classify document into audit categories"""
-        categories = []
-        text_lower = text.lower()
-        
-        for category, keywords in self.CATEGORY_KEYWORDS.items():
-            if any(kw in text_lower for kw in keywords):
-                categories.append(category)
-        
-        return categories if categories else ["general"]
-    
-    def _extract_regulations(self, text: str) -> List[str]:
-        """Extract mentioned regulations"""
-        regulations = []
-        for pattern in self.REGULATION_PATTERNS:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            regulations.extend(matches)
-        return list(set(regulations))
-    
-    def _extract_risk_indicators(self, text: str) -> Dict[str, List[str]]:
-        """Extract risk-related keywords"""
-        risk_keywords = {
-            "high_risk": ["fraud", "penipuan", "kecurangan", "pelanggaran", "material", "critical"],
-            "control_weakness": ["kelemahan", "weakness", "gap", "deficiency", "kurang", "tidak memadai"],
-            "finding": ["temuan", "finding", "observasi", "catatan", "rekomendasi", "issue"]
-        }
-        
-        found = {}
-        text_lower = text.lower()
+    def _metadata_from_scan(self, scan: ExtractionResult) -> Dict[str, Any]:
+        """Derive language, categories, regulations and risk indicators from one scan"""
+        categories = [
+            category for category, keywords in self.CATEGORY_KEYWORDS.items()
+            if any(kw in scan.keywords for kw in keywords)
+        ]
         
-        for category, keywords in risk_keywords.items():
-            matches = [kw for kw in keywords if kw in text_lower]
+        risk_indicators = {}
+        for category, keywords in self.RISK_KEYWORDS.items():
+            matches = [kw for kw in keywords if kw in scan.keywords]
             if matches:
-                found[category] = matches
+                risk_indicators[category] = matches
         
-        return found
+        return {
+            "language": "id" if len(scan.function_words) >= 3 else "en",
+            "categories": categories if categories else ["general"],
+            "regulations_mentioned": list(scan.regulations),
+            "risk_indicators": risk_indicators
+        }
     
     def _extract_chunk_keywords(self, content: str) -> List[str]:
         """Extract key terms from chunk content"""
         # Simple keyword extraction based on capitalized words and domain terms
-        words = content.split()
+        domain_terms = self._get_domain_terms()
         keywords = []
         
-        for word in words:
+        for word in content.split():
             # Clean word
-            clean_word = re.sub(r'[^\w]', '', word)
+            clean_word = _NON_WORD_RE.sub('', word)
             if len(clean_word) < 3:
                 continue
             
             # Check if it's likely a keyword (capitalized or domain term)
-            if clean_word[0].isupper() or clean_word.lower() in self._get_domain_terms():
+            if clean_word[0].isupper() or clean_word.lower() in domain_terms:
                 keywords.append(clean_word)
         
         return list(set(keywords))[:20]  # Limit to 20 keywords
     
-    def _get_domain_terms(self) -> set:
-        """Get set of audit domain terms"""
-        terms = set()
-        for keywords in self.CATEGORY_KEYWORDS.values():
-            terms.update(kw.lower() for kw in keywords)
-        return terms
+    def _get_domain_terms(self) -> frozenset:
+        """Get set of audit domain terms (built once per processor)"""
+        if self._domain_terms is None:
+            self._domain_terms = frozenset(
+                kw.lower() for keywords in self.CATEGORY_KEYWORDS.values() for kw in keywords
+            )
+        return self._domain_terms
     
-    def _generate_doc_id(self, content: str, filename: str) -> str:
-        """Generate unique document ID"""
-        hash_input = f"{filename}:{content[:1000]}"
+    def _generate_doc_id(self, fingerprint: str, filename: str) -> str:
+        """Generate unique document ID from the filename and full-content fingerprint"""
+        hash_input = f"{filename}:{fingerprint}"
         return hashlib.md5(hash_input.encode()).hexdigest()[:16]
     
     def _generate_chunk_id(self, content: str) -> str:
         """Generate unique chunk ID"""
-        return hashlib.md5(content.encode()).hexdigest()[:12]
+        return content_hash(content)[:12]
+
+
+class _MetadataAccumulator:
+    """Builds document-level metadata incrementally from text blocks"""
+    
+    def __init__(self, processor: DocumentProcessor):
+        self.processor = processor
+        self.word_count = 0
+        self.char_count = 0
+        self.digest = hashlib.md5()
+        self.scan = ExtractionResult()
+    
+    def update(self, block: str):
+        self.word_count += len(block.split())
+        self.char_count += len(block)
+        self.digest.update(block.encode())
+        
+        found = self.processor.extractor.scan(block)
+        self.scan.keywords |= found.keywords
+        self.scan.function_words |= found.function_words
+        self.scan.regulations |= found.regulations
+    
+    def to_metadata(self, filename: str) -> Dict[str, Any]:
+        """Same fields as DocumentProcessor._extract_metadata"""
+        return {
+            "filename": filename,
+            "processed_at": datetime.now().isoformat(),
+            "word_count": self.word_count,
+            "char_count": self.char_count,
+            **self.processor._metadata_from_scan(self.scan)
+        }
+
+
+class DocumentStream:
+    """
+    Lazily processed document
+    Iterating yields chunks carrying chunk-level metadata only; once exhausted,
+    `metadata` holds the document-level metadata and to_document() merges it
+    into the chunks.
+    """
+    
+    def __init__(
+        self,
+        processor: DocumentProcessor,
+        blocks: Iterable[str],
+        filename: str,
+        metadata: Dict = None,
+        doc_id: Optional[str] = None
+    ):
+        self.processor = processor
+        self.blocks = blocks
+        self.filename = filename
+        self.extra_metadata = metadata or {}
+        self.doc_id: Optional[str] = doc_id
+        self.fingerprint = ""
+        self.metadata: Dict[str, Any] = {}
+        self.finished = False
+        self._accumulator = _MetadataAccumulator(processor)
+        self._shared = DocumentMetadata({**self.extra_metadata, "filename": filename})
+    
+    def __iter__(self) -> Iterator[DocumentChunk]:
+        processor = self.processor
+        chunks = processor.chunker.iter_chunks(self.blocks, self._accumulator.update)
+        
+        for index, (text, sections) in enumerate(chunks):
+            yield processor._create_chunk(text, self._shared, index, sections)
+        
+        self.fingerprint = self._accumulator.digest.hexdigest()
+        self.doc_id = self.doc_id or processor._generate_doc_id(self.fingerprint, self.filename)
+        self.metadata = self._accumulator.to_metadata(self.filename)
+        self.metadata.update(self.extra_metadata)
+        self.finished = True
+    
+    def to_document(self, chunks: List[DocumentChunk]) -> ProcessedDocument:
+        """Merge final document metadata into streamed chunks"""
+        if not self.finished:
+            raise RuntimeError("DocumentStream must be fully consumed before to_document()")
+        
+        # Chunks yielded by this stream share one record, so one update reaches them all
+        self._shared.fields = {**self.metadata, **self._shared.fields}
+        for chunk in chunks:
+            if not (isinstance(chunk.metadata, ChunkMetadata) and chunk.metadata.record is self._shared):
+                chunk.metadata = {**self.metadata, **chunk.metadata}
+        
+        return ProcessedDocument(
+            id=self.doc_id,
+            filename=self.filename,
+            chunks=chunks,
+            metadata=self.metadata,
+            fingerprint=self.fingerprint
+        )
 
 
 class VectorStore(ABC):
@@ -285,8 +408,13 @@ class VectorStore(ABC):
         pass
     
     @abstractmethod
-    def search(self, query_embedding: List[float], top_k: int = 5) -> List[RetrievalResult]:
-        """Search for similar chunks"""
+    def search(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[RetrievalResult]:
+        """Search for similar chunks, optionally restricted to a metadata filter"""
         pass
     
     @abstractmethod
@@ -298,6 +426,15 @@ class VectorStore(ABC):
     def clear(self):
         """Clear all chunks from store"""
         pass
+    
+    @abstractmethod
+    def update_metadata(self, chunks: List[DocumentChunk]):
+        """Replace the metadata of stored chunks, keeping their embeddings"""
+        pass
+    
+    def memory_usage(self) -> Dict[str, Any]:
+        """Memory held by stored embeddings (empty when the store cannot tell)"""
+        return {}
 
 
 class InMemoryVectorStore(VectorStore):
@@ -309,25 +446,58 @@ class InMemoryVectorStore(VectorStore):
     def __init__(self):
         self.chunks: Dict[str, DocumentChunk] = {}
         self.embeddings: Dict[str, List[float]] = {}
+        self.keyword_index = BM25Index(vocabulary=[
+            kw for keywords in DocumentProcessor.CATEGORY_KEYWORDS.values() for kw in keywords
+        ])
+        self.facet_index = FacetIndex()
+        self.fusion = "rrf"
+        self.fusion_overfetch = 2
     
     def add(self, chunks: List[DocumentChunk], embeddings: List[List[float]] = None):
         """Add chunks with optional embeddings"""
         for i, chunk in enumerate(chunks):
-            self.chunks[chunk.id] = chunk
+            self._register_chunk(chunk)
             if embeddings and i < len(embeddings):
                 self.embeddings[chunk.id] = embeddings[i]
     
+    def update_metadata(self, chunks: List[DocumentChunk]):
+        """Swap in new versions of stored chunks whose content is unchanged; unknown chunks are ignored"""
+        for chunk in chunks:
+            if chunk.id in self.chunks:
+                self.chunks[chunk.id] = chunk
+                self.facet_index.remove(chunk.id)
+                self.facet_index.add(chunk.id, chunk.metadata)
+    
+    def _register_chunk(self, chunk: DocumentChunk):
+        """Store a chunk and add it to the keyword and facet indexes"""
+        self.chunks[chunk.id] = chunk
+        self.keyword_index.add(chunk.id, chunk.content)
+        self.facet_index.add(chunk.id, chunk.metadata)
+    
+    def _unregister_chunk(self, chunk_id: str):
+        """Remove a chunk and its keyword and facet postings"""
+        self.chunks.pop(chunk_id, None)
+        self.keyword_index.remove(chunk_id)
+        self.facet_index.remove(chunk_id)
+    
     def search(
         self, 
         query_embedding: List[float], 
-        top_k: int = 5
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
     ) -> List[RetrievalResult]:
         """Search using cosine similarity"""
         if not self.embeddings:
             return []
         
+        allowed = self.facet_index.match(filter)
+        if allowed is None:
+            candidates = self.embeddings.items()
+        else:
+            candidates = ((cid, self.embeddings[cid]) for cid in allowed if cid in self.embeddings)
+        
         results = []
-        for chunk_id, embedding in self.embeddings.items():
+        for chunk_id, embedding in candidates:
             score = self._cosine_similarity(query_embedding, embedding)
             chunk = self.chunks.get(chunk_id)
             if chunk:
@@ -340,78 +510,161 @@ class InMemoryVectorStore(VectorStore):
         results.sort(key=lambda x: x.score, reverse=True)
         return results[:top_k]
     
-    def keyword_search(self, query: str, top_k: int = 5) -> List[RetrievalResult]:
-        """Fallback keyword search"""
-        query_terms = query.lower().split()
+    def keyword_search(
+        self,
+        query: str,
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[RetrievalResult]:
+        """BM25 keyword search over the inverted index"""
         results = []
+        allowed = self.facet_index.match(filter)
         
-        for chunk_id, chunk in self.chunks.items():
-            content_lower = chunk.content.lower()
-            score = sum(1 for term in query_terms if term in content_lower)
-            
-            if score > 0:
+        for chunk_id, score in self.keyword_index.search(query, top_k, candidates=allowed):
+            chunk = self.chunks.get(chunk_id)
+            if chunk:
                 results.append(RetrievalResult(
                     chunk=chunk,
-                    score=score / len(query_terms),
+                    score=score,
                     source_document=chunk.metadata.get("filename", "unknown")
                 ))
         
-        results.sort(key=lambda x: x.score, reverse=True)
-        return results[:top_k]
+        return results
+    
+    def search_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[RetrievalResult]]:
+        """Search for several query embeddings at once"""
+        return [self.search(embedding, top_k, filter) for embedding in query_embeddings]
     
     def hybrid_search(
         self, 
         query_text: str, 
         query_embedding: List[float],
         top_k: int = 5,
-        alpha: float = 0.5
+        alpha: float = 0.5,
+        filter: Optional[Dict[str, Any]] = None
     ) -> List[RetrievalResult]:
-        """Combine semantic and keyword search"""
-        keyword_results = self.keyword_search(query_text, top_k * 2)
-        semantic_results = self.search(query_embedding, top_k * 2) if self.embeddings else []
-        
-        # Combine scores
-        combined_scores: Dict[str, Dict] = {}
-        
-        for result in keyword_results:
-            combined_scores[result.chunk.id] = {
-                "chunk": result.chunk,
-                "score": (1 - alpha) * result.score,
-                "source": result.source_document
-            }
+        """
+        Combine semantic and keyword search
+        Both signals are scored once over the (filtered) candidates and fused
+        with self.fusion ("rrf" or "linear"); alpha weights the semantic side.
+        """
+        return self.hybrid_search_many([query_text], [query_embedding], top_k, alpha, filter)[0]
+    
+    def hybrid_search_many(
+        self,
+        query_texts: List[str],
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        alpha: float = 0.5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[RetrievalResult]]:
+        """Hybrid search for several queries with one batched semantic pass"""
+        allowed = self.facet_index.match(filter)
+        if self.embeddings and query_embeddings is not None and len(query_embeddings):
+            semantic_batches = self._semantic_scores(query_embeddings, allowed, top_k)
+        else:
+            semantic_batches = [None for _ in query_texts]
         
-        for result in semantic_results:
-            if result.chunk.id in combined_scores:
-                combined_scores[result.chunk.id]["score"] += alpha * result.score
-            else:
-                combined_scores[result.chunk.id] = {
-                    "chunk": result.chunk,
-                    "score": alpha * result.score,
-                    "source": result.source_document
-                }
-        
-        results = [
-            RetrievalResult(
-                chunk=data["chunk"],
-                score=data["score"],
-                source_document=data["source"]
-            )
-            for data in combined_scores.values()
+        return [
+            self._fused_results(text, semantic, allowed, top_k, alpha)
+            for text, semantic in zip(query_texts, semantic_batches)
         ]
+    
+    def _fused_results(
+        self,
+        query_text: str,
+        semantic: Optional[SemanticScores],
+        allowed: Optional[Set[str]],
+        top_k: int,
+        alpha: float
+    ) -> List[RetrievalResult]:
+        """Fuse semantic scores with BM25 scores of the same candidates"""
+        keyword = self.keyword_index.scores(query_text, candidates=allowed)
+        fused = fuse_rankings(semantic, keyword, top_k, alpha, self.fusion, self.fusion_overfetch)
         
-        results.sort(key=lambda x: x.score, reverse=True)
-        return results[:top_k]
+        results = []
+        for chunk_id, score in fused:
+            chunk = self.chunks.get(chunk_id)
+            if chunk:
+                results.append(RetrievalResult(
+                    chunk=chunk,
+                    score=score,
+                    source_document=chunk.metadata.get("filename", "unknown")
+                ))
+        return results
+    
+    def _semantic_scores(
+        self,
+        query_embeddings: List[List[float]],
+        allowed: Optional[Set[str]],
+        top_k: int
+    ) -> List[Optional[SemanticScores]]:
+        """Cosine scores of every (allowed) embedded chunk, one SemanticScores per query"""
+        ids = [cid for cid in (self.embeddings if allowed is None else allowed) if cid in self.embeddings]
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if not ids or queries.ndim != 2:
+            return [None for _ in query_embeddings]
+        
+        matrix = np.asarray([self.embeddings[cid] for cid in ids], dtype=np.float32)
+        if matrix.shape[1] != queries.shape[1]:
+            return [None for _ in query_embeddings]
+        
+        matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = matrix @ queries.T
+        positions = {cid: i for i, cid in enumerate(ids)}
+        return [SemanticScores(scores[:, i], ids, positions) for i in range(scores.shape[1])]
     
     def delete(self, chunk_ids: List[str]):
         """Delete chunks by ID"""
         for chunk_id in chunk_ids:
-            self.chunks.pop(chunk_id, None)
+            self._unregister_chunk(chunk_id)
             self.embeddings.pop(chunk_id, None)
     
     def clear(self):
         """Clear all data"""
         self.chunks.clear()
         self.embeddings.clear()
+        self.keyword_index.clear()
+        self.facet_index.clear()
+    
+    def memory_usage(self) -> Dict[str, Any]:
+        """Approximate bytes held by stored embeddings (Python lists of floats)"""
+        vector_bytes = sum(
+            sys.getsizeof(vector) + sum(sys.getsizeof(x) for x in vector)
+            for vector in self.embeddings.values()
+        )
+        dimension = len(next(iter(self.embeddings.values()), []))
+        return self._memory_report("list", len(self.embeddings), dimension, vector_bytes)
+    
+    @staticmethod
+    def _memory_report(
+        storage: str,
+        vectors: int,
+        dimension: int,
+        vector_bytes: int,
+        rerank_bytes: int = 0,
+        **extra
+    ) -> Dict[str, Any]:
+        """Memory summary; compression counts the float32 re-ranking copy against the saving"""
+        float32_bytes = vectors * dimension * 4
+        total = vector_bytes + rerank_bytes
+        return {
+            "storage": storage,
+            "vectors": vectors,
+            "dimension": dimension,
+            "vector_bytes": vector_bytes,
+            "rerank_bytes": rerank_bytes,
+            "bytes_per_vector": round(total / vectors, 1) if vectors else 0.0,
+            "float32_bytes": float32_bytes,
+            "compression": round(float32_bytes / total, 2) if total else 0.0,
+            **extra
+        }
     
     def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         """Calculate cosine similarity"""
@@ -433,6 +686,596 @@ class InMemoryVectorStore(VectorStore):
         return len(self.chunks)
 
 
+def _top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first"""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class _MatrixEmbeddingView(Mapping):
+    """Read-only chunk_id -> embedding view over a NumpyVectorStore matrix"""
+    
+    def __init__(self, store: "NumpyVectorStore"):
+        self._store = store
+    
+    def __getitem__(self, chunk_id: str) -> List[float]:
+        row = self._store._id_to_row[chunk_id]
+        return self._store._vectors(np.array([row]))[0].tolist()
+    
+    def __contains__(self, chunk_id: object) -> bool:
+        # Mapping's default would dequantise the row just to test membership
+        return chunk_id in self._store._id_to_row
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store._id_to_row)
+    
+    def __len__(self) -> int:
+        return len(self._store._id_to_row)
+
+
+class NumpyVectorStore(InMemoryVectorStore):
+    """
+    In-memory vector store backed by a contiguous matrix
+    Embeddings are L2-normalised on insert so search is a single
+    matrix-vector product followed by an argpartition top-k.
+    
+    quantization="float16" halves and "int8" quarters the matrix (int8 keeps
+    one float32 scale per vector); queries stay float32. With rerank_factor
+    > 0 a float32 copy is kept as well and the top_k * rerank_factor
+    candidates are re-scored exactly, trading the memory saving for recall.
+    """
+    
+    INITIAL_CAPACITY = 256
+    
+    def __init__(self, quantization: str = "float32", rerank_factor: int = 0):
+        super().__init__()
+        self.quantization = check_quantization(quantization)
+        self.rerank_factor = rerank_factor if quantization != "float32" else 0
+        self._matrix: np.ndarray = np.zeros((0, 0), dtype=np.float32)
+        self._scales: np.ndarray = np.zeros(0, dtype=np.float32)
+        self._exact: Optional[np.ndarray] = None
+        self._valid: np.ndarray = np.zeros(0, dtype=bool)
+        self._row_ids: List[Optional[str]] = []
+        self._id_to_row: Dict[str, int] = {}
+        self._free_rows: List[int] = []
+        self.embeddings = _MatrixEmbeddingView(self)
+    
+    @property
+    def dimension(self) -> int:
+        """Embedding dimension (0 until the first embedding is added)"""
+        return self._matrix.shape[1]
+    
+    def add(self, chunks: List[DocumentChunk], embeddings: List[List[float]] = None):
+        """Add chunks, writing their embeddings into free or appended rows"""
+        for chunk in chunks:
+            self._register_chunk(chunk)
+        
+        if embeddings is None or len(embeddings) == 0:
+            return
+        
+        count = min(len(chunks), len(embeddings))
+        vectors = self._normalise(np.asarray(embeddings[:count], dtype=np.float32))
+        if self.dimension == 0:
+            self._resize_storage(0, vectors.shape[1])
+        elif vectors.shape[1] != self.dimension:
+            raise ValueError(
+                f"Embedding dimension {vectors.shape[1]} does not match store dimension {self.dimension}"
+            )
+        
+        rows = []
+        for chunk in chunks[:count]:
+            row = self._id_to_row.get(chunk.id)
+            rows.append(self._allocate_row(chunk.id) if row is None else row)
+        self._write_rows(np.array(rows, dtype=np.int64), vectors)
+    
+    def search(
+        self, 
+        query_embedding: List[float], 
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[RetrievalResult]:
+        """Search using one matrix-vector product over normalised rows (only filtered rows with a filter)"""
+        if not self._id_to_row:
+            return []
+        
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if query.ndim != 1 or query.shape[0] != self.dimension:
+            return []
+        
+        rows = self._filtered_rows(filter)
+        if rows is not None and rows.size == 0:
+            return []
+        
+        query = self._normalise(query[np.newaxis, :])[0]
+        return self._ranked(self._score(query, rows), query, top_k, rows)
+    
+    def search_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[RetrievalResult]]:
+        """Score all queries against the matrix with one matrix-matrix product"""
+        if not self._id_to_row or len(query_embeddings) == 0:
+            return [[] for _ in query_embeddings]
+        
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim != 2 or queries.shape[1] != self.dimension:
+            return [[] for _ in query_embeddings]
+        
+        rows = self._filtered_rows(filter)
+        if rows is not None and rows.size == 0:
+            return [[] for _ in query_embeddings]
+        
+        queries = self._normalise(queries)
+        scores = self._score(queries.T, rows)
+        return [self._ranked(scores[:, i], queries[i], top_k, rows) for i in range(scores.shape[1])]
+    
+    def delete(self, chunk_ids: List[str]):
+        """Delete chunks by ID, releasing their matrix rows for reuse"""
+        for chunk_id in chunk_ids:
+            self._unregister_chunk(chunk_id)
+            row = self._id_to_row.pop(chunk_id, None)
+            if row is not None:
+                self._row_ids[row] = None
+                self._valid[row] = False
+                self._matrix[row] = 0
+                if self._exact is not None:
+                    self._exact[row] = 0.0
+                self._free_rows.append(row)
+    
+    def clear(self):
+        """Clear all data"""
+        self.chunks.clear()
+        self.keyword_index.clear()
+        self.facet_index.clear()
+        self._resize_storage(0, 0)
+        self._row_ids = []
+        self._id_to_row.clear()
+        self._free_rows = []
+    
+    def memory_usage(self) -> Dict[str, Any]:
+        """Bytes per stored vector (float32 re-ranking copy included), and for the matrices as allocated"""
+        row_bytes = self.dimension * self._matrix.itemsize + (4 if self.quantization == "int8" else 0)
+        allocated = self._matrix.nbytes + (self._scales.nbytes if self.quantization == "int8" else 0)
+        rerank_bytes = 0
+        if self._exact is not None:
+            rerank_bytes = len(self._id_to_row) * self.dimension * self._exact.itemsize
+            allocated += self._exact.nbytes
+        return self._memory_report(
+            "memmap" if isinstance(self._matrix, np.memmap) else "numpy",
+            len(self._id_to_row),
+            self.dimension,
+            len(self._id_to_row) * row_bytes,
+            rerank_bytes,
+            quantization=self.quantization,
+            allocated_bytes=allocated
+        )
+    
+    def _filtered_rows(self, filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Matrix rows of the chunks matching a facet filter (None without a filter)"""
+        return self._allowed_rows(self.facet_index.match(filter))
+    
+    def _allowed_rows(self, allowed: Optional[Set[str]]) -> Optional[np.ndarray]:
+        if allowed is None:
+            return None
+        rows = [self._id_to_row[cid] for cid in allowed if cid in self._id_to_row]
+        return np.array(sorted(rows), dtype=np.int64)
+    
+    def _semantic_scores(
+        self,
+        query_embeddings: List[List[float]],
+        allowed: Optional[Set[str]],
+        top_k: int
+    ) -> List[Optional[SemanticScores]]:
+        """Score all queries against the (allowed) rows with one matrix-matrix product"""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if not self._id_to_row or queries.ndim != 2 or queries.shape[1] != self.dimension:
+            return [None for _ in query_embeddings]
+        
+        rows = self._allowed_rows(allowed)
+        if rows is not None and rows.size == 0:
+            return [None for _ in query_embeddings]
+        
+        scores = self._score(self._normalise(queries).T, rows)
+        if rows is None:
+            ids, positions = self._row_ids, self._id_to_row
+        else:
+            ids = [self._row_ids[row] for row in rows.tolist()]
+            positions = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        return [SemanticScores(scores[:, i], ids, positions) for i in range(scores.shape[1])]
+    
+    def _score(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine scores for every allocated row, or the given rows (one column per query); freed rows score -inf"""
+        if rows is not None:
+            return scan_scores(self._matrix[rows], self._row_scales(rows), query, self.quantization)
+        
+        used = len(self._row_ids)
+        scores = scan_scores(self._matrix[:used], self._row_scales(slice(0, used)), query, self.quantization)
+        if len(self._id_to_row) < used:
+            scores[~self._valid[:used]] = -np.inf
+        return scores
+    
+    def _ranked(
+        self,
+        scores: np.ndarray,
+        query: np.ndarray,
+        top_k: int,
+        rows: Optional[np.ndarray] = None
+    ) -> List[RetrievalResult]:
+        """Rank scores, re-scoring the best candidates in float32 when re-ranking is on"""
+        if self._exact is not None and top_k > 0:
+            candidates = _top_k_indices(scores, top_k * self.rerank_factor)
+            candidates = candidates[np.isfinite(scores[candidates])]
+            rows = candidates if rows is None else rows[candidates]
+            scores = self._exact[rows] @ query
+        return self._to_results(scores, top_k, rows)
+    
+    def _vectors(self, rows: np.ndarray) -> np.ndarray:
+        """Normalised float32 embeddings of the given rows"""
+        if self._exact is not None:
+            return np.asarray(self._exact[rows])
+        return dequantize(self._matrix[rows], self._row_scales(rows), self.quantization)
+    
+    def _write_rows(self, rows: np.ndarray, vectors: np.ndarray):
+        codes, scales = quantize(vectors, self.quantization)
+        self._matrix[rows] = codes
+        if self.quantization == "int8":
+            self._scales[rows] = scales
+        if self._exact is not None:
+            self._exact[rows] = vectors
+    
+    def _resize_storage(self, capacity: int, dimension: int):
+        """(Re)allocate the matrix, scales, validity mask and re-rank copy, keeping used rows"""
+        used = min(len(self._row_ids), capacity) if dimension == self.dimension else 0
+        matrix = np.zeros((capacity, dimension), dtype=QUANTIZATIONS[self.quantization])
+        scales = np.ones(capacity, dtype=np.float32)
+        valid = np.zeros(capacity, dtype=bool)
+        exact = np.zeros((capacity, dimension), dtype=np.float32) if self.rerank_factor > 0 else None
+        if used:
+            matrix[:used] = self._matrix[:used]
+            scales[:used] = self._scales[:used]
+            valid[:used] = self._valid[:used]
+            if exact is not None:
+                exact[:used] = self._exact[:used]
+        self._exact = exact
+        self._matrix, self._scales, self._valid = matrix, scales, valid
+    
+    def _row_scales(self, rows) -> Optional[np.ndarray]:
+        return self._scales[rows] if self.quantization == "int8" else None
+    
+    def _to_results(
+        self,
+        scores: np.ndarray,
+        top_k: int,
+        rows: Optional[np.ndarray] = None
+    ) -> List[RetrievalResult]:
+        """Turn a score vector (over all rows, or over the given rows) into ranked RetrievalResults"""
+        results = []
+        for i in _top_k_indices(scores, min(top_k, len(self._id_to_row))):
+            row = i if rows is None else rows[i]
+            chunk = self.chunks.get(self._row_ids[row])
+            if chunk:
+                results.append(RetrievalResult(
+                    chunk=chunk,
+                    score=float(scores[i]),
+                    source_document=chunk.metadata.get("filename", "unknown")
+                ))
+        return results
+    
+    def _allocate_row(self, chunk_id: str) -> int:
+        """Reserve a matrix row for a chunk, growing capacity geometrically"""
+        if self._free_rows:
+            row = self._free_rows.pop()
+            self._row_ids[row] = chunk_id
+        else:
+            row = len(self._row_ids)
+            if row >= self._matrix.shape[0]:
+                capacity = max(self.INITIAL_CAPACITY, self._matrix.shape[0] * 2)
+                self._resize_storage(capacity, self.dimension)
+            self._row_ids.append(chunk_id)
+        
+        self._valid[row] = True
+        self._id_to_row[chunk_id] = row
+        return row
+    
+    @staticmethod
+    def _normalise(vectors: np.ndarray) -> np.ndarray:
+        """L2-normalise rows, leaving zero vectors untouched"""
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class IVFVectorStore(NumpyVectorStore):
+    """
+    Approximate nearest-neighbour store using an IVF-flat index
+    Falls back to exact search until min_train_size embeddings are present,
+    and retrains once the store has grown retrain_growth times past the
+    size it was trained on. Tune recall/latency with nprobe. Probed rows are
+    scored on the (optionally quantised) matrix like NumpyVectorStore.
+    Deleted and re-added rows leave stale list entries; the lists are
+    compacted once these exceed compact_threshold of the filed rows.
+    """
+    
+    def __init__(
+        self,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        min_train_size: int = 1024,
+        retrain_growth: float = 4.0,
+        quantization: str = "float32",
+        rerank_factor: int = 0,
+        compact_threshold: float = 0.25
+    ):
+        super().__init__(quantization=quantization, rerank_factor=rerank_factor)
+        self.index = IVFIndex(nlist=nlist, nprobe=nprobe)
+        self.min_train_size = min_train_size
+        self.retrain_growth = retrain_growth
+        self.compact_threshold = compact_threshold
+    
+    def add(self, chunks: List[DocumentChunk], embeddings: List[List[float]] = None):
+        """Add chunks and file their rows in the IVF lists"""
+        super().add(chunks, embeddings)
+        if embeddings is None or len(embeddings) == 0:
+            return
+        
+        embedded = len(self._id_to_row)
+        if not self.index.trained:
+            if embedded >= self.min_train_size:
+                self.rebuild_index()
+        elif embedded >= self.index.trained_size * self.retrain_growth:
+            self.rebuild_index()
+        else:
+            rows = np.array(
+                [self._id_to_row[c.id] for c in chunks[:len(embeddings)] if c.id in self._id_to_row],
+                dtype=np.int64
+            )
+            self.index.add(rows, self._vectors(rows))
+            self._compact_if_stale()
+    
+    def search(
+        self, 
+        query_embedding: List[float], 
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[RetrievalResult]:
+        """
+        Score only the rows filed under the closest centroids
+        A filter already narrows the rows to score, so filtered searches are exact.
+        """
+        if not self.index.trained or filter:
+            return super().search(query_embedding, top_k, filter)
+        
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if query.ndim != 1 or query.shape[0] != self.dimension:
+            return []
+        
+        query = self._normalise(query[np.newaxis, :])[0]
+        rows = self.index.candidates(query)
+        if rows.size < top_k:
+            # Too few candidates in the probed lists, widen to an exact search
+            return super().search(query_embedding, top_k)
+        
+        return self._ranked(self._score(query, rows), query, top_k, rows)
+    
+    def search_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[RetrievalResult]]:
+        """Candidate sets differ per query, so each query is probed separately"""
+        if not self.index.trained or filter:
+            return super().search_many(query_embeddings, top_k, filter)
+        return [self.search(embedding, top_k) for embedding in query_embeddings]
+    
+    def delete(self, chunk_ids: List[str]):
+        """Delete chunks and unfile their rows"""
+        rows = [self._id_to_row[cid] for cid in chunk_ids if cid in self._id_to_row]
+        super().delete(chunk_ids)
+        self.index.remove(rows)
+        self._compact_if_stale()
+    
+    def _compact_if_stale(self):
+        if self.index.stale and self.index.stale_ratio > self.compact_threshold:
+            self.index.compact()
+    
+    def clear(self):
+        """Clear all data and the trained index"""
+        super().clear()
+        self.index.reset()
+    
+    def _semantic_scores(
+        self,
+        query_embeddings: List[List[float]],
+        allowed: Optional[Set[str]],
+        top_k: int
+    ) -> List[Optional[SemanticScores]]:
+        """Semantic side of hybrid search, scoring only each query's probed rows"""
+        if not self.index.trained or allowed is not None:
+            return super()._semantic_scores(query_embeddings, allowed, top_k)
+        
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim != 2 or queries.shape[1] != self.dimension:
+            return [None for _ in query_embeddings]
+        
+        batches = []
+        for query in self._normalise(queries):
+            rows = self.index.candidates(query)
+            if rows.size < top_k:
+                batches.extend(super()._semantic_scores(query[np.newaxis, :], None, top_k))
+                continue
+            ids = [self._row_ids[row] for row in rows.tolist()]
+            positions = {chunk_id: i for i, chunk_id in enumerate(ids)}
+            batches.append(SemanticScores(self._score(query, rows), ids, positions))
+        return batches
+    
+    def rebuild_index(self):
+        """Retrain centroids on the current embeddings and refile every row"""
+        rows = np.array(sorted(self._id_to_row.values()), dtype=np.int64)
+        if rows.size == 0:
+            self.index.reset()
+            return
+        
+        vectors = self._vectors(rows)
+        self.index.train(vectors)
+        self.index.add(rows, vectors)
+
+
+class PersistentVectorStore(NumpyVectorStore):
+    """
+    NumpyVectorStore persisted to a local directory
+    Chunks and embeddings are appended to disk as they are added, and the
+    embedding matrix is memory-mapped on load so restarts skip re-embedding
+    and worker processes on one host share the same pages.
+    Deleted or replaced rows stay on disk until compact() is called.
+    """
+    
+    def __init__(self, directory: str):
+        super().__init__()
+        self.storage = VectorIndexStorage(directory)
+        self._load()
+    
+    def add(self, chunks: List[DocumentChunk], embeddings: List[List[float]] = None):
+        """Append chunks and embeddings to disk, then remap the matrix"""
+        vectors = None
+        count = 0
+        if embeddings is not None and len(embeddings):
+            count = min(len(chunks), len(embeddings))
+            vectors = self._normalise(np.asarray(embeddings[:count], dtype=np.float32))
+        
+        first_row = self.storage.rows
+        records = [
+            {
+                "op": "add",
+                "id": chunk.id,
+                "content": chunk.content,
+                "metadata": dict(chunk.metadata),
+                "row": first_row + i if i < count else -1
+            }
+            for i, chunk in enumerate(chunks)
+        ]
+        self.storage.append(records, vectors)
+        self._matrix = self.storage.open_matrix()
+        
+        for record, chunk in zip(records, chunks):
+            self._apply_add(chunk, record["row"])
+    
+    def delete(self, chunk_ids: List[str]):
+        """Record deletions on disk and hide the rows from search"""
+        chunk_ids = [cid for cid in chunk_ids if cid in self.chunks]
+        if not chunk_ids:
+            return
+        
+        self.storage.append([{"op": "delete", "id": cid} for cid in chunk_ids])
+        for chunk_id in chunk_ids:
+            self._apply_delete(chunk_id)
+    
+    def update_metadata(self, chunks: List[DocumentChunk]):
+        """Record new metadata on disk without appending embedding rows"""
+        chunks = [chunk for chunk in chunks if chunk.id in self.chunks]
+        if not chunks:
+            return
+        
+        self.storage.append([
+            {"op": "metadata", "id": chunk.id, "metadata": dict(chunk.metadata)}
+            for chunk in chunks
+        ])
+        super().update_metadata(chunks)
+    
+    def clear(self):
+        """Clear all data, including the on-disk index"""
+        self.storage.clear()
+        super().clear()
+    
+    def reload(self):
+        """Re-read the directory, picking up appends from another process"""
+        super().clear()
+        self._load()
+    
+    def compact(self):
+        """Rewrite the directory without deleted or superseded rows"""
+        records = []
+        rows = []
+        for chunk_id, chunk in self.chunks.items():
+            row = self._id_to_row.get(chunk_id)
+            records.append({
+                "op": "add",
+                "id": chunk_id,
+                "content": chunk.content,
+                "metadata": dict(chunk.metadata),
+                "row": len(rows) if row is not None else -1
+            })
+            if row is not None:
+                rows.append(row)
+        
+        vectors = np.asarray(self._matrix[rows], dtype=np.float32) if rows else None
+        self.storage.compact(records, vectors)
+        self.reload()
+    
+    def _load(self):
+        """Replay the operation log over a memory-mapped matrix"""
+        records, self._matrix = self.storage.load()
+        self._row_ids = [None] * self.storage.rows
+        self._valid = np.zeros(self.storage.rows, dtype=bool)
+        
+        # Loaded metadata are plain dicts; re-share document-level fields between chunks
+        updates = [record for record in records if record["op"] in ("add", "metadata")]
+        for record, metadata in zip(updates, share_metadata(r.get("metadata", {}) for r in updates)):
+            record["metadata"] = metadata
+        
+        for record in records:
+            if record["op"] == "add":
+                chunk = DocumentChunk(
+                    id=record["id"],
+                    content=record["content"],
+                    metadata=record["metadata"]
+                )
+                self._apply_add(chunk, record.get("row", -1))
+            elif record["op"] == "metadata" and record["id"] in self.chunks:
+                chunk = self.chunks[record["id"]]
+                super().update_metadata([
+                    DocumentChunk(id=chunk.id, content=chunk.content, metadata=record["metadata"])
+                ])
+            elif record["op"] == "delete":
+                self._apply_delete(record["id"])
+        
+        if records:
+            logger.info(f"Loaded {self.size} chunks from {self.storage.directory}")
+    
+    def _apply_add(self, chunk: DocumentChunk, row: int):
+        """Register a chunk whose embedding (if any) lives at the given row"""
+        self._release_row(chunk.id)
+        self._register_chunk(chunk)
+        if row < 0:
+            return
+        
+        if row >= len(self._row_ids):
+            grow = row + 1 - len(self._row_ids)
+            self._row_ids.extend([None] * grow)
+            self._valid = np.concatenate([self._valid, np.zeros(grow, dtype=bool)])
+        self._row_ids[row] = chunk.id
+        self._valid[row] = True
+        self._id_to_row[chunk.id] = row
+    
+    def _apply_delete(self, chunk_id: str):
+        self._unregister_chunk(chunk_id)
+        self._release_row(chunk_id)
+    
+    def _release_row(self, chunk_id: str):
+        """Hide a chunk's current row; the read-only matrix itself is untouched"""
+        row = self._id_to_row.pop(chunk_id, None)
+        if row is not None:
+            self._row_ids[row] = None
+            self._valid[row] = False
+
+
 class EmbeddingProvider(ABC):
     """Abstract base class for embedding providers"""
     
@@ -450,8 +1293,13 @@ class EmbeddingProvider(ABC):
 class SentenceTransformerEmbedding(EmbeddingProvider):
     """Embedding provider using sentence-transformers"""
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        cache: Optional[EmbeddingCache] = None
+    ):
         self.model_name = model_name
+        self.cache = cache
         self._model = None
     
     def _get_model(self):
@@ -465,10 +1313,27 @@ class SentenceTransformerEmbedding(EmbeddingProvider):
         return self._model
     
     def embed(self, texts: List[str]) -> List[List[float]]:
-        model = self._get_model()
-        if model is None:
-            return []
-        return model.encode(texts).tolist()
+        if self.cache is None:
+            model = self._get_model()
+            if model is None:
+                return []
+            return model.encode(texts).tolist()
+        
+        # Only encode texts whose content hash is not cached for this model
+        hashes = [content_hash(text) for text in texts]
+        vectors = self.cache.get_many(self.model_name, hashes)
+        misses = {h: text for h, text in zip(hashes, texts) if h not in vectors}
+        
+        if misses:
+            model = self._get_model()
+            if model is None:
+                return []
+            encoded = model.encode(list(misses.values())).tolist()
+            fresh = dict(zip(misses.keys(), encoded))
+            self.cache.put_many(self.model_name, fresh.items())
+            vectors.update(fresh)
+        
+        return [vectors[h] for h in hashes]
     
     def embed_query(self, query: str) -> List[float]:
         model = self._get_model()
@@ -487,72 +1352,578 @@ class RAGEngine:
         self,
         embedding_model: str = "all-MiniLM-L6-v2",
         chunk_size: int = 1000,
-        chunk_overlap: int = 200
+        chunk_overlap: int = 200,
+        chunk_unit: str = "chars",
+        persist_directory: Optional[str] = None,
+        embedding_cache_path: Optional[str] = None,
+        vector_index: str = "flat",
+        index_params: Dict[str, Any] = None,
+        hybrid_fusion: str = "rrf",
+        query_cache_size: int = 512,
+        query_cache_ttl: Optional[float] = 300.0,
+        quantization: str = "float32",
+        rerank_factor: int = 0,
+        context_max_tokens: Optional[int] = None,
+        dedup_threshold: Optional[float] = None,
+        cross_encoder_model: Optional[str] = None,
+        rerank_candidates: int = 20,
+        rerank_budget_ms: Optional[float] = 250.0
     ):
-        self.processor = DocumentProcessor(chunk_size, chunk_overlap)
-        self.vector_store = InMemoryVectorStore()
+        self.processor = DocumentProcessor(chunk_size, chunk_overlap, chunk_unit)
+        self.vector_store = self._create_vector_store(
+            vector_index, persist_directory, index_params or {}, quantization, rerank_factor
+        )
+        self.vector_store.fusion = hybrid_fusion
+        self.documents = DocumentRegistry(
+            os.path.join(persist_directory, "documents.json") if persist_directory else None
+        )
         self.embedding_provider: Optional[EmbeddingProvider] = None
         
+        # Results are tagged with the index generation; embeddings of query strings never go stale
+        self.generation = 0
+        self.query_cache = QueryCache(query_cache_size, query_cache_ttl)
+        self.query_embedding_cache = QueryCache(query_cache_size)
+        
+        # Default token budget for generated context (None = no limit)
+        self.context_max_tokens = context_max_tokens
+        self.context_packer = ContextPacker()
+        
+        # Chunks this similar to a stored chunk are aliased to it instead of stored (None = off)
+        self.dedup_threshold = dedup_threshold
+        self._near_duplicates: Optional[NearDuplicateIndex] = None
+        
+        # Optional second stage: re-score the top rerank_candidates with a cross-encoder
+        self.reranker: Optional[CrossEncoderReranker] = None
+        if cross_encoder_model:
+            self.reranker = CrossEncoderReranker(
+                cross_encoder_model,
+                candidates=rerank_candidates,
+                latency_budget_ms=rerank_budget_ms
+            )
+        
+        # Cache embeddings next to a persistent index unless told otherwise
+        if embedding_cache_path is None and persist_directory:
+            embedding_cache_path = os.path.join(persist_directory, "embedding_cache.sqlite")
+        
         try:
-            self.embedding_provider = SentenceTransformerEmbedding(embedding_model)
+            cache = EmbeddingCache(embedding_cache_path) if embedding_cache_path else None
+            self.embedding_provider = SentenceTransformerEmbedding(embedding_model, cache=cache)
         except Exception as e:
             logger.warning(f"Could not initialize embedding provider: {e}")
     
+    @classmethod
+    def from_settings(cls, settings) -> "RAGEngine":
+        """Build an engine from RAGSettings (app.config)"""
+        return cls(
+            embedding_model=settings.embedding_model,
+            chunk_size=settings.chunk_size,
+            chunk_overlap=settings.chunk_overlap,
+            chunk_unit=settings.chunk_unit,
+            persist_directory=settings.persist_directory or None,
+            embedding_cache_path=settings.embedding_cache_path or None,
+            vector_index=settings.vector_index,
+            index_params={
+                "nlist": settings.ivf_nlist or None,
+                "nprobe": settings.ivf_nprobe,
+                "min_train_size": settings.ivf_min_train_size
+            },
+            hybrid_fusion=settings.hybrid_fusion,
+            query_cache_size=settings.query_cache_size,
+            query_cache_ttl=settings.query_cache_ttl or None,
+            quantization=settings.vector_quantization,
+            rerank_factor=settings.rerank_factor,
+            context_max_tokens=settings.context_max_tokens or None,
+            dedup_threshold=settings.dedup_threshold or None,
+            cross_encoder_model=settings.cross_encoder_model or None,
+            rerank_candidates=settings.rerank_candidates,
+            rerank_budget_ms=settings.rerank_budget_ms or None
+        )
+    
+    def _create_vector_store(
+        self,
+        vector_index: str,
+        persist_directory: Optional[str],
+        index_params: Dict[str, Any],
+        quantization: str = "float32",
+        rerank_factor: int = 0
+    ) -> VectorStore:
+        """Pick the vector store implementation"""
+        if persist_directory:
+            if vector_index != "flat":
+                logger.warning(f"Vector index '{vector_index}' is not persistent, using flat index on disk")
+            if quantization != "float32":
+                logger.warning(f"Quantization '{quantization}' is not persistent, storing float32 on disk")
+            return PersistentVectorStore(persist_directory)
+        
+        if rerank_factor > 0 and quantization != "float32":
+            logger.warning(
+                f"rerank_factor={rerank_factor} keeps a float32 copy of every embedding next to the "
+                f"{quantization} matrix, so quantization saves no memory"
+            )
+        if vector_index == "ivf":
+            return IVFVectorStore(**index_params, quantization=quantization, rerank_factor=rerank_factor)
+        if vector_index != "flat":
+            logger.warning(f"Unknown vector index '{vector_index}', using flat index")
+        return NumpyVectorStore(quantization=quantization, rerank_factor=rerank_factor)
+    
     def index_document(
         self, 
         content: str, 
         filename: str, 
-        metadata: Dict = None
+        metadata: Dict = None,
+        doc_id: Optional[str] = None
+    ) -> ProcessedDocument:
+        """
+        Index a document for retrieval
+        
+        Documents are identified by doc_id (default: derived from the filename),
+        so indexing a new version of a file replaces the previous one. Unchanged
+        content is skipped entirely; otherwise only new or changed chunks are
+        embedded and chunks the new version no longer contains are deleted.
+        """
+        doc_id = doc_id or document_key(filename)
+        if self._is_unchanged(doc_id, filename, content_hash(content), metadata):
+            logger.info(f"Document '{filename}' unchanged, skipping re-index")
+            return self._stored_document(self.documents.get(doc_id))
+        
+        doc = self.processor.process(content, filename, metadata, doc_id=doc_id)
+        self._sync_document(doc, metadata)
+        return doc
+    
+    def index_stream(
+        self,
+        blocks: Iterable[str],
+        filename: str,
+        metadata: Dict = None,
+        batch_size: int = 64,
+        doc_id: Optional[str] = None
     ) -> ProcessedDocument:
-        """Index a document for retrieval"""
-        # Process document
-        doc = self.processor.process(content, filename, metadata)
+        """
+        Index a document streamed as text blocks, embedding chunks in batches as they fill
+        Chunks already embedded in the store are not embedded again.
+        """
+        stream = self.processor.process_stream(blocks, filename, metadata, doc_id or document_key(filename))
+        chunks: List[DocumentChunk] = []
+        vectors: Dict[str, Any] = {}
+        pending: List[DocumentChunk] = []
         
-        # Generate embeddings if available
-        embeddings = None
-        if self.embedding_provider:
-            texts = [chunk.content for chunk in doc.chunks]
-            embeddings = self.embedding_provider.embed(texts)
+        # Chunks of the version being replaced cannot serve as canonical copies
+        record = self.documents.get(stream.doc_id)
+        replaced = set(record.chunk_ids) if record else set()
         
-        # Add to vector store
-        self.vector_store.add(doc.chunks, embeddings)
+        def flush():
+            fresh = [c for c in pending if self._canonical_chunk(c.content, replaced) is None]
+            vectors.update(self._embed_missing(fresh))
+            pending.clear()
         
-        logger.info(f"Indexed document '{filename}' with {doc.chunk_count} chunks")
+        for chunk in stream:
+            chunks.append(chunk)
+            pending.append(chunk)
+            if len(pending) >= batch_size:
+                flush()
+        flush()
+        
+        # Chunks are stored once document-level metadata is complete
+        doc = stream.to_document(chunks)
+        self._sync_document(doc, metadata, vectors)
         return doc
     
+    def remove_document(self, doc_id: str) -> bool:
+        """Remove a document and every chunk no other document shares"""
+        record = self.documents.get(doc_id)
+        if record is None:
+            return False
+        
+        orphaned = self.documents.remove(doc_id)
+        self._delete_chunks(orphaned)
+        self._reassign_shared_chunks(record.chunk_ids)
+        self.documents.save()
+        self._index_changed()
+        
+        logger.info(f"Removed document '{record.filename}' ({len(orphaned)} chunks deleted)")
+        return True
+    
+    def _sync_document(
+        self,
+        doc: ProcessedDocument,
+        metadata: Dict = None,
+        vectors: Dict[str, Any] = None
+    ):
+        """Store a processed document version, touching only chunks that changed"""
+        changed = self._changed_chunks(doc)
+        vectors = {**(vectors or {}), **self._embed_missing(changed, vectors)}
+        self._write_chunks(changed, vectors)
+        
+        orphaned = self._register_document(doc, metadata)
+        self._delete_chunks(orphaned)
+        self.documents.save()
+        self._index_changed()
+        
+        record = self.documents.get(doc.id)
+        logger.info(
+            f"Indexed document '{doc.filename}' v{record.version} with {doc.chunk_count} chunks "
+            f"({len(changed)} written, {len(doc.aliases)} near-duplicates, {len(orphaned)} removed)"
+        )
+    
+    def _changed_chunks(self, doc: ProcessedDocument) -> List[DocumentChunk]:
+        """
+        Unique chunks that are missing from the store, differ from it, or lack an embedding
+        New chunks that nearly duplicate a stored one are recorded in doc.aliases instead.
+        """
+        store = self.vector_store
+        changed = []
+        
+        for chunk in {chunk.id: chunk for chunk in doc.chunks}.values():
+            stored = store.chunks.get(chunk.id)
+            if (
+                stored is None
+                or not _same_metadata(stored.metadata, chunk.metadata)
+                or (self.embedding_provider and chunk.id not in store.embeddings)
+            ):
+                changed.append(chunk)
+        
+        return self._fold_near_duplicates(doc, changed)
+    
+    def _fold_near_duplicates(self, doc: ProcessedDocument, chunks: List[DocumentChunk]) -> List[DocumentChunk]:
+        """Alias new chunks to near-identical stored (or earlier new) chunks; returns the rest"""
+        index = self._duplicate_index()
+        if index is None:
+            return chunks
+        
+        # A chunk only the replaced version still references is about to be deleted
+        record = self.documents.get(doc.id)
+        current = {chunk.id for chunk in doc.chunks}
+        replaced = {
+            cid for cid in (record.chunk_ids if record else [])
+            if cid not in current and self.documents.references(cid) <= 1
+        }
+        
+        kept = []
+        for chunk in chunks:
+            canonical = None
+            if chunk.id not in self.vector_store.chunks:
+                canonical = self._canonical_chunk(chunk.content, replaced)
+            if canonical is not None and canonical != chunk.id:
+                doc.aliases[chunk.id] = canonical
+                continue
+            index.add(chunk.id, chunk.content)
+            kept.append(chunk)
+        return kept
+    
+    def _canonical_chunk(self, content: str, exclude: Set[str] = frozenset()) -> Optional[str]:
+        """ID of an indexed chunk nearly identical to content, if any"""
+        index = self._duplicate_index()
+        match = index.find(content, exclude) if index is not None else None
+        return match[0] if match else None
+    
+    def _duplicate_index(self) -> Optional[NearDuplicateIndex]:
+        """Near-duplicate index over stored chunks, built on first use"""
+        if not self.dedup_threshold:
+            return None
+        if self._near_duplicates is None:
+            index = NearDuplicateIndex(self.dedup_threshold)
+            for chunk_id, chunk in self.vector_store.chunks.items():
+                index.add(chunk_id, chunk.content)
+            self._near_duplicates = index
+        return self._near_duplicates
+    
+    def _delete_chunks(self, chunk_ids: List[str]):
+        """Delete chunks from the store and the near-duplicate index"""
+        self.vector_store.delete(chunk_ids)
+        if self._near_duplicates is not None:
+            for chunk_id in chunk_ids:
+                self._near_duplicates.remove(chunk_id)
+    
+    def _embed_missing(
+        self,
+        chunks: List[DocumentChunk],
+        known: Dict[str, Any] = None
+    ) -> Dict[str, Any]:
+        """Embed chunks that have no embedding yet, returning chunk_id -> embedding"""
+        if not self.embedding_provider:
+            return {}
+        
+        known = known or {}
+        return self._embed([
+            chunk for chunk in chunks
+            if chunk.id not in known and chunk.id not in self.vector_store.embeddings
+        ])
+    
+    def _embed(self, chunks: List[DocumentChunk]) -> Dict[str, Any]:
+        """Embed each distinct chunk once, returning chunk_id -> embedding"""
+        unique = list({chunk.id: chunk for chunk in chunks}.values())
+        if not self.embedding_provider or not unique:
+            return {}
+        
+        embeddings = self.embedding_provider.embed([chunk.content for chunk in unique])
+        return {chunk.id: embedding for chunk, embedding in zip(unique, embeddings or [])}
+    
+    def _write_chunks(self, chunks: List[DocumentChunk], vectors: Dict[str, Any]):
+        """Add new or re-embedded chunks; stored chunks only get their metadata replaced"""
+        store = self.vector_store
+        stored = [c for c in chunks if c.id not in vectors and c.id in store.chunks]
+        embedded = [c for c in chunks if c.id in vectors]
+        bare = [c for c in chunks if c.id not in vectors and c.id not in store.chunks]
+        
+        if stored:
+            store.update_metadata(stored)
+        if embedded:
+            store.add(embedded, [vectors[c.id] for c in embedded])
+        if bare:
+            store.add(bare)
+    
+    def _register_document(self, doc: ProcessedDocument, metadata: Dict = None) -> List[str]:
+        """Record a document version; returns chunk IDs no document references any more"""
+        previous = self.documents.get(doc.id)
+        orphaned = self.documents.register(DocumentRecord(
+            doc_id=doc.id,
+            filename=doc.filename,
+            fingerprint=self._version_fingerprint(doc.fingerprint, metadata),
+            chunk_ids=[doc.aliases.get(chunk.id, chunk.id) for chunk in doc.chunks],
+            metadata=doc.metadata,
+            aliases=dict(doc.aliases)
+        ))
+        if previous:
+            current = set(self.documents.get(doc.id).chunk_ids)
+            self._reassign_shared_chunks([cid for cid in previous.chunk_ids if cid not in current])
+        return orphaned
+    
+    def _reassign_shared_chunks(self, chunk_ids: Iterable[str]):
+        """
+        Give chunks a document dropped the metadata of another document containing them
+        
+        Chunk IDs are content hashes, so a passage shared by several documents
+        is stored once with the metadata of whichever document wrote it last.
+        Document-level fields and chunk_index come from the remaining document;
+        keywords and section paths are kept from the stored chunk.
+        """
+        owners = self.documents.owners(chunk_ids)
+        shared: Dict[str, DocumentMetadata] = {}
+        chunks = []
+        for chunk_id, record in owners.items():
+            stored = self.vector_store.chunks.get(chunk_id)
+            if stored is None:
+                continue
+            if record.doc_id not in shared:
+                shared[record.doc_id] = DocumentMetadata({**record.metadata, "filename": record.filename})
+            
+            values = {key: stored.metadata[key] for key in _CHUNK_FIELDS if key in stored.metadata}
+            values["chunk_index"] = record.chunk_ids.index(chunk_id)
+            chunks.append(DocumentChunk(
+                id=chunk_id,
+                content=stored.content,
+                metadata=shared[record.doc_id].append(values)
+            ))
+        
+        if chunks:
+            self.vector_store.update_metadata(chunks)
+    
+    def _is_unchanged(
+        self,
+        doc_id: str,
+        filename: str,
+        content_fingerprint: str,
+        metadata: Dict = None
+    ) -> bool:
+        """Whether this exact version of a document is already indexed"""
+        record = self.documents.get(doc_id)
+        return bool(
+            record
+            and record.filename == filename
+            and record.fingerprint == self._version_fingerprint(content_fingerprint, metadata)
+        )
+    
+    def _stored_document(self, record: DocumentRecord) -> ProcessedDocument:
+        """Rebuild a ProcessedDocument from the registry and the store"""
+        chunks = [
+            self.vector_store.chunks[chunk_id]
+            for chunk_id in record.chunk_ids if chunk_id in self.vector_store.chunks
+        ]
+        return ProcessedDocument(
+            id=record.doc_id,
+            filename=record.filename,
+            chunks=chunks,
+            metadata=record.metadata,
+            fingerprint=record.fingerprint
+        )
+    
+    @staticmethod
+    def _version_fingerprint(content_fingerprint: str, metadata: Dict = None) -> str:
+        """Fingerprint of everything that shapes the indexed chunks: content and caller metadata"""
+        if not metadata:
+            return content_fingerprint
+        return content_hash(f"{content_fingerprint}:{json.dumps(metadata, sort_keys=True, default=str)}")
+    
+    def index_many(
+        self,
+        sources: Iterable,
+        metadata: Dict = None,
+        max_workers: Optional[int] = None,
+        batch_size: int = 256,
+        queue_size: int = 8,
+        progress_callback: Optional[Callable] = None
+    ):
+        """
+        Bulk-index file paths or (filename, content[, key]) tuples
+        
+        Files are keyed by absolute path, so same-named files in different
+        folders are separate documents; tuples are keyed by key or filename.
+        Documents are parsed and chunked in a process pool, chunks from
+        different documents share fixed-size embedding batches, and a writer
+        thread feeds the vector store from a bounded queue. progress_callback
+        receives the live IngestionStats after every parsed document and
+        stored batch. Returns the final IngestionStats.
+        """
+        from .ingestion import IngestionPipeline
+        
+        pipeline = IngestionPipeline(
+            self,
+            max_workers=max_workers,
+            batch_size=batch_size,
+            queue_size=queue_size,
+            progress_callback=progress_callback
+        )
+        return pipeline.run(sources, metadata)
+    
     def query(
         self, 
         query: str, 
         top_k: int = 5, 
-        use_hybrid: bool = True
+        use_hybrid: bool = True,
+        filter: Optional[Dict[str, Any]] = None
     ) -> List[RetrievalResult]:
-        """Query the RAG engine"""
-        if self.embedding_provider:
-            query_embedding = self.embedding_provider.embed_query(query)
-            
-            if use_hybrid:
-                return self.vector_store.hybrid_search(query, query_embedding, top_k)
+        """
+        Query the RAG engine
+        filter restricts the search to chunks whose metadata facets match, e.g.
+        {"categories": "aml", "regulations_mentioned": "POJK 12/2017", "language": "id"}
+        Results are cached until the index changes or the TTL expires.
+        """
+        return self.query_many([query], top_k, use_hybrid, filter)[0]
+    
+    def query_many(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        use_hybrid: bool = True,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[RetrievalResult]]:
+        """Query the RAG engine with several queries, embedding the uncached ones in one batch"""
+        if not queries:
+            return []
+        
+        generation = self.generation
+        keys = [self._query_key(q, top_k, use_hybrid, filter) for q in queries]
+        results: List[Optional[List[RetrievalResult]]] = [self.query_cache.get(k, generation) for k in keys]
+        pending = [i for i, cached in enumerate(results) if cached is None]
+        
+        if pending:
+            texts = [queries[i] for i in pending]
+            for i, found in zip(pending, self._search_many(texts, top_k, use_hybrid, filter)):
+                results[i] = found
+                self.query_cache.put(keys[i], found, generation)
+        
+        return [list(found) for found in results]
+    
+    def _search_many(
+        self,
+        queries: List[str],
+        top_k: int,
+        use_hybrid: bool,
+        filter: Optional[Dict[str, Any]]
+    ) -> List[List[RetrievalResult]]:
+        if self.reranker is None:
+            return self._retrieve_many(queries, top_k, use_hybrid, filter)
+        
+        candidates = self._retrieve_many(queries, max(top_k, self.reranker.candidates), use_hybrid, filter)
+        return [self.reranker.rerank(q, found, top_k) for q, found in zip(queries, candidates)]
+    
+    def _retrieve_many(
+        self,
+        queries: List[str],
+        top_k: int,
+        use_hybrid: bool,
+        filter: Optional[Dict[str, Any]]
+    ) -> List[List[RetrievalResult]]:
+        if not self.embedding_provider:
+            return [self.vector_store.keyword_search(q, top_k, filter) for q in queries]
+        
+        query_embeddings = self._embed_queries(queries)
+        
+        if use_hybrid:
+            return self.vector_store.hybrid_search_many(queries, query_embeddings, top_k, filter=filter)
+        if not query_embeddings:
+            return [[] for _ in queries]
+        return self.vector_store.search_many(query_embeddings, top_k, filter)
+    
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed query strings, reusing cached embeddings of previously seen queries"""
+        keys = [normalise_query(q, lowercase=False) for q in queries]
+        embeddings = [self.query_embedding_cache.get(key) for key in keys]
+        missing = list(dict.fromkeys(key for key, e in zip(keys, embeddings) if e is None))
+        
+        if missing:
+            if len(missing) == 1:
+                computed = [self.embedding_provider.embed_query(missing[0])]
             else:
-                return self.vector_store.search(query_embedding, top_k)
-        else:
-            return self.vector_store.keyword_search(query, top_k)
+                computed = self.embedding_provider.embed(missing)
+            if not computed or len(computed) != len(missing):
+                return []
+            
+            fresh = dict(zip(missing, computed))
+            for key, embedding in fresh.items():
+                self.query_embedding_cache.put(key, embedding)
+            embeddings = [fresh[key] if e is None else e for key, e in zip(keys, embeddings)]
+        
+        return embeddings
     
-    def generate_context(self, query: str, top_k: int = 5) -> str:
-        """Generate context string from retrieved documents"""
-        results = self.query(query, top_k)
+    def generate_context(
+        self,
+        query: str,
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """
+        Generate context string from retrieved documents
+        Limited to max_tokens (default: context_max_tokens) when given; near-
+        duplicates are only dropped, and tokens only counted, under a budget.
+        """
+        max_tokens = max_tokens or self.context_max_tokens
+        generation = self.generation
+        key = ("context", max_tokens) + self._query_key(query, top_k, True, filter)
+        cached = self.query_cache.get(key, generation)
+        if cached is not None:
+            return cached
         
-        if not results:
+        packed = self.pack_context(query, top_k, filter, max_tokens)
+        if not packed.results:
             return "No relevant documents found."
         
-        context_parts = []
-        for i, result in enumerate(results, 1):
-            context_parts.append(
-                f"[Source {i}: {result.source_document}]\n"
-                f"{result.chunk.content}\n"
-                f"[Relevance: {result.score:.2f}]"
-            )
-        
-        return "\n\n---\n\n".join(context_parts)
+        self.query_cache.put(key, packed.text, generation)
+        return packed.text
+    
+    def pack_context(
+        self,
+        query: str,
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None
+    ) -> PackedContext:
+        """
+        Retrieve and pack context within a token budget
+        The returned PackedContext reports the tokens used, so callers can size
+        the rest of the prompt and the completion (LLMConfig.max_tokens) around it.
+        """
+        results = self.query(query, top_k, filter=filter)
+        return self.context_packer.pack(results, max_tokens or self.context_max_tokens)
+    
+    @staticmethod
+    def _query_key(query: str, top_k: int, use_hybrid: bool, filter: Optional[Dict[str, Any]]) -> Tuple:
+        return (normalise_query(query), top_k, use_hybrid, freeze(filter))
+    
+    def _index_changed(self):
+        """Bump the index generation, invalidating cached query results"""
+        self.generation += 1
     
     def get_stats(self) -> Dict[str, Any]:
         """Get statistics about indexed documents"""
@@ -562,15 +1933,33 @@ class RAGEngine:
             for cat in chunk.metadata.get("categories", ["unknown"]):
                 categories[cat] = categories.get(cat, 0) + 1
         
-        return {
+        stats = {
+            "total_documents": len(self.documents),
             "total_chunks": self.vector_store.size,
+            "near_duplicate_chunks": sum(len(record.aliases) for record in self.documents),
             "has_embeddings": len(self.vector_store.embeddings) > 0,
             "categories": categories
         }
+        
+        cache = getattr(self.embedding_provider, "cache", None)
+        if cache is not None:
+            stats["embedding_cache"] = cache.get_stats()
+        
+        stats["query_cache"] = {**self.query_cache.get_stats(), "generation": self.generation}
+        stats["query_embedding_cache"] = self.query_embedding_cache.get_stats()
+        stats["memory"] = self.vector_store.memory_usage()
+        if self.reranker is not None:
+            stats["reranker"] = self.reranker.get_stats()
+        
+        return stats
     
     def clear(self):
         """Clear all indexed documents"""
         self.vector_store.clear()
+        self.documents.clear()
+        self.documents.save()
+        self._near_duplicates = None
+        self._index_changed()
 
 
 class AuditRAGHelper:
@@ -603,11 +1992,19 @@ class AuditRAGHelper:
     
     def find_regulatory_references(self, regulation: str, top_k: int = 10) -> List[Dict]:
         """Find document sections referencing specific regulation"""
-        results = self.rag.query(regulation, top_k)
+        # Only chunks of documents citing the regulation are scored
+        results = self.rag.query(regulation, top_k, filter={"regulations_mentioned": regulation})
+        if not results:
+            # Not a citation the extractor recognises; fall back to plain retrieval
+            results = self.rag.query(regulation, top_k)
+        
+        target = normalise_regulation(regulation)
+        extractor = self.rag.processor.extractor
         
         references = []
         for result in results:
-            if regulation.upper() in result.chunk.content.upper():
+            cited = {normalise_regulation(r) for r in extractor.scan(result.chunk.content).regulations}
+            if target in cited or regulation.upper() in result.chunk.content.upper():
                 references.append({
                     "source": result.source_document,
                     "content": result.chunk.content,
@@ -639,51 +2036,68 @@ class AuditRAGHelper:
     def generate_audit_context(
         self, 
         audit_area: str, 
-        focus_areas: List[str] = None
+        focus_areas: List[str] = None,
+        max_tokens: Optional[int] = None
     ) -> str:
         """Generate comprehensive audit context for LLM"""
-        context_parts = []
-        
-        # General context
-        general_results = self.rag.query(audit_area, top_k=3)
-        if general_results:
-            context_parts.append("## Background Information")
-            for r in general_results:
-                context_parts.append(f"From {r.source_document}:\n{r.chunk.content}")
-        
-        # Risk context
-        risk_results = self.rag.query(f"{audit_area} risk issues problems", top_k=3)
-        if risk_results:
-            context_parts.append("\n## Risk Indicators")
-            for r in risk_results:
-                context_parts.append(f"From {r.source_document}:\n{r.chunk.content}")
-        
-        # Control context
-        control_results = self.rag.query(f"{audit_area} control procedure", top_k=3)
-        if control_results:
-            context_parts.append("\n## Existing Controls")
-            for r in control_results:
-                context_parts.append(f"From {r.source_document}:\n{r.chunk.content}")
-        
-        # Focus area context
-        if focus_areas:
-            for focus in focus_areas:
-                focus_results = self.rag.query(f"{audit_area} {focus}", top_k=2)
-                if focus_results:
-                    context_parts.append(f"\n## Focus: {focus}")
-                    for r in focus_results:
-                        context_parts.append(f"From {r.source_document}:\n{r.chunk.content}")
-        
-        return "\n\n".join(context_parts)
+        return self.pack_audit_context(audit_area, focus_areas, max_tokens).text
+    
+    def pack_audit_context(
+        self,
+        audit_area: str,
+        focus_areas: List[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> PackedContext:
+        """
+        Audit context packed within a token budget (default: the engine's)
+        With a budget, chunks compete on relevance across sections and repeats
+        across sections are dropped; without one every section lists all its results.
+        """
+        focus_areas = focus_areas or []
+        
+        queries = [
+            audit_area,
+            f"{audit_area} risk issues problems",
+            f"{audit_area} control procedure"
+        ]
+        focus_queries = [f"{audit_area} {focus}" for focus in focus_areas]
+        if self.rag.embedding_provider and focus_queries:
+            # One embedding batch for every section; both retrievals below reuse it
+            self.rag._embed_queries(queries + focus_queries)
+        general_results, risk_results, control_results = self.rag.query_many(queries, top_k=3)
+        focus_batches = self.rag.query_many(focus_queries, top_k=2)
+        
+        sections = [
+            ("## Background Information", general_results),
+            ("\n## Risk Indicators", risk_results),
+            ("\n## Existing Controls", control_results)
+        ] + [
+            (f"\n## Focus: {focus}", focus_results)
+            for focus, focus_results in zip(focus_areas, focus_batches)
+        ]
+        
+        budget = max_tokens or self.rag.context_max_tokens
+        return self.rag.context_packer.pack_sections(
+            sections,
+            budget,
+            format_block=lambda _, r, content: f"From {r.source_document}:\n{content}"
+        )
 
 
 __all__ = [
     'DocumentChunk',
+    'ChunkMetadata',
+    'DocumentMetadata',
     'RetrievalResult',
     'ProcessedDocument',
     'DocumentProcessor',
+    'DocumentStream',
     'VectorStore',
     'InMemoryVectorStore',
+    'NumpyVectorStore',
+    'IVFVectorStore',
+    'PersistentVectorStore',
+    'EmbeddingCache',
     'EmbeddingProvider',
     'SentenceTransformerEmbedding',
     'RAGEngine',
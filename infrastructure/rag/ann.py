@@ -0,0 +1,160 @@
+"""
+Approximate Nearest Neighbour Index
+IVF-flat (inverted file) index over L2-normalised embeddings, in pure NumPy
+"""
+
+from typing import List, Optional
+import logging
+import math
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class IVFIndex:
+    """
+    Inverted-file index: spherical k-means centroids with one row list each
+    
+    Search probes the nprobe closest centroids and only scores the rows filed
+    under them. Raising nprobe trades latency for recall; nprobe == nlist is
+    an exact search. Rows are plain integers owned by the caller (matrix rows),
+    so the index never copies embeddings.
+    """
+    
+    def __init__(
+        self,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        n_iter: int = 10,
+        max_train_points: int = 50_000,
+        seed: int = 0
+    ):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.max_train_points = max_train_points
+        self.seed = seed
+        self.reset()
+    
+    def reset(self):
+        """Forget centroids and all row assignments"""
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: List[List[int]] = []
+        self._list_arrays: List[Optional[np.ndarray]] = []
+        self._row_list = np.full(0, -1, dtype=np.int32)
+        self.trained_size = 0
+        self.filed = 0
+        self.stale = 0
+    
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+    
+    def train(self, vectors: np.ndarray):
+        """Fit centroids with spherical k-means on (a sample of) the vectors"""
+        rng = np.random.default_rng(self.seed)
+        count = len(vectors)
+        nlist = self.nlist or max(1, int(math.sqrt(count)))
+        nlist = min(nlist, count)
+        
+        if count > self.max_train_points:
+            sample = vectors[rng.choice(count, self.max_train_points, replace=False)]
+        else:
+            sample = np.asarray(vectors)
+        
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            # Re-seed empty clusters from random points instead of dropping them
+            if empty.any():
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+                norms[empty] = np.linalg.norm(sums[empty], axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = sums / norms
+        
+        self.centroids = centroids.astype(np.float32)
+        self._lists = [[] for _ in range(nlist)]
+        self._list_arrays = [None] * nlist
+        self._row_list = np.full(0, -1, dtype=np.int32)
+        self.trained_size = count
+        self.filed = 0
+        self.stale = 0
+        logger.info(f"Trained IVF index with {nlist} lists on {len(sample)} vectors")
+    
+    def add(self, rows: np.ndarray, vectors: np.ndarray):
+        """File rows under their nearest centroid (re-adding a row moves it)"""
+        if not self.trained or len(rows) == 0:
+            return
+        
+        rows = np.asarray(rows, dtype=np.int64)
+        needed = int(rows.max()) + 1
+        if needed > len(self._row_list):
+            grown = np.full(max(needed, 2 * len(self._row_list)), -1, dtype=np.int32)
+            grown[:len(self._row_list)] = self._row_list
+            self._row_list = grown
+        
+        assignments = np.argmax(np.asarray(vectors) @ self.centroids.T, axis=1)
+        refiled = int((self._row_list[rows] >= 0).sum())
+        self.stale += refiled
+        self.filed += len(rows) - refiled
+        self._row_list[rows] = assignments
+        for row, list_id in zip(rows.tolist(), assignments.tolist()):
+            self._lists[list_id].append(row)
+            self._list_arrays[list_id] = None
+    
+    def remove(self, rows: List[int]):
+        """Unfile rows; stale list entries are skipped at search time"""
+        for row in rows:
+            if row < len(self._row_list) and self._row_list[row] >= 0:
+                self._row_list[row] = -1
+                self.filed -= 1
+                self.stale += 1
+    
+    @property
+    def stale_ratio(self) -> float:
+        """Stale list entries (removed or moved rows) per filed row"""
+        return self.stale / max(self.filed, 1)
+    
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Rows filed under the nprobe centroids closest to a normalised query"""
+        nprobe = min(nprobe or self.nprobe, len(self._lists))
+        centroid_scores = self.centroids @ query
+        if nprobe < len(self._lists):
+            probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probes = np.arange(len(self._lists))
+        
+        found = []
+        for list_id in probes.tolist():
+            rows = self._list_array(list_id)
+            if rows.size:
+                found.append(rows[self._row_list[rows] == list_id])
+        
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+    
+    def compact(self):
+        """Drop stale entries from the row lists"""
+        for list_id, rows in enumerate(self._lists):
+            self._lists[list_id] = sorted({r for r in rows if self._row_list[r] == list_id})
+            self._list_arrays[list_id] = None
+        self.stale = 0
+    
+    def _list_array(self, list_id: int) -> np.ndarray:
+        """Row list as an array, cached until the list changes"""
+        rows = self._list_arrays[list_id]
+        if rows is None:
+            rows = np.asarray(self._lists[list_id], dtype=np.int64)
+            self._list_arrays[list_id] = rows
+        return rows
+
+
+__all__ = [
+    'IVFIndex'
+]
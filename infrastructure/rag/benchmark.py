@@ -0,0 +1,295 @@
+"""
+RAG Benchmarks
+Recall/latency measurements for the vector stores and the full RAGEngine
+
+Run with: python -m infrastructure.rag.benchmark --vectors 50000 --dim 384
+     or: python -m infrastructure.rag.benchmark --suite engine --documents 500 --output rag.json
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence
+import argparse
+import json
+import platform
+import random
+import time
+import tracemalloc
+
+import numpy as np
+
+from data.seeds import AUDIT_UNIVERSE, FRAUD_RED_FLAGS, REGULATIONS, RISK_FACTORS
+from infrastructure.rag import DocumentChunk, IVFVectorStore, NumpyVectorStore, RAGEngine
+
+
+def synthetic_embeddings(
+    count: int,
+    dim: int,
+    clusters: int = 64,
+    noise: float = 0.35,
+    seed: int = 0
+) -> np.ndarray:
+    """Clustered unit vectors, closer to real embedding distributions than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim))
+    vectors = centres[rng.integers(0, clusters, count)] + noise * rng.normal(size=(count, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def recall_at_k(expected: Sequence[Sequence[str]], actual: Sequence[Sequence[str]]) -> float:
+    """Mean fraction of the expected ids found in each actual result list"""
+    if not expected:
+        return 0.0
+    hits = [
+        len(set(e) & set(a)) / len(e)
+        for e, a in zip(expected, actual) if e
+    ]
+    return sum(hits) / len(hits) if hits else 0.0
+
+
+def _timed_search(store, queries: np.ndarray, top_k: int) -> Dict[str, Any]:
+    ids: List[List[str]] = []
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        results = store.search(query, top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids.append([r.chunk.id for r in results])
+    return {"ids": ids, "mean_latency_ms": float(np.mean(latencies))}
+
+
+def ann_recall_benchmark(
+    n_vectors: int = 20_000,
+    dim: int = 384,
+    n_queries: int = 100,
+    top_k: int = 10,
+    nlist: int = None,
+    nprobe_values: Sequence[int] = (1, 4, 8, 16, 32),
+    seed: int = 0
+) -> Dict[str, Any]:
+    """Compare IVFVectorStore recall@k and latency against the exact NumpyVectorStore"""
+    vectors = synthetic_embeddings(n_vectors + n_queries, dim, seed=seed)
+    corpus, queries = vectors[:n_vectors], vectors[n_vectors:]
+    chunks = [DocumentChunk(id=f"v{i}", content="", metadata={"filename": "synthetic"}) for i in range(n_vectors)]
+    
+    exact = NumpyVectorStore()
+    exact.add(chunks, corpus)
+    
+    ann = IVFVectorStore(nlist=nlist, min_train_size=1)
+    start = time.perf_counter()
+    ann.add(chunks, corpus)
+    build_seconds = time.perf_counter() - start
+    
+    baseline = _timed_search(exact, queries, top_k)
+    report: Dict[str, Any] = {
+        "n_vectors": n_vectors,
+        "dim": dim,
+        "top_k": top_k,
+        "nlist": len(ann.index.centroids),
+        "build_seconds": round(build_seconds, 3),
+        "exact_mean_latency_ms": round(baseline["mean_latency_ms"], 3),
+        "ivf": []
+    }
+    
+    for nprobe in nprobe_values:
+        ann.index.nprobe = nprobe
+        run = _timed_search(ann, queries, top_k)
+        report["ivf"].append({
+            "nprobe": nprobe,
+            f"recall@{top_k}": round(recall_at_k(baseline["ids"], run["ids"]), 4),
+            "mean_latency_ms": round(run["mean_latency_ms"], 3)
+        })
+    
+    return report
+
+
+@dataclass
+class SeedDocument:
+    """Synthetic audit document with one labelled finding per paragraph"""
+    filename: str
+    content: str
+    # (query, marker) pairs; the relevant chunks are those containing the marker
+    labels: List[tuple]
+
+
+def seed_corpus(documents: int = 200, findings: int = 8, seed: int = 0) -> List[SeedDocument]:
+    """
+    Audit reports assembled from data.seeds
+    
+    Each document covers one audit-universe area and lists findings built from
+    fraud red flags, regulations and risk factors. Every finding carries a
+    unit code unique to the corpus, so "red flag + unit" queries have a known
+    answer regardless of corpus size.
+    """
+    rng = random.Random(seed)
+    areas = [(group, area) for group, items in AUDIT_UNIVERSE.items() for area in items]
+    flags = [(category, flag) for category, items in FRAUD_RED_FLAGS.items() for flag in items]
+    regulations = [reg for regs in REGULATIONS.values() for reg in regs]
+    factors = [factor for items in RISK_FACTORS.values() for factor in items]
+    
+    corpus = []
+    for d in range(documents):
+        group, area = areas[d % len(areas)]
+        paragraphs = [f"Laporan Audit Internal {area} ({group}) - Periode {2020 + d % 5}."]
+        labels = []
+        for f in range(findings):
+            category, flag = rng.choice(flags)
+            regulation = rng.choice(regulations)
+            unit = f"KC{d:05d}{f:02d}"
+            marker = f"Temuan {f + 1} unit {unit}"
+            paragraphs.append(
+                f"{marker}: {flag} teridentifikasi pada proses {area}. "
+                f"Indikator ini termasuk kategori {category} dan menunjukkan kelemahan pada {rng.choice(factors)}. "
+                f"Acuan regulasi {regulation['code']} tentang {regulation['title']} ({regulation['category']}). "
+                f"Rekomendasi: perkuat {rng.choice(factors)} dan tindak lanjut dalam {rng.randint(1, 12)} bulan."
+            )
+            labels.append((f"{flag} unit {unit}", marker))
+        corpus.append(SeedDocument(f"audit_{d:05d}.txt", "\n\n".join(paragraphs), labels))
+    return corpus
+
+
+def _percentiles(latencies: Sequence[float]) -> Dict[str, float]:
+    values = np.asarray(latencies, dtype=np.float64)
+    if not len(values):
+        return {}
+    return {
+        "mean": round(float(values.mean()), 3),
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "p99": round(float(np.percentile(values, 99)), 3)
+    }
+
+
+def _index_corpus(engine: RAGEngine, corpus: Sequence[SeedDocument]) -> float:
+    start = time.perf_counter()
+    for doc in corpus:
+        engine.index_document(doc.content, doc.filename)
+    return time.perf_counter() - start
+
+
+def rag_engine_benchmark(
+    documents: int = 200,
+    findings: int = 8,
+    n_queries: int = 200,
+    top_k: int = 5,
+    keyword_only: bool = False,
+    measure_memory: bool = True,
+    seed: int = 0,
+    **engine_options: Any
+) -> Dict[str, Any]:
+    """
+    Index a seed corpus through RAGEngine and measure it end to end
+    
+    Reports indexing throughput, query latency percentiles, memory per chunk
+    and recall@k of the labelled findings. Without sentence-transformers (or
+    with keyword_only) the engine's keyword path is measured, and the report
+    says so in "mode". The query cache is off so every query is searched.
+    Memory is traced on a second, separate indexing run, since tracemalloc
+    would otherwise slow the timed one.
+    """
+    corpus = seed_corpus(documents, findings, seed)
+    engine_options.setdefault("query_cache_size", 0)
+    
+    def build() -> RAGEngine:
+        engine = RAGEngine(**engine_options)
+        if keyword_only:
+            engine.embedding_provider = None
+        return engine
+    
+    engine = build()
+    index_seconds = _index_corpus(engine, corpus)
+    stats = engine.get_stats()
+    chunks = stats["total_chunks"]
+    
+    # Label each finding with the chunks that contain it (overlap can put it in two)
+    labelled = [label for doc in corpus for label in doc.labels]
+    rng = random.Random(seed)
+    labelled = rng.sample(labelled, min(n_queries, len(labelled)))
+    by_marker: Dict[str, List[str]] = {marker: [] for _, marker in labelled}
+    for chunk in engine.vector_store.chunks.values():
+        for marker in by_marker:
+            if marker in chunk.content:
+                by_marker[marker].append(chunk.id)
+    
+    expected, actual, latencies = [], [], []
+    for query, marker in labelled:
+        start = time.perf_counter()
+        results = engine.query(query, top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        expected.append(by_marker[marker])
+        actual.append([r.chunk.id for r in results])
+    
+    report: Dict[str, Any] = {
+        "suite": "engine",
+        "mode": "hybrid" if stats["has_embeddings"] else "keyword",
+        "python": platform.python_version(),
+        "documents": documents,
+        "findings_per_document": findings,
+        "chunks": chunks,
+        "queries": len(labelled),
+        "top_k": top_k,
+        "index_seconds": round(index_seconds, 3),
+        "index_chunks_per_second": round(chunks / index_seconds, 1) if index_seconds else None,
+        "query_latency_ms": _percentiles(latencies),
+        f"recall@{top_k}": round(recall_at_k(expected, actual), 4),
+        "hit_rate": round(sum(1 for e, a in zip(expected, actual) if set(e) & set(a)) / max(len(labelled), 1), 4),
+        "vector_memory": stats["memory"]
+    }
+    
+    if measure_memory:
+        traced = build()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            _index_corpus(traced, corpus)
+            allocated = tracemalloc.get_traced_memory()[0] - before
+        finally:
+            tracemalloc.stop()
+        report["memory_bytes_per_chunk"] = round(allocated / chunks) if chunks else None
+    
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AURIX RAG benchmark")
+    parser.add_argument("--suite", choices=("ann", "engine"), default="ann")
+    parser.add_argument("--vectors", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--documents", type=int, default=200, help="engine suite: corpus size")
+    parser.add_argument("--findings", type=int, default=8, help="engine suite: findings per document")
+    parser.add_argument("--keyword-only", action="store_true", help="engine suite: skip embeddings")
+    parser.add_argument("--vector-index", default="flat", help="engine suite: flat or ivf")
+    parser.add_argument("--no-memory", action="store_true", help="engine suite: skip the traced indexing run")
+    parser.add_argument("--output", default=None, help="also write the JSON report to this file")
+    args = parser.parse_args()
+    
+    if args.suite == "engine":
+        report = rag_engine_benchmark(
+            documents=args.documents,
+            findings=args.findings,
+            n_queries=args.queries,
+            top_k=args.top_k,
+            keyword_only=args.keyword_only,
+            measure_memory=not args.no_memory,
+            vector_index=args.vector_index
+        )
+    else:
+        report = ann_recall_benchmark(
+            n_vectors=args.vectors,
+            dim=args.dim,
+            n_queries=args.queries,
+            top_k=args.top_k,
+            nlist=args.nlist
+        )
+    
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
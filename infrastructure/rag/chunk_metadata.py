@@ -0,0 +1,150 @@
+"""
+Shared Chunk Metadata
+Document-level fields stored once per document, per-chunk fields column-wise
+"""
+
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterable, Iterator, List, Mapping
+
+class _Sentinel:
+    """Column marker that stays the same object through pickling (process pools)"""
+    
+    __slots__ = ("name",)
+    
+    def __init__(self, name: str):
+        self.name = name
+    
+    def __reduce__(self) -> str:
+        # A string tells pickle to look the module global up by name
+        return self.name
+    
+    def __repr__(self) -> str:
+        return self.name
+
+
+# Column value meaning "use the document-level field"
+_SHARED = _Sentinel("_SHARED")
+# Column value meaning "deleted for this chunk"
+_DELETED = _Sentinel("_DELETED")
+
+
+class DocumentMetadata:
+    """
+    Metadata record shared by all chunks of one document
+    
+    fields holds the document-level values (categories, regulations, risk
+    indicators, ...) exactly once; columns holds per-chunk values such as
+    chunk_index as one list per field, indexed by the chunk's position.
+    """
+    
+    __slots__ = ("fields", "columns", "size")
+    
+    def __init__(self, fields: Mapping[str, Any] = None):
+        self.fields: Dict[str, Any] = dict(fields or {})
+        self.columns: Dict[str, List[Any]] = {}
+        self.size = 0
+    
+    def append(self, values: Mapping[str, Any] = None) -> "ChunkMetadata":
+        """Add a chunk with its own field values and return its metadata view"""
+        position = self.size
+        self.size += 1
+        for column in self.columns.values():
+            column.append(_SHARED)
+        for key, value in (values or {}).items():
+            self._set(key, position, value)
+        return ChunkMetadata(self, position)
+    
+    def _set(self, key: str, position: int, value: Any):
+        column = self.columns.get(key)
+        if column is None:
+            column = self.columns[key] = [_SHARED] * self.size
+        column[position] = value
+
+
+class ChunkMetadata(MutableMapping):
+    """
+    Dict-like view of one chunk's metadata
+    
+    Reads fall back from the chunk's column values to the document fields, so
+    callers see the same flat dict as before. Writes only affect this chunk.
+    """
+    
+    __slots__ = ("record", "position")
+    
+    def __init__(self, record: DocumentMetadata, position: int):
+        self.record = record
+        self.position = position
+    
+    def __getitem__(self, key: str) -> Any:
+        column = self.record.columns.get(key)
+        if column is not None:
+            value = column[self.position]
+            if value is _DELETED:
+                raise KeyError(key)
+            if value is not _SHARED:
+                return value
+        return self.record.fields[key]
+    
+    def __setitem__(self, key: str, value: Any):
+        self.record._set(key, self.position, value)
+    
+    def __delitem__(self, key: str):
+        if key not in self:
+            raise KeyError(key)
+        self.record._set(key, self.position, _DELETED)
+    
+    def __iter__(self) -> Iterator[str]:
+        for key in self.record.fields:
+            if key in self:
+                yield key
+        for key, column in self.record.columns.items():
+            if key not in self.record.fields and column[self.position] not in (_SHARED, _DELETED):
+                yield key
+    
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+    
+    def __contains__(self, key: object) -> bool:
+        column = self.record.columns.get(key)
+        value = column[self.position] if column is not None else _SHARED
+        if value is _SHARED:
+            return key in self.record.fields
+        return value is not _DELETED
+    
+    def copy(self) -> Dict[str, Any]:
+        return dict(self)
+    
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+def share_metadata(metadatas: Iterable[Mapping[str, Any]]) -> List[ChunkMetadata]:
+    """
+    Rebuild shared records from plain per-chunk dicts (e.g. loaded from disk)
+    
+    Chunks are grouped by filename; fields with the same value across a group
+    become document fields, the rest become columns.
+    """
+    metadatas = list(metadatas)
+    groups: Dict[Any, List[int]] = {}
+    for i, metadata in enumerate(metadatas):
+        groups.setdefault(metadata.get("filename"), []).append(i)
+    
+    shared: List[ChunkMetadata] = [None] * len(metadatas)
+    for members in groups.values():
+        first = metadatas[members[0]]
+        fields = {
+            key: value for key, value in first.items()
+            if all(key in metadatas[i] and metadatas[i][key] == value for i in members[1:])
+        }
+        record = DocumentMetadata(fields)
+        for i in members:
+            shared[i] = record.append({k: v for k, v in metadatas[i].items() if k not in fields})
+    return shared
+
+
+__all__ = [
+    'DocumentMetadata',
+    'ChunkMetadata',
+    'share_metadata'
+]
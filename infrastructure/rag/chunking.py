@@ -0,0 +1,273 @@
+"""
+Structure-Aware Chunking
+Splits documents on regulation articles (BAB, Bagian, Paragraf, Pasal, Ayat)
+and Markdown headings, with overlap measured in characters or tokens
+"""
+
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+import re
+
+from .context import TokenCounter
+
+CHUNK_UNITS = ("chars", "tokens")
+
+# Path levels; Markdown headings map "#" to 0, "##" to 1, ...
+LEVEL_NAMES = ("BAB", "Bagian", "Paragraf", "Pasal", "Ayat")
+_AYAT_LEVEL = 4
+
+_HEADING_PATTERNS = (
+    (0, re.compile(r'^BAB\s+(?:[IVXLCDM]+|\d+)\b.{0,80}$')),
+    (1, re.compile(r'^Bagian\s+\w+$')),
+    (2, re.compile(r'^Paragraf\s+\d+$')),
+    (3, re.compile(r'^Pasal\s+\d+[A-Z]?$')),
+)
+_MARKDOWN_HEADING_RE = re.compile(r'^(#{1,5})\s+(.+?)\s*#*$')
+_AYAT_RE = re.compile(r'^\((\d+[a-z]?)\)\s')
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+')
+_ENDS_SENTENCE_RE = re.compile(r'[.!?]\s*$')
+
+# A path is one label per level ("" where a level is not set)
+SectionPath = Tuple[str, ...]
+# (section path, text, heading level or None)
+_Unit = Tuple[SectionPath, str, Optional[int]]
+
+
+def format_path(path: SectionPath) -> str:
+    """'BAB II > Pasal 5 > Ayat (2)' from a section path"""
+    return " > ".join(label for label in path if label)
+
+
+class _StructureScanner:
+    """
+    Line-by-line scanner turning text into sentences tagged with their section
+    
+    Lines are fed one at a time, so whole documents and streamed blocks give the
+    same output. Unfinished sentences are carried to the next line, and a
+    heading is held for one line in case its title follows ("BAB I" then
+    "KETENTUAN UMUM").
+    """
+    
+    def __init__(self):
+        self.path: List[str] = [""] * len(LEVEL_NAMES)
+        self.pending = ""
+        self.heading: Optional[Tuple[int, str, bool]] = None
+    
+    def feed_line(self, line: str) -> List[_Unit]:
+        line = " ".join(line.split())
+        if not line:
+            return self._flush()
+        
+        held, self.heading = self.heading, None
+        if held is not None:
+            level, text, titled = held
+            if titled and self._is_title(line):
+                self.path[level] = f"{self.path[level]} {line}"
+                return [(self.section, f"{text} {line}", level)]
+            units = [(self.section, text, level)]
+        else:
+            units = []
+        
+        level, label = self._heading(line)
+        if level is not None:
+            units += self._flush()
+            self._set_level(level, label)
+            self.heading = (level, line, level < 3 and not _MARKDOWN_HEADING_RE.match(line))
+            return units
+        
+        ayat = _AYAT_RE.match(line)
+        if ayat:
+            units += self._flush()
+            self._set_level(_AYAT_LEVEL, f"Ayat ({ayat.group(1)})")
+        
+        self.pending = f"{self.pending} {line}" if self.pending else line
+        sentences = [s for s in _SENTENCE_END_RE.split(self.pending) if s]
+        self.pending = "" if _ENDS_SENTENCE_RE.search(line) else sentences.pop()
+        return units + [(self.section, s, None) for s in sentences]
+    
+    def finish(self) -> List[_Unit]:
+        return self._flush()
+    
+    @property
+    def section(self) -> SectionPath:
+        return tuple(self.path)
+    
+    def _flush(self) -> List[_Unit]:
+        units = []
+        if self.heading is not None:
+            level, text, _ = self.heading
+            self.heading = None
+            units.append((self.section, text, level))
+        pending, self.pending = self.pending, ""
+        return units + [(self.section, s, None) for s in _SENTENCE_END_RE.split(pending) if s]
+    
+    def _set_level(self, level: int, label: str):
+        self.path[level] = label
+        for deeper in range(level + 1, len(self.path)):
+            self.path[deeper] = ""
+    
+    @staticmethod
+    def _is_title(line: str) -> bool:
+        return (
+            len(line) <= 100
+            and not _ENDS_SENTENCE_RE.search(line)
+            and not _AYAT_RE.match(line)
+            and _StructureScanner._heading(line)[0] is None
+        )
+    
+    @staticmethod
+    def _heading(line: str) -> Tuple[Optional[int], str]:
+        markdown = _MARKDOWN_HEADING_RE.match(line)
+        if markdown:
+            return len(markdown.group(1)) - 1, markdown.group(2)
+        for level, pattern in _HEADING_PATTERNS:
+            if pattern.match(line):
+                return level, line
+        return None, ""
+
+
+class StructuredChunker:
+    """
+    Packs sentences into chunks of up to chunk_size, breaking at document structure
+    
+    A chapter heading (BAB, "#") always starts a new chunk; other headings
+    (Bagian, Paragraf, Pasal) start one once the current chunk is at least
+    min_fill full, so short articles are packed together instead of becoming
+    many tiny chunks. Chunks cut for size repeat up to chunk_overlap of the
+    previous chunk's trailing sentences (or words, if no whole sentence fits);
+    chunks starting at a heading carry no overlap. Sizes are measured in
+    characters or, with unit="tokens", in tokens.
+    """
+    
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        unit: str = "chars",
+        min_fill: float = 0.5,
+        counter: Optional[TokenCounter] = None
+    ):
+        if unit not in CHUNK_UNITS:
+            raise ValueError(f"Unknown chunk unit '{unit}', expected one of {', '.join(CHUNK_UNITS)}")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = max(0, chunk_overlap)
+        self.unit = unit
+        self.min_fill = min_fill
+        self._counter = counter
+        # Separator cost between joined pieces
+        self._joiner = 1 if unit == "chars" else 0
+    
+    def length(self, text: str) -> int:
+        if self.unit == "chars":
+            return len(text)
+        if self._counter is None:
+            self._counter = TokenCounter()
+        return self._counter.count(text)
+    
+    def split(self, text: str) -> List[Tuple[str, List[SectionPath]]]:
+        """(chunk text, section paths it covers) for a whole document"""
+        return list(self.iter_chunks([text]))
+    
+    def iter_chunks(
+        self,
+        blocks: Iterable[str],
+        on_block: Optional[Callable[[str], None]] = None
+    ) -> Iterator[Tuple[str, List[SectionPath]]]:
+        """Chunks from streamed blocks, yielded as soon as they fill (blocks end at a line break)"""
+        parts: List[Tuple[str, SectionPath]] = []
+        carried = 0
+        size = 0
+        
+        for path, text, heading in self._units(blocks, on_block):
+            for i, piece in enumerate(self._fit(text)):
+                cost = self.length(piece)
+                new_parts = len(parts) - carried
+                boundary = heading is not None and i == 0 and new_parts and (
+                    heading == 0 or size >= self.min_fill * self.chunk_size
+                )
+                if boundary:
+                    yield self._emit(parts, carried)
+                    parts, carried, size = [], 0, 0
+                elif heading is not None and i == 0 and carried and not new_parts:
+                    # A size cut just before a heading: the new section starts clean
+                    parts, carried, size = [], 0, 0
+                elif new_parts and size + self._joiner + cost > self.chunk_size:
+                    yield self._emit(parts, carried)
+                    parts = self._overlap(parts, self.chunk_size - cost - self._joiner)
+                    carried = len(parts)
+                    size = self._size(parts)
+                
+                size += cost + (self._joiner if parts else 0)
+                parts.append((piece, path))
+        
+        if len(parts) > carried:
+            yield self._emit(parts, carried)
+    
+    def _units(self, blocks: Iterable[str], on_block) -> Iterator[_Unit]:
+        scanner = _StructureScanner()
+        for block in blocks:
+            if on_block is not None:
+                on_block(block)
+            for line in block.split("\n"):
+                yield from scanner.feed_line(line)
+        yield from scanner.finish()
+    
+    @staticmethod
+    def _emit(parts: List[Tuple[str, SectionPath]], carried: int) -> Tuple[str, List[SectionPath]]:
+        # Sections are reported from the first new piece; the overlap belongs to the previous chunk
+        paths = list(dict.fromkeys(path for _, path in parts[carried:]))
+        return " ".join(text for text, _ in parts), paths
+    
+    def _size(self, parts: List[Tuple[str, SectionPath]]) -> int:
+        return sum(self.length(text) for text, _ in parts) + self._joiner * max(len(parts) - 1, 0)
+    
+    def _overlap(self, parts: List[Tuple[str, SectionPath]], room: int) -> List[Tuple[str, SectionPath]]:
+        """Trailing sentences (or words of the last one) within chunk_overlap and room"""
+        limit = min(self.chunk_overlap, room)
+        if limit <= 0 or not parts:
+            return []
+        
+        kept: List[Tuple[str, SectionPath]] = []
+        size = 0
+        for text, path in reversed(parts):
+            cost = self.length(text) + (self._joiner if kept else 0)
+            if size + cost > limit:
+                break
+            kept.insert(0, (text, path))
+            size += cost
+        if kept:
+            return kept
+        
+        text, path = parts[-1]
+        words = text.split()
+        tail: List[str] = []
+        for word in reversed(words):
+            if self.length(" ".join([word] + tail)) > limit:
+                break
+            tail.insert(0, word)
+        return [(" ".join(tail), path)] if tail else []
+    
+    def _fit(self, text: str) -> List[str]:
+        """Split a sentence longer than chunk_size at word boundaries"""
+        if self.length(text) <= self.chunk_size:
+            return [text]
+        
+        pieces, words, size = [], [], 0
+        for word in text.split():
+            cost = self.length(word) + (self._joiner if words else 0)
+            if words and size + cost > self.chunk_size:
+                pieces.append(" ".join(words))
+                words, size = [], 0
+                cost = self.length(word)
+            words.append(word)
+            size += cost
+        if words:
+            pieces.append(" ".join(words))
+        return pieces
+
+
+__all__ = [
+    'CHUNK_UNITS',
+    'LEVEL_NAMES',
+    'StructuredChunker',
+    'format_path'
+]
@@ -0,0 +1,295 @@
+"""
+Context Packing
+Fits retrieved chunks into an LLM token budget
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Sequence, Set, Tuple
+import logging
+import math
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+')
+_TOKEN_ESTIMATE_RE = re.compile(r'\w+|[^\w\s]')
+_WORD_RE = re.compile(r'\w+')
+
+
+class TokenCounter:
+    """
+    Token counts with tiktoken, cached per text
+    
+    Without tiktoken the count is a conservative estimate (the larger of
+    word/punctuation pieces and characters / 4), and `exact` is False.
+    """
+    
+    def __init__(self, encoding: str = "cl100k_base", max_entries: int = 50_000):
+        self.encoding_name = encoding
+        self.max_entries = max_entries
+        self._encoding = None
+        self._loaded = False
+        self._counts: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @property
+    def encoding(self):
+        """Lazy load the tiktoken encoding"""
+        if not self._loaded:
+            self._loaded = True
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding(self.encoding_name)
+            except Exception as e:
+                logger.warning(f"tiktoken unavailable ({e}), estimating token counts")
+        return self._encoding
+    
+    @property
+    def exact(self) -> bool:
+        return self.encoding is not None
+    
+    def count(self, text: str) -> int:
+        with self._lock:
+            cached = self._counts.get(text)
+            if cached is not None:
+                self._counts.move_to_end(text)
+                return cached
+        
+        tokens = self._count(text)
+        with self._lock:
+            self._counts[text] = tokens
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return tokens
+    
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of whole sentences within max_tokens (whole words if no sentence fits)"""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        
+        sentences = _SENTENCE_END_RE.split(text.strip())
+        kept = self._longest_prefix(sentences, " ", max_tokens)
+        if kept:
+            return " ".join(sentences[:kept])
+        
+        words = sentences[0].split()
+        kept = self._longest_prefix(words, " ", max_tokens)
+        return " ".join(words[:kept])
+    
+    def _longest_prefix(self, parts: List[str], joiner: str, max_tokens: int) -> int:
+        """Binary search for the most leading parts whose join fits"""
+        low, high = 0, len(parts)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self._count(joiner.join(parts[:middle])) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+    
+    def _count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return max(len(_TOKEN_ESTIMATE_RE.findall(text)), math.ceil(len(text) / 4))
+
+
+@dataclass
+class PackedContext:
+    """Context text plus what went into it (tokens is None when packed without a budget)"""
+    text: str
+    tokens: Optional[int]
+    budget: Optional[int]
+    results: List[Any] = field(default_factory=list)
+    duplicates_dropped: int = 0
+    truncated: int = 0
+    exact_count: bool = True
+    
+    @property
+    def remaining(self) -> Optional[int]:
+        return None if self.budget is None or self.tokens is None else self.budget - self.tokens
+
+
+BlockFormatter = Callable[[int, Any, str], str]
+
+
+def default_block(index: int, result: Any, content: str) -> str:
+    """Numbered source block, as used by RAGEngine.generate_context"""
+    return f"[Source {index}: {result.source_document}]\n{content}\n[Relevance: {result.score:.2f}]"
+
+
+class ContextPacker:
+    """
+    Greedy token-budget packer for retrieval results
+    
+    Candidates are taken best score first. A chunk that mostly repeats one
+    already taken (overlapping chunks, the same passage in two documents) is
+    dropped; a chunk that does not fit is skipped in favour of smaller ones,
+    and once nothing else fits the best skipped chunk is cut at a sentence
+    boundary to fill what is left (if at least min_truncated_tokens).
+    Token counts are cached, so repeat packs of the same chunks are cheap.
+    Without a budget every result is kept as is and nothing is counted.
+    """
+    
+    def __init__(
+        self,
+        counter: Optional[TokenCounter] = None,
+        duplicate_threshold: float = 0.8,
+        min_truncated_tokens: int = 32,
+        separator: str = "\n\n---\n\n"
+    ):
+        self.counter = counter or TokenCounter()
+        self.duplicate_threshold = duplicate_threshold
+        self.min_truncated_tokens = min_truncated_tokens
+        self.separator = separator
+    
+    def pack(
+        self,
+        results: Sequence[Any],
+        max_tokens: Optional[int] = None,
+        format_block: BlockFormatter = default_block
+    ) -> PackedContext:
+        """Pack one ranked list of RetrievalResults"""
+        return self.pack_sections([(None, results)], max_tokens, format_block, self.separator)
+    
+    def pack_sections(
+        self,
+        sections: Sequence[Tuple[Optional[str], Sequence[Any]]],
+        max_tokens: Optional[int] = None,
+        format_block: BlockFormatter = default_block,
+        separator: str = "\n\n",
+        deduplicate: Optional[bool] = None
+    ) -> PackedContext:
+        """
+        Pack several titled result lists under one budget
+        
+        Chunks compete on score across sections and are de-duplicated across
+        them (by default only when there is a budget); output keeps section
+        order, and a section title is only emitted (and counted) when at least
+        one of its chunks is included.
+        """
+        if deduplicate is None:
+            deduplicate = max_tokens is not None
+        counter = self.counter
+        # Counting may load tiktoken; without a budget there is nothing to count for
+        separator_tokens = counter.count(separator) if max_tokens is not None else 0
+        candidates = [
+            (result.score, s, r, result)
+            for s, (_, results) in enumerate(sections)
+            for r, result in enumerate(results)
+        ]
+        candidates.sort(key=lambda c: (-c[0], c[1], c[2]))
+        # Blocks are numbered in reading order once packed; cost them with the widest number
+        widest = max(len(candidates), 1)
+        
+        used = 0
+        taken: List[Tuple[int, int, str, Any]] = []
+        titled: Set[int] = set()
+        shingles: List[Set[Tuple[str, ...]]] = []
+        skipped = []
+        duplicates = 0
+        
+        def cost(section: int, result: Any, content: str) -> int:
+            # Chunk text is counted (and cached) on its own; the per-query frame separately
+            tokens = counter.count(content) + counter.count(format_block(widest, result, ""))
+            tokens += separator_tokens if taken else 0
+            title = sections[section][0]
+            if title and section not in titled:
+                tokens += counter.count(title) + separator_tokens
+            return tokens
+        
+        def take(section: int, rank: int, content: str, result: Any, tokens: int):
+            nonlocal used
+            used += tokens
+            titled.add(section)
+            taken.append((section, rank, content, result))
+        
+        for _, section, rank, result in candidates:
+            content = result.chunk.content
+            words = _shingles(content) if deduplicate else set()
+            if deduplicate and any(_containment(words, other) >= self.duplicate_threshold for other in shingles):
+                duplicates += 1
+                continue
+            
+            tokens = cost(section, result, content) if max_tokens is not None else 0
+            if max_tokens is None or used + tokens <= max_tokens:
+                take(section, rank, content, result, tokens)
+                shingles.append(words)
+            else:
+                skipped.append((section, rank, result))
+        
+        if skipped and max_tokens is not None:
+            section, rank, result = skipped[0]
+            room = max_tokens - used - cost(section, result, "")
+            if room >= self.min_truncated_tokens:
+                content = counter.truncate(result.chunk.content, room)
+                tokens = cost(section, result, content)
+                if content and used + tokens <= max_tokens:
+                    take(section, rank, content, result, tokens)
+        
+        text = self._render(sections, taken, format_block, separator)
+        if max_tokens is None:
+            return PackedContext(
+                text=text,
+                tokens=None,
+                budget=None,
+                results=[result for _, _, _, result in sorted(taken, key=lambda t: (t[0], t[1]))],
+                duplicates_dropped=duplicates,
+                exact_count=False
+            )
+        
+        tokens = counter.count(text) if text else 0
+        # Counting parts separately can be off by a token at the joins; never exceed the budget
+        while tokens > max_tokens and taken:
+            taken.pop()
+            text = self._render(sections, taken, format_block, separator)
+            tokens = counter.count(text) if text else 0
+        
+        return PackedContext(
+            text=text,
+            tokens=tokens,
+            budget=max_tokens,
+            results=[result for _, _, _, result in sorted(taken, key=lambda t: (t[0], t[1]))],
+            duplicates_dropped=duplicates,
+            truncated=sum(1 for _, _, content, result in taken if content != result.chunk.content),
+            exact_count=counter.exact
+        )
+    
+    @staticmethod
+    def _render(sections, taken, format_block: BlockFormatter, separator: str) -> str:
+        """Join blocks in section and rank order, numbering sources in reading order"""
+        parts = []
+        index = 0
+        for section in sorted({t[0] for t in taken}):
+            title = sections[section][0]
+            if title:
+                parts.append(title)
+            for _, _, content, result in sorted((t for t in taken if t[0] == section), key=lambda t: t[1]):
+                index += 1
+                parts.append(format_block(index, result, content))
+        return separator.join(parts)
+
+
+def _shingles(text: str, size: int = 3) -> Set[Tuple[str, ...]]:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _containment(a: Set, b: Set) -> float:
+    """Share of the smaller shingle set found in the other"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+__all__ = [
+    'TokenCounter',
+    'PackedContext',
+    'ContextPacker',
+    'default_block'
+]
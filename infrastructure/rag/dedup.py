@@ -0,0 +1,124 @@
+"""
+Near-Duplicate Detection
+MinHash signatures with LSH banding over chunk word shingles
+"""
+
+from typing import Collection, Dict, List, Optional, Set, Tuple
+import re
+import zlib
+
+import numpy as np
+
+_WORD_RE = re.compile(r'\w+')
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """Lower-cased word n-grams (the whole text when it has fewer than size words)"""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class NearDuplicateIndex:
+    """
+    Finds stored texts whose shingle Jaccard similarity reaches a threshold
+    
+    Each text gets a MinHash signature of num_perm values, split into bands;
+    texts sharing any band land in the same bucket and become candidates,
+    which are then verified with exact Jaccard on their shingles. With the
+    default 16 bands of 4 rows, pairs at Jaccard 0.8 are found with
+    probability > 0.999, so the threshold rather than LSH decides.
+    Only references to the indexed texts are kept, not copies.
+    """
+    
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        
+        rng = np.random.default_rng(seed)
+        # a < 2**29 and shingle hashes < 2**32 keep a * x + b below 2**62, so uint64 never overflows
+        self._a = rng.integers(1, 1 << 29, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        
+        self._buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(bands)]
+        self._keys: Dict[str, Tuple[bytes, ...]] = {}
+        self._texts: Dict[str, str] = {}
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    def add(self, key: str, text: str):
+        if key in self._keys:
+            self.remove(key)
+        
+        band_keys = self._band_keys(shingles(text))
+        for band, band_key in enumerate(band_keys):
+            self._buckets[band].setdefault(band_key, set()).add(key)
+        self._keys[key] = band_keys
+        self._texts[key] = text
+    
+    def remove(self, key: str):
+        band_keys = self._keys.pop(key, None)
+        self._texts.pop(key, None)
+        if band_keys is None:
+            return
+        
+        for band, band_key in enumerate(band_keys):
+            bucket = self._buckets[band].get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band][band_key]
+    
+    def clear(self):
+        self._buckets = [{} for _ in range(self.bands)]
+        self._keys.clear()
+        self._texts.clear()
+    
+    def find(self, text: str, exclude: Collection[str] = ()) -> Optional[Tuple[str, float]]:
+        """Most similar indexed key at or above the threshold, with its similarity"""
+        words = shingles(text)
+        candidates: Set[str] = set()
+        for band, band_key in enumerate(self._band_keys(words)):
+            candidates |= self._buckets[band].get(band_key, set())
+        
+        best: Optional[Tuple[str, float]] = None
+        for key in sorted(candidates):
+            if key in exclude:
+                continue
+            similarity = jaccard(words, shingles(self._texts[key]))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (key, similarity)
+        return best
+    
+    def _band_keys(self, words: Set[str]) -> Tuple[bytes, ...]:
+        if words:
+            hashes = np.fromiter((zlib.crc32(w.encode()) for w in words), dtype=np.uint64, count=len(words))
+            signature = ((np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME).min(axis=0)
+        else:
+            signature = np.zeros(len(self._a), dtype=np.uint64)
+        return tuple(
+            signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        )
+
+
+__all__ = [
+    'shingles',
+    'jaccard',
+    'NearDuplicateIndex'
+]
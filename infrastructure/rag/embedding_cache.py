@@ -0,0 +1,140 @@
+"""
+Embedding Cache
+SQLite-backed cache of embeddings keyed by (model name, content hash)
+"""
+
+from typing import Dict, Iterable, List, Tuple
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(text: str) -> str:
+    """MD5 of chunk content, the same digest DocumentProcessor uses for chunk ids"""
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Size-bounded embedding cache in a local SQLite file
+    Least recently used entries are evicted once max_entries is exceeded.
+    Use ":memory:" as path for a process-local cache.
+    """
+    
+    def __init__(self, path: str = ":memory:", max_entries: int = 200_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._last_tick = 0.0
+        
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " content_hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, content_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+    
+    def get_many(self, model: str, hashes: Iterable[str]) -> Dict[str, List[float]]:
+        """Look up embeddings, returning only the hashes that were found"""
+        hashes = list(dict.fromkeys(hashes))
+        found: Dict[str, List[float]] = {}
+        
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT content_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND content_hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            
+            if found:
+                now = self._tick()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND content_hash = ?",
+                    [(now, model, key) for key in found]
+                )
+                self._conn.commit()
+        
+        self.hits += len(found)
+        self.misses += len(hashes) - len(found)
+        return found
+    
+    def put_many(self, model: str, items: Iterable[Tuple[str, List[float]]]):
+        """Store embeddings and evict the least recently used overflow"""
+        now = self._tick()
+        rows = [
+            (model, key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, vector in items
+        ]
+        if not rows:
+            return
+        
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, content_hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self._conn.commit()
+    
+    def clear(self):
+        """Remove all cached embeddings"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+    
+    def _tick(self) -> float:
+        """Strictly increasing timestamp so recency ties cannot occur"""
+        self._last_tick = max(time.time(), self._last_tick + 1e-6)
+        return self._last_tick
+    
+    def _evict(self):
+        overflow = self.size - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                (overflow,)
+            )
+            logger.debug(f"Evicted {overflow} cached embeddings")
+    
+    @property
+    def size(self) -> int:
+        """Number of cached embeddings"""
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            size = self.size
+        return {"hits": self.hits, "misses": self.misses, "entries": size}
+
+
+__all__ = [
+    'content_hash',
+    'EmbeddingCache'
+]
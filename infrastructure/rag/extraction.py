@@ -0,0 +1,144 @@
+"""
+Keyword Extraction Engine
+Precompiled single-pass scanner for audit keywords and regulation references
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Set
+import re
+
+
+@dataclass
+class ExtractionResult:
+    """Everything one scan of a text found"""
+    keywords: Set[str] = field(default_factory=set)
+    function_words: Set[str] = field(default_factory=set)
+    regulations: Set[str] = field(default_factory=set)
+
+
+def trie_pattern(words: Iterable[str]) -> str:
+    """
+    Regex alternation factored by common prefix
+    
+    Python's re tries alternatives one by one, so a flat alternation of many
+    keywords is slow; a prefix trie lets most positions fail on the first
+    character. Optional tails are greedy, so the longest word matches.
+    """
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+    
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+    
+    return build(trie)
+
+
+class KeywordExtractor:
+    """
+    Scans text once for keywords, space-delimited function words and regulation patterns
+    
+    The text is lowercased once and every term is compiled into a single
+    prefix-factored alternation inside a lookahead, so each start position is
+    tried in C and only hits reach Python. Keywords keep substring semantics:
+    the longest keyword at a position matches, and the shorter keywords that
+    are prefixes of it are added from a table built once. Where several groups
+    start at the same position, the lower-priority groups are re-tried at that
+    position only.
+    """
+    
+    def __init__(
+        self,
+        keywords: Iterable[str],
+        function_words: Iterable[str] = (),
+        regulation_patterns: Iterable[str] = ()
+    ):
+        keywords = sorted({kw.lower() for kw in keywords})
+        function_words = sorted({w.lower() for w in function_words})
+        regulation_patterns = [self._lowercase_pattern(p) for p in regulation_patterns]
+        
+        # Keyword -> every keyword that is a prefix of it (itself included)
+        self._prefixes: Dict[str, List[str]] = {
+            kw: [other for other in keywords if kw.startswith(other)]
+            for kw in keywords
+        }
+        
+        groups = []
+        self._regulation_re = self._keyword_re = self._function_re = None
+        if regulation_patterns:
+            regulation = "|".join(f"(?:{p})" for p in regulation_patterns)
+            groups.append(f"(?P<reg>{regulation})")
+            self._regulation_re = re.compile(regulation)
+        if keywords:
+            keyword = trie_pattern(keywords)
+            groups.append(f"(?P<kw>{keyword})")
+            self._keyword_re = re.compile(keyword)
+        if function_words:
+            # Same semantics as f" {word} " in f" {text} ": delimited by spaces or the text edges
+            function = f"(?<![^ ]){trie_pattern(function_words)}(?![^ ])"
+            groups.append(f"(?P<fw>{function})")
+            self._function_re = re.compile(function)
+        
+        self._scanner = re.compile(f"(?=(?:{'|'.join(groups)}))") if groups else None
+    
+    def scan(self, text: str) -> ExtractionResult:
+        """Single pass over the text"""
+        result = ExtractionResult()
+        if self._scanner is None:
+            return result
+        
+        lowered = text.lower()
+        # Regulation references are reported in their original casing
+        original = text if len(lowered) == len(text) else lowered
+        
+        for match in self._scanner.finditer(lowered):
+            pos = match.start()
+            regulation = match.group("reg") if self._regulation_re else None
+            keyword = match.group("kw") if self._keyword_re else None
+            
+            if regulation is not None:
+                result.regulations.add(original[pos:pos + len(regulation)])
+                self._retry(result, self._keyword_re, lowered, pos, self._add_keyword)
+                self._retry(result, self._function_re, lowered, pos, self._add_function_word)
+            elif keyword is not None:
+                self._add_keyword(result, keyword)
+                self._retry(result, self._function_re, lowered, pos, self._add_function_word)
+            else:
+                result.function_words.add(match.group("fw"))
+        
+        return result
+    
+    @staticmethod
+    def _retry(result: ExtractionResult, pattern, text: str, pos: int, add):
+        if pattern is not None:
+            match = pattern.match(text, pos)
+            if match and match.group(0):
+                add(result, match.group(0))
+    
+    def _add_keyword(self, result: ExtractionResult, keyword: str):
+        result.keywords.update(self._prefixes.get(keyword, (keyword,)))
+    
+    @staticmethod
+    def _add_function_word(result: ExtractionResult, word: str):
+        result.function_words.add(word)
+    
+    @staticmethod
+    def _lowercase_pattern(pattern: str) -> str:
+        """Lowercase literals so the pattern can run on lowercased text"""
+        if re.search(r"\\[A-Z]", pattern):
+            # Uppercase escapes (\S, \D, ...) would change meaning; scope IGNORECASE instead
+            return f"(?i:{pattern})"
+        return pattern.lower()
+
+
+__all__ = [
+    'ExtractionResult',
+    'KeywordExtractor'
+]
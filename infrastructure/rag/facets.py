@@ -0,0 +1,121 @@
+"""
+Facet Index
+Posting lists over chunk metadata for filtered retrieval
+"""
+
+from typing import Any, Dict, Iterable, Mapping, Optional, Set, Tuple
+import re
+
+# Metadata fields indexed by default (all set by DocumentProcessor)
+DEFAULT_FACETS = ("categories", "regulations_mentioned", "language", "filename")
+
+_REGULATION_NUMBER_RE = re.compile(r'\bNO\.?')
+_REGULATION_SPACE_RE = re.compile(r'\s+')
+_REGULATION_SERIES_RE = re.compile(r'/[A-Z]+\.\d+/')
+
+
+def normalise_regulation(reference: str) -> str:
+    """
+    Canonical form of a regulation reference
+    
+    "POJK No. 12/POJK.01/2017", "POJK 12-2017" and "pojk 12/2017" all map
+    to "POJK12/2017", so filters match however a document cites the rule.
+    """
+    value = _REGULATION_NUMBER_RE.sub("", reference.upper())
+    value = _REGULATION_SPACE_RE.sub("", value).replace("-", "/")
+    return _REGULATION_SERIES_RE.sub("/", value)
+
+
+class FacetIndex:
+    """
+    field -> value -> set of chunk IDs
+    
+    Filters are dicts of field -> value or field -> list of values; values
+    within a field are OR-ed and fields are AND-ed, e.g.
+    {"categories": "aml", "regulations_mentioned": "POJK 12/2017", "language": "id"}.
+    Matching intersects posting sets smallest first, so the cost depends on
+    the size of the postings, not the size of the store.
+    """
+    
+    def __init__(self, fields: Iterable[str] = DEFAULT_FACETS):
+        self.fields: Tuple[str, ...] = tuple(fields)
+        self.postings: Dict[str, Dict[Any, Set[str]]] = {f: {} for f in self.fields}
+        self._chunk_values: Dict[str, Dict[str, Tuple[Any, ...]]] = {}
+    
+    def add(self, chunk_id: str, metadata: Mapping[str, Any]):
+        """Index a chunk's facet values (re-adding a chunk replaces them)"""
+        if chunk_id in self._chunk_values:
+            self.remove(chunk_id)
+        
+        values = {}
+        for field in self.fields:
+            keys = tuple({self._key(field, v) for v in self._as_values(metadata.get(field))})
+            for key in keys:
+                self.postings[field].setdefault(key, set()).add(chunk_id)
+            values[field] = keys
+        self._chunk_values[chunk_id] = values
+    
+    def remove(self, chunk_id: str):
+        values = self._chunk_values.pop(chunk_id, None)
+        if not values:
+            return
+        
+        for field, keys in values.items():
+            postings = self.postings[field]
+            for key in keys:
+                ids = postings.get(key)
+                if ids is not None:
+                    ids.discard(chunk_id)
+                    if not ids:
+                        del postings[key]
+    
+    def clear(self):
+        self.postings = {f: {} for f in self.fields}
+        self._chunk_values.clear()
+    
+    def match(self, filter: Optional[Mapping[str, Any]]) -> Optional[Set[str]]:
+        """Chunk IDs matching a filter, or None when there is nothing to filter on"""
+        if not filter:
+            return None
+        
+        unknown = set(filter) - set(self.fields)
+        if unknown:
+            raise ValueError(f"Cannot filter on {sorted(unknown)}; facet fields are {list(self.fields)}")
+        
+        per_field = []
+        for field, wanted in filter.items():
+            postings = self.postings[field]
+            ids: Set[str] = set()
+            for value in self._as_values(wanted):
+                ids |= postings.get(self._key(field, value), set())
+            if not ids:
+                return set()
+            per_field.append(ids)
+        
+        per_field.sort(key=len)
+        return set(per_field[0]).intersection(*per_field[1:])
+    
+    def values(self, field: str) -> Dict[Any, int]:
+        """Facet value counts for a field"""
+        return {value: len(ids) for value, ids in self.postings[field].items()}
+    
+    @staticmethod
+    def _as_values(value: Any) -> Iterable[Any]:
+        if value is None:
+            return ()
+        if isinstance(value, (list, tuple, set, frozenset)):
+            return value
+        return (value,)
+    
+    @staticmethod
+    def _key(field: str, value: Any) -> Any:
+        if field == "regulations_mentioned" and isinstance(value, str):
+            return normalise_regulation(value)
+        return value
+
+
+__all__ = [
+    'DEFAULT_FACETS',
+    'normalise_regulation',
+    'FacetIndex'
+]
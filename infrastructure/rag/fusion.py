@@ -0,0 +1,159 @@
+"""
+Hybrid Score Fusion
+Combines semantic and keyword rankings with early termination
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+FUSION_METHODS = ("rrf", "linear")
+
+
+@dataclass
+class SemanticScores:
+    """Cosine scores for one query: one entry per position, -inf where there is no chunk"""
+    scores: np.ndarray
+    ids: Sequence[Optional[str]]
+    positions: Mapping[str, int]
+
+
+def _ranked_positions(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest finite scores, best first"""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(scores.size)
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return top[np.isfinite(scores[top])]
+
+
+def fuse_rankings(
+    semantic: Optional[SemanticScores],
+    keyword: Dict[str, float],
+    top_k: int,
+    alpha: float = 0.5,
+    method: str = "rrf",
+    overfetch: int = 2,
+    rrf_k: int = 60
+) -> List[Tuple[str, float]]:
+    """
+    Fuse a semantic and a keyword ranking into the top_k (chunk_id, score) pairs
+    
+    Both signals are scored once up front (a dense score vector and a sparse
+    keyword score map), but neither is fully sorted: each ranking is read by
+    partial sort (argpartition) to a depth of top_k * overfetch, and the depth
+    doubles only while a chunk outside the current top_k could still overtake
+    it (a threshold-algorithm bound). Stopping early skips ordering the rest
+    of both lists.
+    
+    "rrf" is weighted reciprocal-rank fusion, rescaled so a chunk ranked
+    first in both lists scores 1.0. "linear" mixes min-max normalised cosine
+    with the max-normalised BM25 score. alpha weights the semantic side.
+    """
+    if method not in FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method '{method}', expected one of {FUSION_METHODS}")
+    if top_k <= 0:
+        return []
+    
+    scores = semantic.scores if semantic is not None else np.empty(0, dtype=np.float32)
+    finite = np.isfinite(scores)
+    semantic_count = int(finite.sum())
+    keyword_ids_all = list(keyword)
+    keyword_scores = np.fromiter(keyword.values(), dtype=np.float64, count=len(keyword_ids_all))
+    
+    low, spread = 0.0, 1.0
+    if method == "linear" and semantic_count:
+        low = float(scores[finite].min())
+        spread = float(scores[finite].max()) - low or 1.0
+    
+    def semantic_part(chunk_id: str, semantic_rank: Dict[str, int]) -> float:
+        if method == "rrf":
+            rank = semantic_rank.get(chunk_id)
+            return alpha / (rrf_k + rank) if rank else 0.0
+        position = semantic.positions.get(chunk_id) if semantic_count else None
+        if position is None or not np.isfinite(scores[position]):
+            return 0.0
+        return alpha * (float(scores[position]) - low) / spread
+    
+    def keyword_part(chunk_id: str, keyword_rank: Dict[str, int]) -> float:
+        if method == "rrf":
+            rank = keyword_rank.get(chunk_id)
+            return (1 - alpha) / (rrf_k + rank) if rank else 0.0
+        return (1 - alpha) * keyword.get(chunk_id, 0.0)
+    
+    depth = max(top_k * overfetch, top_k)
+    while True:
+        semantic_top = _ranked_positions(scores, min(depth, scores.size))
+        semantic_ids = [semantic.ids[p] for p in semantic_top.tolist()] if semantic_count else []
+        semantic_rank = {chunk_id: rank for rank, chunk_id in enumerate(semantic_ids, 1)}
+        keyword_top = _ranked_positions(keyword_scores, min(depth, keyword_scores.size))
+        keyword_ids = [keyword_ids_all[p] for p in keyword_top.tolist()]
+        keyword_rank = {chunk_id: rank for rank, chunk_id in enumerate(keyword_ids, 1)}
+        
+        semantic_done = len(semantic_ids) >= semantic_count
+        keyword_done = len(keyword_ids) >= len(keyword_ids_all)
+        
+        fused = {
+            chunk_id: semantic_part(chunk_id, semantic_rank) + keyword_part(chunk_id, keyword_rank)
+            for chunk_id in dict.fromkeys(semantic_ids + keyword_ids)
+        }
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        if semantic_done and keyword_done:
+            break
+        
+        # Best score a chunk could still gain from the part of each list not yet read
+        if method == "rrf":
+            semantic_tail = 0.0 if semantic_done else alpha / (rrf_k + depth + 1)
+            keyword_tail = 0.0 if keyword_done else (1 - alpha) / (rrf_k + depth + 1)
+        else:
+            last_semantic = float(scores[semantic_top[-1]]) if len(semantic_top) else low
+            semantic_tail = 0.0 if semantic_done else alpha * (last_semantic - low) / spread
+            keyword_tail = 0.0 if keyword_done else (1 - alpha) * float(keyword_scores[keyword_top[-1]])
+        
+        if len(ranked) == top_k:
+            kth = ranked[-1][1]
+            selected = {chunk_id for chunk_id, _ in ranked}
+            settled = semantic_tail + keyword_tail <= kth and all(
+                score
+                + (semantic_tail if method == "rrf" and chunk_id not in semantic_rank else 0.0)
+                + (keyword_tail if method == "rrf" and chunk_id not in keyword_rank else 0.0)
+                <= kth
+                for chunk_id, score in fused.items() if chunk_id not in selected
+            )
+            if settled:
+                break
+        
+        depth *= 2
+    
+    if method == "linear":
+        return ranked
+    
+    # The top_k set is settled; complete the selected chunks' ranks so their order is exact
+    exact = []
+    for chunk_id, _ in ranked:
+        rank = semantic_rank.get(chunk_id)
+        position = semantic.positions.get(chunk_id) if rank is None and semantic_count else None
+        if position is not None and np.isfinite(scores[position]):
+            rank = int((scores > scores[position]).sum()) + 1
+        score = alpha / (rrf_k + rank) if rank else 0.0
+        rank = keyword_rank.get(chunk_id)
+        if rank is None and chunk_id in keyword:
+            rank = int((keyword_scores > keyword[chunk_id]).sum()) + 1
+        if rank:
+            score += (1 - alpha) / (rrf_k + rank)
+        # Rank 1 in both lists scores alpha/(k+1) + (1-alpha)/(k+1), rescaled to 1.0
+        exact.append((chunk_id, score * (rrf_k + 1)))
+    
+    exact.sort(key=lambda item: item[1], reverse=True)
+    return exact
+
+
+__all__ = [
+    'FUSION_METHODS',
+    'SemanticScores',
+    'fuse_rankings'
+]
@@ -0,0 +1,385 @@
+"""
+Document Ingestion Pipeline
+Parallel parse/chunk, batched embedding and queued vector store writes
+"""
+
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+import io
+import logging
+import os
+import queue
+import threading
+import time
+
+from . import DocumentChunk, DocumentProcessor, ProcessedDocument
+from .registry import document_key
+
+logger = logging.getLogger(__name__)
+
+# A source is a file path, or a (filename, content) pair with str or bytes content,
+# optionally followed by the document's key: (filename, content, key)
+Source = Union[str, "os.PathLike[str]", Tuple[str, Union[str, bytes]], Tuple[str, Union[str, bytes], str]]
+
+_worker_processor: Optional[DocumentProcessor] = None
+
+
+@dataclass
+class IngestionStats:
+    """Progress and per-stage throughput of an index_many run"""
+    documents_total: int = 0
+    documents_done: int = 0
+    documents_unchanged: int = 0
+    chunks_parsed: int = 0
+    chunks_embedded: int = 0
+    chunks_stored: int = 0
+    chunks_removed: int = 0
+    bytes_parsed: int = 0
+    parse_seconds: float = 0.0
+    embed_seconds: float = 0.0
+    store_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    document_ids: List[str] = field(default_factory=list)
+    failures: List[Tuple[str, str]] = field(default_factory=list)
+    
+    @property
+    def progress(self) -> float:
+        """Fraction of documents parsed (0-1)"""
+        return self.documents_done / self.documents_total if self.documents_total else 1.0
+    
+    def throughput(self) -> Dict[str, float]:
+        """Items per second for each stage; parse time is summed across workers"""
+        def rate(count: float, seconds: float) -> float:
+            return round(count / seconds, 2) if seconds > 0 else 0.0
+        
+        return {
+            "parse_docs_per_s": rate(self.documents_done, self.parse_seconds),
+            "parse_mb_per_s": rate(self.bytes_parsed / 1e6, self.parse_seconds),
+            "embed_chunks_per_s": rate(self.chunks_embedded, self.embed_seconds),
+            "store_chunks_per_s": rate(self.chunks_stored, self.store_seconds),
+            "overall_chunks_per_s": rate(self.chunks_stored, self.wall_seconds)
+        }
+
+
+def read_source(source: Source) -> Tuple[str, str, int, str]:
+    """
+    Return (filename, text, size in bytes, key) for a path or (filename, content[, key]) tuple
+    
+    The key identifies the document across versions: the absolute path for
+    files (so same-named files in different folders stay apart), the given
+    key or else the filename for tuples. filename is only for display.
+    """
+    if isinstance(source, tuple):
+        filename, content = source[:2]
+        key = source[2] if len(source) > 2 else filename
+    else:
+        path = os.fspath(source)
+        filename = os.path.basename(path)
+        key = os.path.abspath(path)
+        with open(path, "rb") as f:
+            content = f.read()
+    
+    if isinstance(content, str):
+        return filename, content, len(content.encode("utf-8")), key
+    return filename, _extract_text(filename, content), len(content), key
+
+
+def _extract_text(filename: str, data: bytes) -> str:
+    """Text from raw file bytes, using the optional document libraries when present"""
+    extension = os.path.splitext(filename)[1].lower()
+    
+    if extension == ".pdf":
+        from pypdf import PdfReader
+        reader = PdfReader(io.BytesIO(data))
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+    
+    if extension == ".docx":
+        import docx
+        document = docx.Document(io.BytesIO(data))
+        return "\n".join(paragraph.text for paragraph in document.paragraphs)
+    
+    return data.decode("utf-8", errors="ignore")
+
+
+def _parse_and_chunk(
+    source: Source,
+    chunk_size: int,
+    chunk_overlap: int,
+    chunk_unit: str,
+    metadata: Optional[Dict[str, Any]]
+) -> Tuple[Optional[ProcessedDocument], int, float, str]:
+    """Worker entry point: read and chunk one source. Returns (doc, bytes, seconds, error)"""
+    global _worker_processor
+    start = time.perf_counter()
+    
+    # One processor per worker process, so compiled extractors are reused
+    if (
+        _worker_processor is None
+        or _worker_processor.chunk_size != chunk_size
+        or _worker_processor.chunk_overlap != chunk_overlap
+        or _worker_processor.chunk_unit != chunk_unit
+    ):
+        _worker_processor = DocumentProcessor(chunk_size, chunk_overlap, chunk_unit)
+    
+    try:
+        filename, text, size, key = read_source(source)
+        doc = _worker_processor.process(text, filename, metadata, doc_id=document_key(key))
+        return doc, size, time.perf_counter() - start, ""
+    except Exception as e:
+        return None, 0, time.perf_counter() - start, str(e)
+
+
+class IngestionPipeline:
+    """
+    Three-stage ingestion for RAGEngine.index_many
+    
+    1. Parse and chunk documents in a process pool (max_workers=0 runs inline)
+    2. Group chunks from many documents into fixed-size embedding batches
+    3. Feed the vector store from a bounded queue on a writer thread
+    
+    Only a bounded number of documents is in flight at once, and the writer
+    queue applies back-pressure to the embedding stage. Documents are
+    versioned through the engine's registry like index_document: unchanged
+    documents are skipped, only changed chunks are embedded and written, and
+    chunks dropped by a new version are deleted once the run completes. A
+    document is registered by the writer once its chunks are stored, and the
+    registry is only saved when the whole run succeeds.
+    
+    Change detection reads the store and registry while the writer updates
+    them, so both sides hold a store lock; embedding runs outside it. A chunk
+    claimed by a document still in flight is not embedded again for later
+    documents, which pick it up from the store once it is written.
+    """
+    
+    def __init__(
+        self,
+        engine,
+        max_workers: Optional[int] = None,
+        batch_size: int = 256,
+        queue_size: int = 8,
+        progress_callback: Optional[Callable[[IngestionStats], None]] = None
+    ):
+        self.engine = engine
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.progress_callback = progress_callback
+        self.stats = IngestionStats()
+        self._lock = threading.Lock()
+        self._store_lock = threading.Lock()
+        self._in_flight: Set[str] = set()
+    
+    def run(self, sources: Iterable[Source], metadata: Dict[str, Any] = None) -> IngestionStats:
+        sources = list(sources)
+        self.stats = IngestionStats(documents_total=len(sources))
+        self._in_flight = set()
+        start = time.perf_counter()
+        
+        writes: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        writer_errors: List[BaseException] = []
+        orphaned: List[str] = []
+        writer = threading.Thread(
+            target=self._store_worker,
+            args=(writes, writer_errors, metadata, orphaned),
+            daemon=True
+        )
+        writer.start()
+        
+        # Documents wait in `waiting` until every chunk they claimed, and all before, is embedded
+        waiting: List[Tuple[ProcessedDocument, List[DocumentChunk], int]] = []
+        to_embed: List[DocumentChunk] = []
+        vectors: Dict[str, Any] = {}
+        embedded = 0
+        try:
+            for doc in self._parsed_documents(sources, metadata):
+                with self._store_lock:
+                    unchanged = self.engine._is_unchanged(doc.id, doc.filename, doc.fingerprint, metadata)
+                if unchanged:
+                    with self._lock:
+                        self.stats.documents_unchanged += 1
+                    continue
+                
+                changed, fresh = self._claim(doc)
+                to_embed.extend(fresh)
+                waiting.append((doc, changed, embedded + len(to_embed)))
+                while len(to_embed) >= self.batch_size:
+                    batch, to_embed = to_embed[:self.batch_size], to_embed[self.batch_size:]
+                    self._embed(batch, vectors)
+                    embedded += len(batch)
+                    self._queue_ready(waiting, embedded, vectors, writes, writer_errors)
+            if to_embed:
+                self._embed(to_embed, vectors)
+                embedded += len(to_embed)
+            self._queue_ready(waiting, embedded, vectors, writes, writer_errors)
+        finally:
+            writes.put(None)
+            writer.join()
+            
+            # A chunk dropped by one document may have been picked up by a later one
+            stale = [cid for cid in set(orphaned) if self.engine.documents.references(cid) == 0]
+            self.engine._delete_chunks(stale)
+            self.engine._index_changed()
+            self.stats.chunks_removed = len(stale)
+        
+        if writer_errors:
+            raise writer_errors[0]
+        
+        self.engine.documents.save()
+        self.stats.wall_seconds = time.perf_counter() - start
+        self._report()
+        logger.info(
+            f"Ingested {self.stats.documents_done}/{self.stats.documents_total} documents, "
+            f"{self.stats.chunks_stored} chunks: {self.stats.throughput()}"
+        )
+        return self.stats
+    
+    def _parsed_documents(
+        self,
+        sources: List[Source],
+        metadata: Optional[Dict[str, Any]]
+    ) -> Iterator[ProcessedDocument]:
+        """Yield processed documents as workers finish them"""
+        processor = self.engine.processor
+        args = (processor.chunk_size, processor.chunk_overlap, processor.chunk_unit, metadata)
+        
+        if self.max_workers <= 1 or len(sources) <= 1:
+            for source in sources:
+                doc = self._record_parse(source, _parse_and_chunk(source, *args))
+                if doc is not None:
+                    yield doc
+            return
+        
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            remaining = iter(sources)
+            in_flight: Dict[Future, Source] = {}
+            
+            def submit_next() -> bool:
+                source = next(remaining, None)
+                if source is None:
+                    return False
+                in_flight[executor.submit(_parse_and_chunk, source, *args)] = source
+                return True
+            
+            for _ in range(self.max_workers * 2):
+                if not submit_next():
+                    break
+            
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    source = in_flight.pop(future)
+                    doc = self._record_parse(source, future.result())
+                    submit_next()
+                    if doc is not None:
+                        yield doc
+    
+    def _record_parse(self, source: Source, result) -> Optional[ProcessedDocument]:
+        doc, size, seconds, error = result
+        with self._lock:
+            self.stats.documents_done += 1
+            self.stats.parse_seconds += seconds
+            if doc is None:
+                name = source[0] if isinstance(source, tuple) else os.fspath(source)
+                self.stats.failures.append((name, error))
+                logger.warning(f"Failed to ingest '{name}': {error}")
+            else:
+                self.stats.bytes_parsed += size
+                self.stats.chunks_parsed += doc.chunk_count
+                self.stats.document_ids.append(doc.id)
+        self._report()
+        return doc
+    
+    def _claim(self, doc: ProcessedDocument) -> Tuple[List[DocumentChunk], List[DocumentChunk]]:
+        """A document's chunks to write, and those of them no stored or in-flight chunk covers"""
+        engine = self.engine
+        with self._store_lock:
+            changed = engine._changed_chunks(doc)
+            if not engine.embedding_provider:
+                return changed, []
+            
+            fresh = [
+                chunk for chunk in changed
+                if chunk.id not in engine.vector_store.embeddings and chunk.id not in self._in_flight
+            ]
+            self._in_flight.update(chunk.id for chunk in fresh)
+        return changed, fresh
+    
+    def _embed(self, batch: List[DocumentChunk], vectors: Dict[str, Any]):
+        """Embed one batch into vectors (outside the store lock)"""
+        start = time.perf_counter()
+        embedded = self.engine._embed(batch)
+        vectors.update(embedded)
+        with self._lock:
+            self.stats.embed_seconds += time.perf_counter() - start
+            self.stats.chunks_embedded += len(embedded)
+    
+    def _queue_ready(
+        self,
+        waiting: List[Tuple[ProcessedDocument, List[DocumentChunk], int]],
+        embedded: int,
+        vectors: Dict[str, Any],
+        writes: "queue.Queue",
+        writer_errors: List[BaseException]
+    ):
+        """Hand the documents whose chunks are all embedded to the writer, in order"""
+        ready = []
+        while waiting and waiting[0][2] <= embedded:
+            doc, changed, _ = waiting.pop(0)
+            ready.append((doc, changed))
+        if not ready:
+            return
+        if writer_errors:
+            raise writer_errors[0]
+        
+        writes.put((ready, {c.id: vectors.pop(c.id) for _, changed in ready for c in changed if c.id in vectors}))
+    
+    def _store_worker(
+        self,
+        writes: "queue.Queue",
+        writer_errors: List[BaseException],
+        metadata: Optional[Dict[str, Any]],
+        orphaned: List[str]
+    ):
+        while True:
+            item = writes.get()
+            if item is None:
+                return
+            if writer_errors:
+                continue
+            
+            ready, vectors = item
+            for doc, changed in ready:
+                start = time.perf_counter()
+                try:
+                    # Register only once the chunks are stored, so a failed run never claims them
+                    with self._store_lock:
+                        self.engine._write_chunks(changed, vectors)
+                        orphaned.extend(self.engine._register_document(doc, metadata))
+                        self._in_flight.difference_update(chunk.id for chunk in changed)
+                except BaseException as e:
+                    writer_errors.append(e)
+                    break
+                
+                # A later document sharing a chunk finds it in the store now
+                for chunk in changed:
+                    vectors.pop(chunk.id, None)
+                
+                with self._lock:
+                    self.stats.store_seconds += time.perf_counter() - start
+                    self.stats.chunks_stored += len(changed)
+                self._report()
+    
+    def _report(self):
+        if self.progress_callback:
+            try:
+                self.progress_callback(self.stats)
+            except Exception as e:
+                logger.warning(f"Ingestion progress callback failed: {e}")
+
+
+__all__ = [
+    'IngestionStats',
+    'IngestionPipeline',
+    'read_source'
+]
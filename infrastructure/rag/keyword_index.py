@@ -0,0 +1,190 @@
+"""
+Keyword Index
+Tokenised inverted index with BM25 scoring for Indonesian/English audit text
+"""
+
+from typing import Collection, Dict, Iterable, List, Optional, Tuple
+import heapq
+import math
+import re
+
+
+# Function words that carry no retrieval signal in either language
+STOPWORDS = frozenset({
+    # English
+    "a", "an", "and", "are", "as", "at", "be", "been", "but", "by", "can", "do",
+    "for", "from", "has", "have", "if", "in", "into", "is", "it", "its", "of",
+    "on", "or", "so", "such", "than", "that", "the", "their", "then", "there",
+    "these", "this", "those", "to", "was", "were", "which", "will", "with",
+    # Indonesian
+    "ada", "adalah", "agar", "akan", "antara", "atas", "atau", "bagi", "bahwa",
+    "dalam", "dan", "dapat", "dari", "dengan", "di", "hal", "ini", "itu", "juga",
+    "karena", "ke", "kepada", "lain", "maka", "oleh", "pada", "para", "saat",
+    "sebagai", "sebagaimana", "secara", "sehingga", "serta", "setiap", "suatu",
+    "tersebut", "untuk", "yaitu", "yang"
+})
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class BM25Index:
+    """
+    Inverted index over document ids with Okapi BM25 ranking
+    Only the postings of the query terms are visited at search time
+    """
+    
+    def __init__(
+        self,
+        vocabulary: Iterable[str] = (),
+        k1: float = 1.5,
+        b: float = 0.75,
+        min_token_length: int = 2
+    ):
+        self.k1 = k1
+        self.b = b
+        self.min_token_length = min_token_length
+        
+        # Domain vocabulary is never stopped, and multi-word terms are indexed as phrases
+        self._protected: set = set()
+        self._phrases: Dict[str, List[Tuple[str, ...]]] = {}
+        for term in vocabulary:
+            words = tuple(TOKEN_PATTERN.findall(term.lower()))
+            self._protected.update(words)
+            if len(words) > 1:
+                self._phrases.setdefault(words[0], []).append(words)
+        
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, Tuple[str, ...]] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._total_length = 0
+    
+    def tokenize(self, text: str) -> List[str]:
+        """Lowercase word tokens plus matched domain phrases, stopwords removed"""
+        words = TOKEN_PATTERN.findall(text.lower())
+        tokens = []
+        
+        for i, word in enumerate(words):
+            for phrase in self._phrases.get(word, ()):
+                if tuple(words[i:i + len(phrase)]) == phrase:
+                    tokens.append(" ".join(phrase))
+            
+            if word in self._protected:
+                tokens.append(word)
+            elif len(word) >= self.min_token_length and word not in STOPWORDS:
+                tokens.append(word)
+        
+        return tokens
+    
+    def add(self, doc_id: str, text: str):
+        """Index a document, replacing any previous version with the same id"""
+        if doc_id in self._doc_lengths:
+            self.remove(doc_id)
+        
+        tokens = self.tokenize(text)
+        frequencies: Dict[str, int] = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+        
+        for term, tf in frequencies.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        
+        self._doc_terms[doc_id] = tuple(frequencies)
+        self._doc_lengths[doc_id] = len(tokens)
+        self._total_length += len(tokens)
+    
+    def remove(self, doc_id: str):
+        """Drop a document from every posting list it appears in"""
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+        
+        self._total_length -= self._doc_lengths.pop(doc_id)
+    
+    def clear(self):
+        """Remove all documents"""
+        self.postings.clear()
+        self._doc_terms.clear()
+        self._doc_lengths.clear()
+        self._total_length = 0
+    
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        normalise: bool = True,
+        candidates: Optional[Collection[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Rank documents for a query
+        
+        With normalise=True scores are divided by the best score any document
+        could reach for these query terms, so they fall in [0, 1). When
+        candidates is given, only those documents are scored; IDF still uses
+        the whole collection so scores stay comparable to unfiltered searches.
+        """
+        scores = self.scores(query, normalise, candidates)
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+    
+    def scores(
+        self,
+        query: str,
+        normalise: bool = True,
+        candidates: Optional[Collection[str]] = None
+    ) -> Dict[str, float]:
+        """Scores of every (candidate) document matching at least one query term"""
+        terms = list(dict.fromkeys(self.tokenize(query)))
+        if not terms or not self._doc_lengths or (candidates is not None and not candidates):
+            return {}
+        
+        doc_count = len(self._doc_lengths)
+        avg_length = self._total_length / doc_count or 1.0
+        scores: Dict[str, float] = {}
+        max_score = 0.0
+        
+        for term in terms:
+            postings = self.postings.get(term)
+            idf = self._idf(len(postings) if postings else 0, doc_count)
+            max_score += idf * (self.k1 + 1)
+            if not postings:
+                continue
+            
+            if candidates is not None and len(candidates) < len(postings):
+                matches = ((d, postings[d]) for d in candidates if d in postings)
+            elif candidates is not None:
+                matches = ((d, tf) for d, tf in postings.items() if d in candidates)
+            else:
+                matches = postings.items()
+            
+            for doc_id, tf in matches:
+                length_norm = 1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+        
+        if normalise and max_score > 0:
+            scores = {doc_id: score / max_score for doc_id, score in scores.items()}
+        return scores
+    
+    def document_frequency(self, term: str) -> int:
+        """Number of documents containing a (tokenised) term"""
+        return len(self.postings.get(term, ()))
+    
+    @staticmethod
+    def _idf(df: int, doc_count: int) -> float:
+        return math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+    
+    @property
+    def size(self) -> int:
+        """Number of indexed documents"""
+        return len(self._doc_lengths)
+
+
+__all__ = [
+    'STOPWORDS',
+    'BM25Index'
+]
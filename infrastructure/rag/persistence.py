@@ -0,0 +1,191 @@
+"""
+Vector Index Persistence
+On-disk chunk log and float32 embedding matrix, reloaded via memory mapping
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class VectorIndexStorage:
+    """
+    Append-only storage for a vector index in a local directory
+    
+    Layout:
+        embeddings.f32  raw little-endian float32 rows, one per embedded chunk
+        chunks.jsonl    operation log ("add" records carry content, metadata and row)
+        manifest.json   committed row count, log size and file generation
+    
+    The manifest is written last and atomically, so bytes past the committed
+    sizes (from an interrupted append) are ignored on load and truncated on the
+    next append. compact() writes a new generation of both files (e.g.
+    embeddings.1.f32) and switches to it with the manifest, so a crash leaves
+    the previous generation intact. A directory supports one writer and any
+    number of readers.
+    """
+    
+    EMBEDDINGS_FILE = "embeddings.f32"
+    CHUNKS_FILE = "chunks.jsonl"
+    MANIFEST_FILE = "manifest.json"
+    FORMAT_VERSION = 1
+    DTYPE = np.dtype("<f4")
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.manifest = self._read_manifest()
+    
+    @property
+    def dimension(self) -> int:
+        return self.manifest["dimension"]
+    
+    @property
+    def rows(self) -> int:
+        return self.manifest["rows"]
+    
+    def load(self) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """Read the committed operation log and memory-map the embedding matrix"""
+        self.manifest = self._read_manifest()
+        records = []
+        
+        log_bytes = self.manifest["log_bytes"]
+        if log_bytes:
+            with open(self._file(self.CHUNKS_FILE), "rb") as f:
+                data = f.read(log_bytes)
+            records = [json.loads(line) for line in data.splitlines() if line.strip()]
+        
+        return records, self.open_matrix()
+    
+    def open_matrix(self) -> np.ndarray:
+        """Read-only memory map over the committed embedding rows"""
+        if self.rows == 0:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.memmap(
+            self._file(self.EMBEDDINGS_FILE),
+            dtype=self.DTYPE,
+            mode="r",
+            shape=(self.rows, self.dimension)
+        )
+    
+    def append(
+        self,
+        records: List[Dict[str, Any]],
+        vectors: Optional[np.ndarray] = None
+    ) -> int:
+        """
+        Append log records and embedding rows without rewriting existing data
+        
+        Returns the matrix row index of the first appended vector.
+        """
+        first_row = self.rows
+        vectors = self._check_vectors(vectors)
+        
+        with open(self._file(self.EMBEDDINGS_FILE), "ab") as f:
+            f.truncate(self.rows * self.dimension * self.DTYPE.itemsize)
+            if vectors is not None and len(vectors):
+                f.write(vectors.astype(self.DTYPE).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        
+        payload = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records)
+        encoded = payload.encode("utf-8")
+        with open(self._file(self.CHUNKS_FILE), "ab") as f:
+            f.truncate(self.manifest["log_bytes"])
+            f.write(encoded)
+            f.flush()
+            os.fsync(f.fileno())
+        
+        self.manifest["rows"] += 0 if vectors is None else len(vectors)
+        self.manifest["log_bytes"] += len(encoded)
+        self._write_manifest()
+        return first_row
+    
+    def compact(self, records: List[Dict[str, Any]], vectors: Optional[np.ndarray]):
+        """Rewrite the directory to contain only the given records and rows"""
+        previous = self.manifest
+        old_files = self._files()
+        self.manifest = {**self._empty_manifest(), "generation": previous.get("generation", 0) + 1}
+        
+        try:
+            # append() writes the new generation's files, then commits it in the manifest
+            self.append(records, vectors)
+        except BaseException:
+            new_files = self._files()
+            self.manifest = previous
+            self._remove(new_files)
+            raise
+        self._remove(old_files)
+    
+    def clear(self):
+        """Delete all stored data"""
+        files = self._files()
+        self.manifest = self._empty_manifest()
+        self._write_manifest()
+        self._remove(files)
+    
+    def _files(self) -> List[str]:
+        return [self._file(self.EMBEDDINGS_FILE), self._file(self.CHUNKS_FILE)]
+    
+    @staticmethod
+    def _remove(paths: List[str]):
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def _check_vectors(self, vectors: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        if vectors is None or len(vectors) == 0:
+            return None
+        if self.dimension == 0:
+            self.manifest["dimension"] = vectors.shape[1]
+        elif vectors.shape[1] != self.dimension:
+            raise ValueError(
+                f"Embedding dimension {vectors.shape[1]} does not match stored dimension {self.dimension}"
+            )
+        return vectors
+    
+    def _read_manifest(self) -> Dict[str, Any]:
+        path = self._path(self.MANIFEST_FILE)
+        if not os.path.exists(path):
+            return self._empty_manifest()
+        
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        
+        if manifest.get("version") != self.FORMAT_VERSION:
+            logger.warning(f"Unsupported vector index version in {self.directory}, starting empty")
+            return self._empty_manifest()
+        return manifest
+    
+    def _write_manifest(self):
+        path = self._path(self.MANIFEST_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    
+    def _empty_manifest(self) -> Dict[str, Any]:
+        return {"version": self.FORMAT_VERSION, "dimension": 0, "rows": 0, "log_bytes": 0}
+    
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+    
+    def _file(self, name: str) -> str:
+        """Path of a data file in the current generation (generation 0 uses the plain name)"""
+        generation = self.manifest.get("generation", 0)
+        if generation:
+            base, extension = os.path.splitext(name)
+            name = f"{base}.{generation}{extension}"
+        return self._path(name)
+
+
+__all__ = [
+    'VectorIndexStorage'
+]
@@ -0,0 +1,86 @@
+"""
+Embedding Quantisation
+Compact float16 / int8 storage with asymmetric (float32 query) scoring
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+QUANTIZATIONS = {
+    "float32": np.float32,
+    "float16": np.float16,
+    "int8": np.int8
+}
+
+# Rows converted to float32 at a time while scanning a compact matrix
+SCAN_BLOCK_ROWS = 16_384
+
+
+def check_quantization(quantization: str) -> str:
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization '{quantization}', expected one of {list(QUANTIZATIONS)}")
+    return quantization
+
+
+def quantize(vectors: np.ndarray, quantization: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Encode float32 rows as (codes, per-row scales)
+    
+    int8 uses symmetric scalar quantisation with one scale per vector
+    (max |component| / 127), so each vector keeps its own dynamic range.
+    float16 and float32 have unit scales.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if quantization != "int8":
+        return vectors.astype(QUANTIZATIONS[quantization]), np.ones(len(vectors), dtype=np.float32)
+    
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, np.newaxis]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize(codes: np.ndarray, scales: np.ndarray, quantization: str) -> np.ndarray:
+    """Decode rows back to float32"""
+    if quantization == "float32":
+        return np.asarray(codes, dtype=np.float32)
+    vectors = codes.astype(np.float32)
+    if quantization == "int8":
+        vectors *= scales[:, np.newaxis]
+    return vectors
+
+
+def scan_scores(
+    codes: np.ndarray,
+    scales: np.ndarray,
+    query: np.ndarray,
+    quantization: str
+) -> np.ndarray:
+    """
+    Inner products of float32 queries with encoded rows
+    
+    The query stays in float32 (asymmetric distance); rows are widened a
+    block at a time so the float32 working set stays bounded, and int8
+    scales are applied to the block's scores rather than to every component.
+    """
+    if quantization == "float32":
+        return codes @ query
+    
+    scores = np.empty((len(codes),) + query.shape[1:], dtype=np.float32)
+    for start in range(0, len(codes), SCAN_BLOCK_ROWS):
+        end = start + SCAN_BLOCK_ROWS
+        block = codes[start:end].astype(np.float32) @ query
+        if quantization == "int8":
+            block *= scales[start:end].reshape((-1,) + (1,) * (block.ndim - 1))
+        scores[start:end] = block
+    return scores
+
+
+__all__ = [
+    'QUANTIZATIONS',
+    'check_quantization',
+    'quantize',
+    'dequantize',
+    'scan_scores'
+]
@@ -0,0 +1,95 @@
+"""
+Query Cache
+In-process LRU/TTL cache for retrieval results and query embeddings
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+import re
+import threading
+import time
+
+_QUERY_SPACE_RE = re.compile(r'\s+')
+
+
+def normalise_query(text: str, lowercase: bool = True) -> str:
+    """Collapse whitespace (and case) so trivially different phrasings share an entry"""
+    text = _QUERY_SPACE_RE.sub(' ', text).strip()
+    return text.lower() if lowercase else text
+
+
+def freeze(value: Any) -> Hashable:
+    """Hashable form of filters and other dict/list arguments for cache keys"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [freeze(v) for v in value]
+        return tuple(sorted(items, key=repr) if isinstance(value, (set, frozenset)) else items)
+    return value
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache with an optional time-to-live
+    
+    Entries can be tagged with an index generation; a lookup with a different
+    generation is a miss, so bumping the generation invalidates every result
+    computed against the old index without walking the cache.
+    max_entries=0 disables caching.
+    """
+    
+    def __init__(self, max_entries: int = 512, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable, generation: int = 0) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, entry_generation, value = entry
+                expired = self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds
+                if expired or entry_generation != generation:
+                    del self._entries[key]
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return None
+    
+    def put(self, key: Hashable, value: Any, generation: int = 0):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), generation, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    @property
+    def size(self) -> int:
+        return len(self._entries)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": self.size
+        }
+
+
+__all__ = [
+    'normalise_query',
+    'freeze',
+    'QueryCache'
+]
@@ -0,0 +1,144 @@
+"""
+Document Registry
+Tracks which chunks belong to which indexed document version
+"""
+
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def document_key(filename: str) -> str:
+    """Default document ID: stable across versions of the same file"""
+    return hashlib.md5(filename.encode()).hexdigest()[:16]
+
+
+@dataclass
+class DocumentRecord:
+    """One indexed document version"""
+    doc_id: str
+    filename: str
+    fingerprint: str
+    chunk_ids: List[str]
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    version: int = 1
+    indexed_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    # Near-duplicate chunk ID -> stored chunk ID; chunk_ids already lists the stored IDs
+    aliases: Dict[str, str] = field(default_factory=dict)
+
+
+class DocumentRegistry:
+    """
+    doc_id -> DocumentRecord map with chunk reference counts
+    
+    Chunk IDs are content hashes, so identical passages in two documents share
+    one chunk; reference counts make sure a chunk is only reported as orphaned
+    once no registered document uses it. With a path, the registry is saved as
+    JSON by save() and reloaded on construction.
+    """
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._records: Dict[str, DocumentRecord] = {}
+        self._refs: Dict[str, int] = {}
+        if path and os.path.exists(path):
+            self._load()
+    
+    def get(self, doc_id: str) -> Optional[DocumentRecord]:
+        return self._records.get(doc_id)
+    
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._records
+    
+    def __iter__(self) -> Iterator[DocumentRecord]:
+        return iter(list(self._records.values()))
+    
+    def __len__(self) -> int:
+        return len(self._records)
+    
+    def register(self, record: DocumentRecord) -> List[str]:
+        """Add or replace a document; returns chunk IDs no document references any more"""
+        previous = self._records.get(record.doc_id)
+        if previous:
+            record.version = previous.version + 1
+        
+        self._records[record.doc_id] = record
+        self._reference(record.chunk_ids)
+        return self._release(previous.chunk_ids) if previous else []
+    
+    def remove(self, doc_id: str) -> List[str]:
+        """Forget a document; returns chunk IDs no document references any more"""
+        record = self._records.pop(doc_id, None)
+        return self._release(record.chunk_ids) if record else []
+    
+    def references(self, chunk_id: str) -> int:
+        """Number of registered documents containing a chunk"""
+        return self._refs.get(chunk_id, 0)
+    
+    def owners(self, chunk_ids: Iterable[str]) -> Dict[str, DocumentRecord]:
+        """A registered document containing each chunk; chunks no document contains are left out"""
+        wanted = {chunk_id for chunk_id in chunk_ids if self._refs.get(chunk_id)}
+        found: Dict[str, DocumentRecord] = {}
+        for record in self._records.values():
+            if not wanted:
+                break
+            for chunk_id in wanted.intersection(record.chunk_ids):
+                found[chunk_id] = record
+            wanted.difference_update(found)
+        return found
+    
+    def clear(self):
+        self._records.clear()
+        self._refs.clear()
+    
+    def save(self):
+        """Write the registry atomically (no-op without a path)"""
+        if not self.path:
+            return
+        
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump([asdict(record) for record in self._records.values()], f, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+    
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                records = [DocumentRecord(**data) for data in json.load(f)]
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Could not read document registry {self.path}: {e}")
+            return
+        
+        for record in records:
+            self._records[record.doc_id] = record
+            self._reference(record.chunk_ids)
+    
+    def _reference(self, chunk_ids: List[str]):
+        for chunk_id in set(chunk_ids):
+            self._refs[chunk_id] = self._refs.get(chunk_id, 0) + 1
+    
+    def _release(self, chunk_ids: List[str]) -> List[str]:
+        orphaned = []
+        for chunk_id in set(chunk_ids):
+            count = self._refs.get(chunk_id, 0) - 1
+            if count > 0:
+                self._refs[chunk_id] = count
+            else:
+                self._refs.pop(chunk_id, None)
+                orphaned.append(chunk_id)
+        return orphaned
+
+
+__all__ = [
+    'document_key',
+    'DocumentRecord',
+    'DocumentRegistry'
+]
@@ -0,0 +1,148 @@
+"""
+Cross-Encoder Re-ranking
+Re-scores retrieved candidates per (query, chunk) pair within a latency budget
+"""
+
+from dataclasses import replace
+from typing import Any, Dict, List, Optional, Sequence
+import logging
+import math
+import time
+
+from .query_cache import QueryCache, normalise_query
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """
+    Re-rank retrieval results with a sentence-transformers CrossEncoder
+    
+    The engine retrieves `candidates` results, and rerank() re-scores the
+    uncached (query, chunk) pairs in batches of batch_size on CPU and keeps
+    the top_k. Scores are the model's logits squashed to 0..1. If the
+    pairs are not scored within latency_budget_ms (or the running per-pair
+    cost says they would not be), the retrieval order is returned
+    unchanged. Pair scores are cached by query text and chunk ID (a content
+    hash), so repeated and overlapping queries only score new pairs.
+    """
+    
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        candidates: int = 20,
+        batch_size: int = 16,
+        latency_budget_ms: Optional[float] = 250.0,
+        cache_size: int = 20_000,
+        device: str = "cpu",
+        model: Any = None
+    ):
+        self.model_name = model_name
+        self.candidates = candidates
+        self.batch_size = batch_size
+        self.latency_budget_ms = latency_budget_ms
+        self.device = device
+        self.pair_cache = QueryCache(cache_size)
+        self.reranked = 0
+        self.skipped = 0
+        self._model = model
+        self._unavailable = False
+        self._seconds_per_pair: Optional[float] = None
+    
+    def _get_model(self):
+        if self._model is None and not self._unavailable:
+            try:
+                from sentence_transformers import CrossEncoder
+                self._model = CrossEncoder(self.model_name, device=self.device)
+            except Exception as e:
+                logger.warning(f"Cross-encoder '{self.model_name}' unavailable, re-ranking disabled: {e}")
+                self._unavailable = True
+        return self._model
+    
+    def rerank(self, query: str, results: Sequence[Any], top_k: int) -> List[Any]:
+        """Top_k of results re-ordered by cross-encoder score (retrieval order if over budget)"""
+        results = list(results)
+        model = self._get_model()
+        if model is None or len(results) < 2:
+            return results[:top_k]
+        
+        query_key = normalise_query(query)
+        scores: Dict[str, float] = {}
+        missing: List[Any] = []
+        for result in results:
+            cached = self.pair_cache.get((query_key, result.chunk.id))
+            if cached is None:
+                missing.append(result)
+            else:
+                scores[result.chunk.id] = cached
+        
+        if missing and not self._score_within_budget(model, query, query_key, missing, scores):
+            self.skipped += 1
+            return results[:top_k]
+        
+        self.reranked += 1
+        ranked = sorted(results, key=lambda r: scores[r.chunk.id], reverse=True)[:top_k]
+        return [replace(r, score=scores[r.chunk.id]) for r in ranked]
+    
+    def _score_within_budget(
+        self,
+        model: Any,
+        query: str,
+        query_key: str,
+        missing: List[Any],
+        scores: Dict[str, float]
+    ) -> bool:
+        """Score missing pairs batch by batch; False once the budget is (or would be) exceeded"""
+        budget = self.latency_budget_ms / 1000 if self.latency_budget_ms else None
+        if budget is not None and self._seconds_per_pair is not None:
+            if self._seconds_per_pair * len(missing) > budget:
+                # Decay the estimate so a slow spell (e.g. model warm-up) does not disable re-ranking for good
+                self._seconds_per_pair *= 0.9
+                return False
+        
+        start = time.perf_counter()
+        for i in range(0, len(missing), self.batch_size):
+            if budget is not None and time.perf_counter() - start > budget:
+                return False
+            
+            batch = missing[i:i + self.batch_size]
+            batch_start = time.perf_counter()
+            logits = model.predict([(query, r.chunk.content) for r in batch], batch_size=len(batch))
+            self._observe(time.perf_counter() - batch_start, len(batch))
+            
+            for result, logit in zip(batch, logits):
+                score = _sigmoid(float(logit))
+                scores[result.chunk.id] = score
+                self.pair_cache.put((query_key, result.chunk.id), score)
+        
+        # Everything is scored; the time is spent, so use the scores
+        return True
+    
+    def _observe(self, seconds: float, pairs: int):
+        """Exponential moving average of the per-pair scoring cost"""
+        per_pair = seconds / max(pairs, 1)
+        if self._seconds_per_pair is None:
+            self._seconds_per_pair = per_pair
+        else:
+            self._seconds_per_pair = 0.8 * self._seconds_per_pair + 0.2 * per_pair
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "reranked": self.reranked,
+            "skipped_over_budget": self.skipped,
+            "ms_per_pair": round(self._seconds_per_pair * 1000, 3) if self._seconds_per_pair else None,
+            "pair_cache": self.pair_cache.get_stats()
+        }
+
+
+def _sigmoid(x: float) -> float:
+    if x >= 0:
+        return 1.0 / (1.0 + math.exp(-x))
+    z = math.exp(x)
+    return z / (1.0 + z)
+
+
+__all__ = [
+    'CrossEncoderReranker'
+]
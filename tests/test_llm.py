@@ -0,0 +1,569 @@
+"""
+AURIX v4.0 Test Suite
+Tests for the LLM infrastructure layer.
+"""
+
+import pytest
+import sys
+import os
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("requests")
+
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    """Minimal keep-alive Ollama /api/generate and OpenAI-style /chat/completions endpoint."""
+    
+    protocol_version = "HTTP/1.1"
+    
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length))
+        self.server.connections.add(self.client_address)
+        self.server.requests.append(request)
+        time.sleep(self.server.delay)
+        
+        if request.get("stream") or ":streamGenerateContent" in self.path:
+            self._stream(request)
+            return
+        
+        body = json.dumps({"response": f"echo: {request['prompt']}", "eval_count": 3}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _stream(self, request):
+        """Chunked NDJSON (Ollama) or SSE (chat completions), one word per event."""
+        words = ["Temuan", " audit", " kredit"]
+        if ":streamGenerateContent" in self.path:
+            content_type = "text/event-stream"
+            events = [
+                "data: " + json.dumps({"candidates": [{"content": {"parts": [{"text": w}], "role": "model"}}]}) + "\r\n\r\n"
+                for w in words
+            ]
+            events.append("data: " + json.dumps({
+                "candidates": [{"content": {"parts": [], "role": "model"}, "finishReason": "STOP"}],
+                "usageMetadata": {"candidatesTokenCount": 5}
+            }) + "\r\n\r\n")
+        elif self.path.endswith("/chat/completions"):
+            content_type = "text/event-stream"
+            events = [": keep-alive\n\n"]
+            events += [f"data: {json.dumps({'choices': [{'delta': {'content': w}}]})}\n\n" for w in words]
+            events.append("data: " + json.dumps({
+                "choices": [{"delta": {}, "finish_reason": "length"}],
+                "usage": {"completion_tokens": 7}
+            }) + "\n\n")
+            events.append(self.server.stream_tail or "data: [DONE]\n\n")
+        else:
+            content_type = "application/x-ndjson"
+            events = [json.dumps({"response": w, "done": False}) + "\n" for w in words]
+            events.append(json.dumps({"response": "", "done": True, "eval_count": 6, "done_reason": "stop"}) + "\n")
+        
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for event in events:
+            data = event.encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+            time.sleep(self.server.stream_delay)
+        self.wfile.write(b"0\r\n\r\n")
+    
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def ollama_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _OllamaHandler)
+    server.connections = set()
+    server.requests = []
+    server.delay = 0.0
+    server.stream_delay = 0.0
+    server.stream_tail = None
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestHTTPTransport:
+    """Test pooled provider sessions."""
+    
+    def test_transport_shared_per_endpoint(self):
+        """Test strategies for the same endpoint share one transport and pool."""
+        from infrastructure.llm import GroqStrategy, get_transport
+        
+        first = GroqStrategy(api_key="k1")
+        second = GroqStrategy(api_key="k2", pool_maxsize=32)
+        
+        assert first.transport is second.transport is get_transport(GroqStrategy.BASE_URL + "/")
+        assert first.transport.pool_maxsize >= 32
+        assert first.transport.session.get_adapter(GroqStrategy.BASE_URL)._pool_maxsize >= 32
+    
+    def test_requests_reuse_connection_with_config_timeout(self, ollama_server, monkeypatch):
+        """Test consecutive calls reuse one keep-alive connection and use LLMConfig.timeout."""
+        from infrastructure.llm import LLMConfig, LLMClient, LLMProvider
+        
+        base_url = f"http://127.0.0.1:{ollama_server.server_port}"
+        client = LLMClient(LLMConfig(provider=LLMProvider.OLLAMA, base_url=base_url, timeout=7))
+        
+        timeouts = []
+        session = client._strategy.transport.session
+        original = session.request
+        monkeypatch.setattr(session, "request", lambda *a, **kw: timeouts.append(kw["timeout"]) or original(*a, **kw))
+        
+        for prompt in ("satu", "dua", "tiga"):
+            assert client.generate(prompt).content == f"echo: {prompt}"
+        
+        assert len(ollama_server.requests) == 3
+        assert len(ollama_server.connections) == 1
+        assert timeouts == [(7, 7)] * 3
+    
+    
+    def test_resize_closes_previous_pool(self, ollama_server):
+        """Test growing the pool releases the replaced adapter's connections."""
+        from infrastructure.llm import HTTPTransport
+        
+        url = f"http://127.0.0.1:{ollama_server.server_port}/api/generate"
+        transport = HTTPTransport(pool_maxsize=2)
+        assert transport.post(url, json={"prompt": "a"}).ok
+        old = transport.session.get_adapter(url)
+        assert len(old.poolmanager.pools) == 1
+        
+        transport.resize(8)
+        
+        assert len(old.poolmanager.pools) == 0
+        assert transport.session.get_adapter(url)._pool_maxsize == 8
+        assert transport.post(url, json={"prompt": "b"}).ok
+        transport.close()
+
+
+class TestAsyncLLMClient:
+    """Test the asyncio client surface."""
+    
+    def _client(self, server, **config):
+        from infrastructure.llm import AsyncLLMClient, LLMConfig, LLMProvider
+        
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        return AsyncLLMClient(LLMConfig(provider=LLMProvider.OLLAMA, base_url=base_url, **config))
+    
+    def test_generate_many_runs_concurrently(self, ollama_server):
+        """Test fan-out takes about one call's latency, and concurrency=1 serialises."""
+        ollama_server.delay = 0.1
+        client = self._client(ollama_server)
+        prompts = ["satu", "dua", "tiga", "empat"]
+        
+        start = time.perf_counter()
+        responses = asyncio.run(client.generate_many(prompts, concurrency=4))
+        concurrent = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        asyncio.run(client.generate_many(prompts, concurrency=1))
+        serial = time.perf_counter() - start
+        
+        assert [r.content for r in responses] == [f"echo: {p}" for p in prompts]
+        assert concurrent < 0.3 <= 0.4 <= serial
+    
+    def test_provider_semaphore_caps_fan_out(self, ollama_server):
+        """Test calls to one provider never exceed pool_maxsize in flight."""
+        ollama_server.delay = 0.1
+        client = self._client(ollama_server, pool_maxsize=2)
+        
+        start = time.perf_counter()
+        asyncio.run(client.generate_many(["a", "b", "c", "d"], concurrency=4))
+        assert time.perf_counter() - start >= 0.2
+    
+    def test_run_sync_reuses_connections_across_calls(self, ollama_server):
+        """Test sync callers share one background loop and its keep-alive pool."""
+        from infrastructure.llm import run_sync
+        
+        client = self._client(ollama_server)
+        for prompt in ("satu", "dua"):
+            responses = run_sync(client.generate_many([prompt], concurrency=1))
+            assert responses[0].content == f"echo: {prompt}"
+        
+        assert len(ollama_server.requests) == 2
+        assert len(ollama_server.connections) == 1
+    
+    def test_compare_models_mixes_providers_and_failures(self, ollama_server):
+        """Test one prompt to several clients, with thread fallback and a failing client."""
+        from infrastructure.llm import AsyncLLMClient, LLMConfig, LLMProvider, compare_models
+        
+        mock = AsyncLLMClient(LLMConfig(provider=LLMProvider.MOCK))
+        down = AsyncLLMClient(LLMConfig(provider=LLMProvider.OLLAMA, base_url="http://127.0.0.1:9", timeout=2))
+        
+        results = asyncio.run(compare_models([self._client(ollama_server), mock, down], "risk review"))
+        assert results[0].content == "echo: risk review"
+        assert results[1].metadata["mock"] is True
+        assert isinstance(results[2], Exception)
+        
+        async def collect():
+            return [text async for text in mock.astream("audit plan")]
+        assert "Audit Procedures" in "".join(asyncio.run(collect()))
+
+
+class _CountingStrategy:
+    """Strategy stand-in counting provider calls."""
+    
+    model = "counting"
+    provider_name = "Counting"
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def generate(self, messages, temperature=0.3, max_tokens=4096, **kwargs):
+        from infrastructure.llm import LLMResponse
+        
+        self.calls += 1
+        return LLMResponse(content=f"answer {self.calls}", model=self.model, provider=self.provider_name, tokens_used=40)
+    
+    def stream(self, messages, temperature=0.3, max_tokens=4096, **kwargs):
+        self.calls += 1
+        yield "streamed "
+        yield "answer"
+
+
+class TestResponseCache:
+    """Test the LLM response cache."""
+    
+    def _client(self, cache):
+        from infrastructure.llm import LLMClient, LLMConfig, LLMProvider
+        
+        client = LLMClient(LLMConfig(provider=LLMProvider.MOCK, temperature=0), cache=cache)
+        client._strategy = _CountingStrategy()
+        return client
+    
+    def test_identical_requests_hit_cache(self):
+        """Test repeats are served from cache with hit rate and saved tokens reported."""
+        from infrastructure.llm import LLMResponseCache
+        
+        client = self._client(LLMResponseCache())
+        first = client.generate("Susun prosedur audit kredit", system_prompt="Auditor")
+        second = client.generate("Susun prosedur audit kredit", system_prompt="Auditor")
+        other = client.generate("Susun prosedur audit kredit", system_prompt="Auditor", max_tokens=100)
+        
+        assert client._strategy.calls == 2
+        assert second.content == first.content == "answer 1" and other.content == "answer 2"
+        assert first.metadata["cache"]["hit"] is False
+        assert second.metadata["cache"] == {"hit": True, "hit_rate": 0.5, "saved_tokens": 40}
+    
+    def test_sampled_calls_bypass_unless_opted_in(self):
+        """Test temperature > 0 skips the cache unless use_cache=True."""
+        from infrastructure.llm import LLMResponseCache
+        
+        client = self._client(LLMResponseCache())
+        client.generate("ide", temperature=0.7)
+        client.generate("ide", temperature=0.7)
+        assert client._strategy.calls == 2 and "cache" not in client.generate("ide", temperature=0.7).metadata
+        
+        client.generate("ide", temperature=0.7, use_cache=True)
+        assert client.generate("ide", temperature=0.7, use_cache=True).metadata["cache"]["hit"]
+        assert client._strategy.calls == 4
+    
+    def test_disk_tier_ttl_and_stream_replay(self, tmp_path, monkeypatch):
+        """Test SQLite entries survive a new cache, expire after the TTL, and streams replay."""
+        from infrastructure.llm import LLMResponseCache
+        from infrastructure.llm import response_cache
+        
+        path = str(tmp_path / "llm.sqlite")
+        client = self._client(LLMResponseCache(path=path, ttl_seconds=60))
+        assert "".join(client.stream("ringkas temuan")) == "streamed answer"
+        
+        restarted = self._client(LLMResponseCache(path=path, ttl_seconds=60))
+        assert list(restarted.stream("ringkas temuan")) == ["streamed answer"]
+        assert restarted._strategy.calls == 0
+        
+        later = response_cache.time.time() + 120
+        monkeypatch.setattr(response_cache.time, "time", lambda: later)
+        expired = self._client(LLMResponseCache(path=path, ttl_seconds=60))
+        assert "".join(expired.stream("ringkas temuan")) == "streamed answer"
+        assert expired._strategy.calls == 1
+
+
+class _ScriptedStrategy(_CountingStrategy):
+    """Strategy stand-in with a fixed delay and an optional error."""
+    
+    def __init__(self, name, delay=0.0, error=None):
+        super().__init__()
+        self.provider_name = name
+        self.delay = delay
+        self.error = error
+    
+    def generate(self, messages, temperature=0.3, max_tokens=4096, **kwargs):
+        time.sleep(self.delay)
+        if self.error is not None:
+            self.calls += 1
+            raise self.error
+        response = super().generate(messages, temperature, max_tokens)
+        response.content = f"{self.provider_name} {response.content}"
+        return response
+
+
+class TestRoutingLLMClient:
+    """Test provider fallback, circuit breakers and hedging."""
+    
+    def _router(self, *strategies, **options):
+        from infrastructure.llm import LLMConfig, LLMProvider, RoutingLLMClient
+        
+        router = RoutingLLMClient(
+            [LLMConfig(provider=LLMProvider.MOCK, model=s.provider_name) for s in strategies],
+            **options
+        )
+        for client, strategy in zip(router.clients, strategies):
+            client._strategy = strategy
+        return router
+    
+    def test_routes_to_fastest_provider(self):
+        """Test the provider with the lower rolling p50 gets the traffic."""
+        slow, fast = _ScriptedStrategy("slow", delay=0.03), _ScriptedStrategy("fast")
+        router = self._router(slow, fast)
+        
+        router.health[0].record_success(30.0)
+        router.health[1].record_success(5.0)
+        for _ in range(3):
+            response = router.generate("ringkas temuan")
+        
+        assert fast.calls == 3 and slow.calls == 0
+        assert response.metadata["route"] == {"provider": "mock:fast", "attempts": 1, "hedged": False}
+        assert router.get_stats()["mock:fast"]["requests"] == 4
+    
+    def test_drops_unbuildable_routes_and_ranks_unmeasured_by_weight(self):
+        """Test a route falling back to the mock is dropped and unmeasured routes follow weights."""
+        from infrastructure.llm import GroqStrategy, LLMConfig, LLMProvider, RoutingLLMClient
+        
+        router = RoutingLLMClient([LLMConfig(provider=LLMProvider.GROQ, api_key="k"), LLMConfig(provider=LLMProvider.TOGETHER)])
+        assert [type(c._strategy) for c in router.clients] == [GroqStrategy]
+        with pytest.raises(ValueError):
+            RoutingLLMClient([LLMConfig(provider=LLMProvider.TOGETHER)])
+        
+        light, heavy, fast = _ScriptedStrategy("light"), _ScriptedStrategy("heavy"), _ScriptedStrategy("fast")
+        router = self._router(light, heavy)
+        router.weights = [1.0, 3.0]
+        assert router._candidates() == [1, 0]
+        
+        router = self._router(heavy, light, fast)
+        router.health[0].record_success(10.0)
+        router.health[2].record_success(1.0)
+        assert router._candidates() == [2, 1, 0]  # unmeasured route scores the median, not 0 ms
+    
+    def test_cache_hits_do_not_count_as_provider_latency(self):
+        """Test responses served from the shared cache leave the provider's p50 alone."""
+        from infrastructure.llm import LLMResponseCache
+        
+        strategy = _ScriptedStrategy("cached", delay=0.02)
+        router = self._router(strategy, cache=LLMResponseCache())
+        
+        for _ in range(5):
+            response = router.generate("ringkas temuan", use_cache=True)
+        
+        assert response.metadata["cache"]["hit"] and strategy.calls == 1
+        stats = router.get_stats()["mock:cached"]
+        assert stats["requests"] == 1 and stats["p50_ms"] >= 20
+    
+    def test_falls_back_and_opens_breaker(self):
+        """Test failures fall through to the next provider until the breaker skips the first."""
+        from utils.exceptions import LLMError
+        
+        down, backup = _ScriptedStrategy("down", error=TimeoutError("read timed out")), _ScriptedStrategy("backup")
+        router = self._router(down, backup, failure_threshold=2, max_error_rate=1.0)
+        
+        for _ in range(3):
+            assert router.generate("uji").content.startswith("backup")
+        assert down.calls == 2
+        assert router.get_stats()["mock:down"]["state"] == "open"
+        
+        backup.error = ValueError("bad gateway")
+        with pytest.raises(LLMError, match="All LLM providers failed"):
+            router.generate("uji")
+    
+    def test_rate_limit_opens_breaker_and_raises_retry_after(self):
+        """Test a 429 opens the breaker and all-open raises LLMRateLimitError."""
+        from utils.exceptions import LLMRateLimitError
+        
+        class _RateLimited(Exception):
+            response = type("Response", (), {"status_code": 429, "headers": {"Retry-After": "45"}})()
+        
+        limited = _ScriptedStrategy("limited", error=_RateLimited("429 Too Many Requests"))
+        router = self._router(limited, cooldown_seconds=10)
+        
+        with pytest.raises(LLMRateLimitError) as first:
+            router.generate("uji")
+        with pytest.raises(LLMRateLimitError) as second:
+            router.generate("uji")
+        
+        assert first.value.retry_after == 45
+        assert 40 <= second.value.retry_after <= 45
+        assert limited.calls == 1
+    
+    def test_hedges_slow_request(self):
+        """Test a request past the hedge deadline is raced against the next provider."""
+        slow, quick = _ScriptedStrategy("slow", delay=0.5), _ScriptedStrategy("quick", delay=0.01)
+        router = self._router(slow, quick, hedge_after_ms=50)
+        
+        start = time.perf_counter()
+        response = router.generate("uji")
+        
+        assert time.perf_counter() - start < 0.3
+        assert response.content.startswith("quick")
+        assert response.metadata["route"] == {"provider": "mock:quick", "attempts": 1, "hedged": True}
+    
+    def test_hedged_failures_reported_per_provider(self):
+        """Test a failed hedge reports each provider's own error once."""
+        from utils.exceptions import LLMError
+        
+        slow = _ScriptedStrategy("slow", delay=0.08, error=TimeoutError("primary timed out"))
+        quick = _ScriptedStrategy("quick", delay=0.1, error=ValueError("backup refused"))
+        router = self._router(slow, quick, hedge_after_ms=50)
+        
+        with pytest.raises(LLMError) as raised:
+            router.generate("uji")
+        
+        message = str(raised.value)
+        assert "mock:slow: primary timed out" in message and "mock:quick: backup refused" in message
+        assert message.count("backup refused") == 1
+    
+    def test_hedging_pool_not_capped_by_route_count(self):
+        """Test concurrent hedged requests are not queued behind 2 x routes workers."""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        router = self._router(_ScriptedStrategy("a", delay=0.1), _ScriptedStrategy("b", delay=0.1), hedge_after_ms=1000)
+        
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=16) as callers:
+            responses = list(callers.map(lambda _: router.generate("uji"), range(16)))
+        
+        assert len(responses) == 16
+        assert time.perf_counter() - start < 0.3
+    
+    def test_stream_falls_back_before_first_chunk(self):
+        """Test streams move to the next provider only while nothing has been yielded."""
+        class _BrokenStream(_ScriptedStrategy):
+            def stream(self, messages, temperature=0.3, max_tokens=4096, **kwargs):
+                raise ConnectionError("refused")
+                yield
+        
+        router = self._router(_BrokenStream("broken"), _ScriptedStrategy("ok"))
+        assert "".join(router.stream("uji")) == "streamed answer"
+        assert router.get_stats()["mock:broken"]["error_rate"] == 1.0
+
+
+class TestStreaming:
+    """Test incremental SSE/NDJSON streaming and stream stats."""
+    
+    def test_parser_handles_arbitrary_chunk_boundaries(self):
+        """Test events survive splits inside lines and UTF-8 characters, comments and [DONE]."""
+        from infrastructure.llm import StreamParser
+        
+        payload = (
+            ": OPENROUTER PROCESSING\r\n\r\n"
+            'data: {"choices": [{"delta": {"content": "Pasal "}}]}\r\n\r\n'
+            'event: message\ndata: {"choices": [{"delta":\ndata: {"content": "ayat (1) — é"}}]}\n\n'
+            "data: [DONE]\n\n"
+            'data: {"ignored": true}\n\n'
+        ).encode()
+        
+        parser = StreamParser("sse")
+        events = []
+        for i in range(len(payload)):
+            events += parser.feed(payload[i:i + 1])
+        events += parser.close()
+        
+        assert [e["choices"][0]["delta"]["content"] for e in events] == ["Pasal ", "ayat (1) — é"]
+        assert parser.done
+        
+        ndjson = StreamParser("ndjson")
+        assert ndjson.feed(b'{"response": "a"}\n{"resp') == [{"response": "a"}]
+        assert ndjson.feed(b'onse": "b"}') == []
+        assert ndjson.close() == [{"response": "b"}]
+        
+        with pytest.raises(ValueError):
+            StreamParser("sse").feed(b"data: {not json\n\n")
+    
+    def test_ollama_streams_incrementally_with_stats(self, ollama_server):
+        """Test text arrives before the stream ends and the stats event reports TTFT and tokens/s."""
+        from infrastructure.llm import LLMClient, LLMConfig, LLMProvider, LLMResponseCache, StreamStats
+        
+        ollama_server.stream_delay = 0.05
+        base_url = f"http://127.0.0.1:{ollama_server.server_port}"
+        client = LLMClient(
+            LLMConfig(provider=LLMProvider.OLLAMA, base_url=base_url, temperature=0), cache=LLMResponseCache()
+        )
+        
+        start = time.perf_counter()
+        arrivals = []
+        items = []
+        for item in client.stream("ringkas", include_stats=True):
+            arrivals.append(time.perf_counter() - start)
+            items.append(item)
+        
+        *texts, stats = items
+        assert texts == ["Temuan", " audit", " kredit"] and ollama_server.requests[0]["stream"] is True
+        assert arrivals[0] < 0.1 and arrivals[-1] >= 0.15
+        assert isinstance(stats, StreamStats)
+        assert stats.tokens == 6 and not stats.tokens_estimated
+        assert stats.ttft_ms < stats.duration_ms and stats.tokens_per_second > 0
+        
+        cached = client.chat(client._messages("ringkas", None))
+        assert cached.content == "Temuan audit kredit" and cached.tokens_used == 6
+        assert list(client.stream("ringkas")) == ["Temuan audit kredit"]
+    
+    def test_sse_providers_stream_sync_and_async(self, ollama_server):
+        """Test OpenAI-style SSE streaming with usage, and an error event raising LLMError."""
+        from infrastructure.llm import StreamStats, TogetherStrategy, Message
+        from utils.exceptions import LLMError
+        
+        strategy = TogetherStrategy(api_key="k")
+        strategy._setup_transport(f"http://127.0.0.1:{ollama_server.server_port}", 10, None)
+        messages = [Message("user", "uji")]
+        
+        *texts, stats = strategy.stream(messages, include_stats=True)
+        assert "".join(texts) == "Temuan audit kredit"
+        assert (stats.tokens, stats.chunks, stats.finish_reason) == (7, 3, "length")
+        
+        async def collect():
+            return [item async for item in strategy.astream(messages, include_stats=True)]
+        *texts, stats = asyncio.run(collect())
+        assert "".join(texts) == "Temuan audit kredit" and isinstance(stats, StreamStats)
+        
+        ollama_server.stream_tail = 'data: {"error": {"message": "overloaded"}}\n\n'
+        with pytest.raises(LLMError, match="overloaded"):
+            list(strategy.stream(messages))
+    
+    def test_google_astream_reads_sse_incrementally(self, ollama_server):
+        """Test Gemini async streaming yields each SSE part as it arrives."""
+        from infrastructure.llm import GoogleStrategy, Message, StreamStats
+        
+        ollama_server.stream_delay = 0.05
+        strategy = GoogleStrategy(api_key="k", model="gemini-1.5-flash")
+        strategy.base_url = f"http://127.0.0.1:{ollama_server.server_port}"
+        
+        async def collect():
+            start = time.perf_counter()
+            return [(item, time.perf_counter() - start) async for item in strategy.astream(
+                [Message("system", "Auditor"), Message("user", "uji")], include_stats=True
+            )]
+        items = asyncio.run(collect())
+        
+        *texts, (stats, _) = items
+        assert [t for t, _ in texts] == ["Temuan", " audit", " kredit"]
+        assert texts[0][1] < 0.1 and texts[-1][1] >= 0.1
+        assert isinstance(stats, StreamStats) and (stats.tokens, stats.finish_reason) == (5, "stop")
+        request = ollama_server.requests[0]
+        assert request["contents"][0]["parts"][0]["text"] == "Auditor\n\n\nuji"
+        assert request["generationConfig"]["maxOutputTokens"] == 4096
+        
+        from utils.exceptions import LLMError
+        with pytest.raises(LLMError, match="stream error: quota"):
+            strategy._rest_stream_delta({"error": {"code": 429, "message": "quota"}})
@@ -0,0 +1,1140 @@
+"""
+AURIX v4.0 Test Suite
+Tests for the RAG infrastructure layer.
+"""
+
+import pytest
+import sys
+import os
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+np = pytest.importorskip("numpy")
+
+
+def _make_chunks(count, dim=16, seed=7):
+    """Build chunks with random embeddings."""
+    from infrastructure.rag import DocumentChunk
+    
+    rng = np.random.default_rng(seed)
+    chunks = [
+        DocumentChunk(id=f"c{i}", content=f"chunk {i}", metadata={"filename": f"doc{i % 3}.txt"})
+        for i in range(count)
+    ]
+    return chunks, rng.normal(size=(count, dim)).tolist()
+
+
+class TestNumpyVectorStore:
+    """Test the matrix-backed vector store."""
+    
+    def test_search_matches_reference_store(self):
+        """Test ranking matches the pure-Python store."""
+        from infrastructure.rag import InMemoryVectorStore, NumpyVectorStore
+        
+        chunks, embeddings = _make_chunks(50)
+        reference, store = InMemoryVectorStore(), NumpyVectorStore()
+        reference.add(chunks, embeddings)
+        store.add(chunks, embeddings)
+        
+        query = embeddings[3]
+        expected = reference.search(query, top_k=5)
+        actual = store.search(query, top_k=5)
+        
+        assert [r.chunk.id for r in actual] == [r.chunk.id for r in expected]
+        for a, e in zip(actual, expected):
+            assert a.score == pytest.approx(e.score, abs=1e-5)
+    
+    def test_delete_and_reuse_rows(self):
+        """Test deleted chunks disappear and their rows are reused."""
+        from infrastructure.rag import NumpyVectorStore
+        
+        chunks, embeddings = _make_chunks(10)
+        store = NumpyVectorStore()
+        store.add(chunks, embeddings)
+        store.delete(["c3"])
+        
+        assert "c3" not in [r.chunk.id for r in store.search(embeddings[3], top_k=10)]
+        assert store.size == 9
+        assert len(store.embeddings) == 9
+        
+        store._vectors = lambda rows: pytest.fail("membership test dequantised a row")
+        assert "c4" in store.embeddings and "c3" not in store.embeddings
+        del store._vectors
+        
+        extra, extra_embeddings = _make_chunks(1, seed=11)
+        extra[0].id = "new"
+        store.add(extra, extra_embeddings)
+        assert store.search(extra_embeddings[0], top_k=1)[0].chunk.id == "new"
+        assert len(store._row_ids) == 10
+    
+    def test_dimension_mismatch_rejected(self):
+        """Test adding embeddings of a different size fails."""
+        from infrastructure.rag import NumpyVectorStore
+        
+        store = NumpyVectorStore()
+        chunks, embeddings = _make_chunks(2, dim=8)
+        store.add(chunks, embeddings)
+        
+        other, other_embeddings = _make_chunks(1, dim=4)
+        with pytest.raises(ValueError):
+            store.add(other, other_embeddings)
+    
+    def test_search_many_matches_single_search(self):
+        """Test batched search returns the same rankings as one-by-one search."""
+        from infrastructure.rag import NumpyVectorStore
+        
+        chunks, embeddings = _make_chunks(40)
+        store = NumpyVectorStore()
+        store.add(chunks, embeddings)
+        
+        queries = embeddings[:4]
+        batched = store.search_many(queries, top_k=3)
+        assert len(batched) == 4
+        for query, results in zip(queries, batched):
+            assert [r.chunk.id for r in results] == [r.chunk.id for r in store.search(query, top_k=3)]
+
+
+class TestQuantizedVectorStore:
+    """Test float16 / int8 embedding storage."""
+    
+    @pytest.mark.parametrize("quantization", ["float16", "int8"])
+    def test_recall_against_float32(self, quantization):
+        """Test quantised rankings stay close to float32 and memory shrinks."""
+        from infrastructure.rag import NumpyVectorStore
+        
+        chunks, embeddings = _make_chunks(500, dim=64)
+        exact, store = NumpyVectorStore(), NumpyVectorStore(quantization=quantization)
+        exact.add(chunks, embeddings)
+        store.add(chunks, embeddings)
+        
+        queries = _make_chunks(20, dim=64, seed=5)[1]
+        hits = 0
+        for expected, actual in zip(exact.search_many(queries, top_k=10), store.search_many(queries, top_k=10)):
+            hits += len({r.chunk.id for r in expected} & {r.chunk.id for r in actual})
+        assert hits / 200 >= 0.9
+        
+        usage = store.memory_usage()
+        assert usage["quantization"] == quantization
+        assert usage["vector_bytes"] < exact.memory_usage()["vector_bytes"] / 1.9
+    
+    def test_rerank_returns_exact_scores(self):
+        """Test re-ranked results carry float32 scores and deletes are honoured."""
+        from infrastructure.rag import NumpyVectorStore
+        
+        chunks, embeddings = _make_chunks(200, dim=32)
+        exact, store = NumpyVectorStore(), NumpyVectorStore(quantization="int8", rerank_factor=4)
+        exact.add(chunks, embeddings)
+        store.add(chunks, embeddings)
+        
+        expected = exact.search(embeddings[7], top_k=5)
+        actual = store.search(embeddings[7], top_k=5)
+        assert [r.chunk.id for r in actual] == [r.chunk.id for r in expected]
+        for a, e in zip(actual, expected):
+            assert a.score == pytest.approx(e.score, abs=1e-5)
+        
+        store.delete(["c7"])
+        assert "c7" not in [r.chunk.id for r in store.search(embeddings[7], top_k=5)]
+        
+        usage = store.memory_usage()
+        assert usage["rerank_bytes"] == usage["float32_bytes"]
+        assert usage["compression"] < 1.0
+    
+    def test_unknown_quantization_rejected(self):
+        """Test an unsupported storage type fails fast."""
+        from infrastructure.rag import NumpyVectorStore
+        
+        with pytest.raises(ValueError):
+            NumpyVectorStore(quantization="int4")
+
+
+class TestIVFVectorStore:
+    """Test the approximate nearest-neighbour store."""
+    
+    def test_recall_against_exact_store(self):
+        """Test IVF recall@10 stays high on clustered data."""
+        from infrastructure.rag.benchmark import ann_recall_benchmark
+        
+        report = ann_recall_benchmark(n_vectors=3000, dim=32, n_queries=30, nprobe_values=(8,))
+        assert report["ivf"][0]["recall@10"] >= 0.9
+    
+    def test_exact_until_trained_and_deletes(self):
+        """Test small stores search exactly and deleted rows are skipped."""
+        from infrastructure.rag import IVFVectorStore
+        
+        chunks, embeddings = _make_chunks(30)
+        store = IVFVectorStore(min_train_size=50)
+        store.add(chunks, embeddings)
+        assert not store.index.trained
+        
+        more, more_embeddings = _make_chunks(40, seed=3)
+        for chunk in more:
+            chunk.id = "m" + chunk.id
+        store.add(more, more_embeddings)
+        assert store.index.trained
+        
+        store.delete(["mc5"])
+        assert "mc5" not in [r.chunk.id for r in store.search(more_embeddings[5], top_k=5)]
+    
+    def test_stale_list_entries_compacted(self):
+        """Test deletes and re-adds compact the IVF lists once stale entries pass the threshold."""
+        from infrastructure.rag import IVFVectorStore
+        
+        chunks, embeddings = _make_chunks(100)
+        store = IVFVectorStore(min_train_size=50, compact_threshold=0.1)
+        store.add(chunks, embeddings)
+        assert store.index.filed == 100 and store.index.stale == 0
+        
+        store.delete([f"c{i}" for i in range(5)])
+        assert store.index.stale == 5
+        store.add(chunks[5:10], embeddings[5:10])  # re-filing moves rows, leaving 5 more stale entries
+        assert store.index.stale == 0
+        assert sum(len(rows) for rows in store.index._lists) == store.index.filed == 95
+        assert store.search(embeddings[7], top_k=1)[0].chunk.id == "c7"
+
+
+class TestEngineBenchmark:
+    """Test the end-to-end RAGEngine benchmark."""
+    
+    def test_engine_benchmark_keyword_path(self):
+        """Test the seed-corpus benchmark runs on the keyword path and finds labelled findings."""
+        import json
+        from infrastructure.rag.benchmark import rag_engine_benchmark
+        
+        report = rag_engine_benchmark(documents=6, findings=4, n_queries=12, keyword_only=True)
+        assert report["mode"] == "keyword"
+        assert report["queries"] == 12
+        assert report["recall@5"] >= 0.9
+        assert set(report["query_latency_ms"]) == {"mean", "p50", "p95", "p99"}
+        assert report["memory_bytes_per_chunk"] > 0
+        json.dumps(report)
+
+
+class TestPersistentVectorStore:
+    """Test the on-disk vector store."""
+    
+    def test_reload_from_disk(self, tmp_path):
+        """Test a new store instance sees the same chunks and rankings."""
+        from infrastructure.rag import PersistentVectorStore
+        
+        chunks, embeddings = _make_chunks(20)
+        store = PersistentVectorStore(str(tmp_path))
+        store.add(chunks[:10], embeddings[:10])
+        store.add(chunks[10:], embeddings[10:])
+        store.delete(["c4"])
+        expected = [r.chunk.id for r in store.search(embeddings[4], top_k=5)]
+        
+        reloaded = PersistentVectorStore(str(tmp_path))
+        assert reloaded.size == 19
+        assert isinstance(reloaded._matrix, np.memmap)
+        assert [r.chunk.id for r in reloaded.search(embeddings[4], top_k=5)] == expected
+        assert reloaded.keyword_search("chunk", top_k=1)
+    
+    def test_compact_drops_deleted_rows(self, tmp_path):
+        """Test compaction rewrites only live rows."""
+        from infrastructure.rag import PersistentVectorStore
+        
+        chunks, embeddings = _make_chunks(6)
+        store = PersistentVectorStore(str(tmp_path))
+        store.add(chunks, embeddings)
+        store.add(chunks[:1], embeddings[1:2])
+        store.delete(["c2", "c3"])
+        assert store.storage.rows == 7
+        
+        store.compact()
+        assert store.storage.rows == 4
+        assert store.search(embeddings[1], top_k=2)[0].score == pytest.approx(1.0, abs=1e-5)
+        assert PersistentVectorStore(str(tmp_path)).size == 4
+    
+    def test_interrupted_compact_keeps_previous_data(self, tmp_path, monkeypatch):
+        """Test a compaction failing mid-write leaves the committed store loadable."""
+        from infrastructure.rag import PersistentVectorStore
+        from infrastructure.rag import persistence
+        
+        chunks, embeddings = _make_chunks(6)
+        store = PersistentVectorStore(str(tmp_path))
+        store.add(chunks, embeddings)
+        store.delete(["c2"])
+        
+        fsync = persistence.os.fsync
+        calls = []
+        def failing_fsync(fd):
+            calls.append(fd)
+            if len(calls) == 2:
+                raise OSError("disk full")
+            fsync(fd)
+        monkeypatch.setattr(persistence.os, "fsync", failing_fsync)
+        with pytest.raises(OSError):
+            store.compact()
+        monkeypatch.setattr(persistence.os, "fsync", fsync)
+        
+        reloaded = PersistentVectorStore(str(tmp_path))
+        assert reloaded.size == 5 and reloaded.storage.rows == 6
+        assert reloaded.search(embeddings[1], top_k=1)[0].chunk.id == "c1"
+        
+        reloaded.compact()
+        assert PersistentVectorStore(str(tmp_path)).storage.rows == 5
+        assert sorted(os.listdir(tmp_path)) == ["chunks.1.jsonl", "embeddings.1.f32", "manifest.json"]
+
+
+class TestKeywordSearch:
+    """Test BM25 keyword search."""
+    
+    def _store(self):
+        from infrastructure.rag import DocumentChunk, InMemoryVectorStore
+        
+        store = InMemoryVectorStore()
+        store.add([
+            DocumentChunk(id="a", content="Manajemen risiko kredit dan risk appetite bank", metadata={"filename": "a.txt"}),
+            DocumentChunk(id="b", content="The asterisk marks optional fields", metadata={"filename": "b.txt"}),
+            DocumentChunk(id="c", content="Kontrol akses sistem informasi yang memadai", metadata={"filename": "c.txt"}),
+        ])
+        return store
+    
+    def test_whole_word_matching(self):
+        """Test terms do not match inside longer words."""
+        results = self._store().keyword_search("risk", top_k=5)
+        assert [r.chunk.id for r in results] == ["a"]
+        assert 0 < results[0].score < 1
+    
+    def test_stopwords_ignored(self):
+        """Test queries made only of stopwords return nothing."""
+        assert self._store().keyword_search("yang dan the", top_k=5) == []
+    
+    def test_delete_removes_postings(self):
+        """Test deleted chunks are no longer returned."""
+        store = self._store()
+        store.delete(["c"])
+        assert store.keyword_search("akses", top_k=5) == []
+        assert store.keyword_index.document_frequency("akses") == 0
+    
+    def test_phrase_vocabulary(self):
+        """Test multi-word domain terms are indexed as phrases."""
+        from infrastructure.rag.keyword_index import BM25Index
+        
+        index = BM25Index(vocabulary=["manajemen risiko"])
+        assert "manajemen risiko" in index.tokenize("Penerapan manajemen risiko bank")
+
+
+class _CountingModel:
+    """Stand-in for a SentenceTransformer that records encoded texts."""
+    
+    def __init__(self):
+        self.encoded = []
+    
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return np.array([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
+
+class TestEmbeddingCache:
+    """Test content-hash embedding caching."""
+    
+    def test_only_misses_are_encoded(self, tmp_path):
+        """Test unchanged chunks are served from the cache."""
+        from infrastructure.rag import EmbeddingCache, SentenceTransformerEmbedding
+        
+        cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+        provider = SentenceTransformerEmbedding("test-model", cache=cache)
+        provider._model = _CountingModel()
+        
+        first = provider.embed(["alpha", "beta"])
+        second = provider.embed(["alpha", "gamma", "beta"])
+        
+        assert provider._model.encoded == ["alpha", "beta", "gamma"]
+        assert second[0] == first[0] and second[2] == first[1]
+        assert cache.get_stats()["hits"] == 2
+    
+    def test_lru_eviction(self):
+        """Test the cache stays within max_entries."""
+        from infrastructure.rag import EmbeddingCache
+        
+        cache = EmbeddingCache(max_entries=2)
+        cache.put_many("m", [("a", [1.0]), ("b", [2.0])])
+        cache.get_many("m", ["a"])
+        cache.put_many("m", [("c", [3.0])])
+        
+        assert cache.size == 2
+        assert set(cache.get_many("m", ["a", "b", "c"])) == {"a", "c"}
+
+
+SAMPLE_POLICY = (
+    "Kebijakan manajemen risiko kredit bank mengacu pada POJK No. 18/2016 yang berlaku untuk semua unit.\n"
+    "Temuan audit menunjukkan kelemahan kontrol akses. Fraud terdeteksi pada proses pembiayaan!\n"
+    "Apakah rekomendasi sudah ditindaklanjuti? Belum ada tindak lanjut dari direksi.\n"
+) * 6
+
+
+class TestDocumentStream:
+    """Test streaming document processing."""
+    
+    def test_stream_matches_batch_processing(self):
+        """Test streamed chunks and metadata match whole-document processing."""
+        from infrastructure.rag import DocumentProcessor
+        
+        processor = DocumentProcessor(chunk_size=200)
+        expected = processor.process(SAMPLE_POLICY, "policy.txt")
+        
+        stream = processor.process_stream(iter(SAMPLE_POLICY.splitlines()), "policy.txt")
+        doc = stream.to_document(list(stream))
+        
+        assert [c.content for c in doc.chunks] == [c.content for c in expected.chunks]
+        for key in ("language", "categories", "risk_indicators", "word_count"):
+            assert doc.metadata[key] == expected.metadata[key]
+        assert sorted(doc.metadata["regulations_mentioned"]) == sorted(expected.metadata["regulations_mentioned"])
+        assert doc.chunks[0].metadata["categories"] == expected.metadata["categories"]
+    
+    def test_chunks_yielded_before_input_exhausted(self):
+        """Test the first chunk is produced before all blocks are read."""
+        from infrastructure.rag import DocumentProcessor
+        
+        consumed = []
+        
+        def blocks():
+            for line in SAMPLE_POLICY.splitlines():
+                consumed.append(line)
+                yield line
+        
+        stream = DocumentProcessor(chunk_size=200).process_stream(blocks(), "policy.txt")
+        next(iter(stream))
+        assert len(consumed) < len(SAMPLE_POLICY.splitlines())
+
+
+SAMPLE_REGULATION = """PERATURAN OTORITAS JASA KEUANGAN
+BAB I
+KETENTUAN UMUM
+Pasal 1
+Dalam Peraturan ini yang dimaksud dengan Bank adalah bank umum konvensional.
+Pasal 2
+(1) Bank wajib menerapkan manajemen risiko secara efektif. Penerapan mencakup pengawasan aktif direksi.
+(2) Penerapan sebagaimana dimaksud pada ayat (1) disesuaikan dengan ukuran dan kompleksitas usaha Bank.
+BAB II
+PENGAWASAN
+Pasal 3
+""" + "Direksi wajib memastikan kontrol akses sistem informasi ditinjau secara berkala. " * 8
+
+
+class TestStructuredChunker:
+    """Test structure-aware chunking of regulations."""
+    
+    def test_splits_on_chapters_and_records_section_path(self):
+        """Test chunks do not cross a BAB and carry their Pasal/Ayat path."""
+        from infrastructure.rag import DocumentProcessor
+        
+        doc = DocumentProcessor(chunk_size=300, chunk_overlap=0).process(SAMPLE_REGULATION, "pojk.txt")
+        paths = [c.metadata.get("section_path", "") for c in doc.chunks]
+        
+        assert "BAB I KETENTUAN UMUM > Pasal 2 > Ayat (2)" in [
+            p for c in doc.chunks for p in c.metadata.get("sections", [c.metadata.get("section_path")])
+        ]
+        chapter_two = [c for c, p in zip(doc.chunks, paths) if p.startswith("BAB II")]
+        assert chapter_two[0].content.startswith("BAB II PENGAWASAN Pasal 3")
+        assert not any("Pasal 3" in c.content for c, p in zip(doc.chunks, paths) if p.startswith("BAB I "))
+        assert all(len(c.content) <= 300 for c in doc.chunks)
+    
+    def test_overlap_honours_chunk_overlap(self):
+        """Test size-cut chunks repeat at most chunk_overlap of the previous chunk."""
+        from infrastructure.rag.chunking import StructuredChunker
+        
+        sentence = "Direksi wajib memastikan kontrol akses sistem informasi ditinjau secara berkala."
+        text = " ".join(f"{sentence[:-1]} {i}." for i in range(20))
+        
+        no_overlap = StructuredChunker(250, 0).split(text)
+        overlap = StructuredChunker(250, 100).split(text)
+        assert len(overlap) > len(no_overlap)
+        for (previous, _), (current, _) in zip(overlap, overlap[1:]):
+            shared = next(n for n in range(len(current), -1, -1) if previous.endswith(current[:n]))
+            assert 0 < shared <= 100
+        
+        tokens = StructuredChunker(60, 20, unit="tokens")
+        for chunk, _ in tokens.split(text):
+            assert tokens.length(chunk) <= 60
+    
+    def test_stream_matches_batch_with_headings(self):
+        """Test streamed lines give the same chunks and paths as the whole document."""
+        from infrastructure.rag import DocumentProcessor
+        
+        processor = DocumentProcessor(chunk_size=200, chunk_overlap=50)
+        expected = processor.process(SAMPLE_REGULATION, "pojk.txt")
+        stream = processor.process_stream(iter(SAMPLE_REGULATION.splitlines()), "pojk.txt")
+        doc = stream.to_document(list(stream))
+        
+        assert [c.content for c in doc.chunks] == [c.content for c in expected.chunks]
+        assert [c.metadata.get("section_path") for c in doc.chunks] == [
+            c.metadata.get("section_path") for c in expected.chunks
+        ]
+
+
+class TestChunkMetadata:
+    """Test shared document metadata behind chunk.metadata."""
+    
+    def test_chunks_share_document_fields(self):
+        """Test chunks read like flat dicts but hold one document record."""
+        from infrastructure.rag import DocumentProcessor
+        
+        doc = DocumentProcessor(chunk_size=200).process(SAMPLE_POLICY, "policy.txt")
+        first, second = doc.chunks[0], doc.chunks[1]
+        
+        assert first.metadata.record is second.metadata.record
+        assert first.metadata == {
+            **doc.metadata,
+            "filename": "policy.txt",
+            "chunk_index": 0,
+            "chunk_keywords": first.metadata["chunk_keywords"]
+        }
+        assert second.metadata["chunk_index"] == 1
+        assert not hasattr(first, "__dict__")
+        
+        first.metadata["reviewed"] = True
+        del first.metadata["language"]
+        assert "reviewed" not in second.metadata and second.metadata["language"] == doc.metadata["language"]
+        assert "language" not in first.metadata
+    
+    def test_persistent_reload_reshares_metadata(self, tmp_path):
+        """Test metadata written as plain dicts is shared again on load."""
+        from infrastructure.rag import DocumentProcessor, PersistentVectorStore
+        
+        doc = DocumentProcessor(chunk_size=200).process(SAMPLE_POLICY, "policy.txt")
+        store = PersistentVectorStore(str(tmp_path))
+        store.add(doc.chunks)
+        
+        reloaded = PersistentVectorStore(str(tmp_path))
+        assert len(reloaded.chunks) > 1
+        assert {cid: dict(c.metadata) for cid, c in reloaded.chunks.items()} == {
+            cid: dict(c.metadata) for cid, c in store.chunks.items()
+        }
+        assert len({id(c.metadata.record) for c in reloaded.chunks.values()}) == 1
+
+
+def _result(chunk_id, content, score):
+    from infrastructure.rag import DocumentChunk, RetrievalResult
+    
+    return RetrievalResult(
+        chunk=DocumentChunk(id=chunk_id, content=content, metadata={"filename": "policy.txt"}),
+        score=score,
+        source_document="policy.txt"
+    )
+
+
+class TestContextPacker:
+    """Test token-budgeted context assembly."""
+    
+    def test_budget_duplicates_and_truncation(self):
+        """Test packing stays in budget, drops overlaps and cuts at a sentence."""
+        from infrastructure.rag.context import ContextPacker
+        
+        long_text = " ".join(f"Kalimat nomor {i} tentang kontrol akses sistem." for i in range(60))
+        results = [
+            _result("a", "Risiko kredit wajib dipantau setiap bulan oleh unit manajemen risiko.", 0.9),
+            _result("b", "Risiko kredit wajib dipantau setiap bulan oleh unit manajemen risiko!", 0.8),
+            _result("c", long_text, 0.7)
+        ]
+        packer = ContextPacker(min_truncated_tokens=8)
+        
+        unlimited = packer.pack(results)
+        assert unlimited.duplicates_dropped == 0 and unlimited.tokens is None
+        assert [r.chunk.id for r in unlimited.results] == ["a", "b", "c"]
+        
+        packed = packer.pack(results, max_tokens=120)
+        assert packed.duplicates_dropped == 1
+        assert packed.tokens <= 120 and packed.remaining >= 0
+        assert packed.truncated == 1
+        assert "[Source 2: policy.txt]" in packed.text
+        body = packed.text.split("[Source 2: policy.txt]\n")[1].split("\n[Relevance")[0]
+        assert body.endswith("sistem.") and body in long_text
+    
+    def test_engine_contexts_respect_budget(self):
+        """Test generate_context and the audit context honour max_tokens."""
+        from infrastructure.rag import AuditRAGHelper
+        
+        engine = TestRAGEngine()._engine()
+        counter = engine.context_packer.counter
+        
+        context = engine.generate_context("risiko kredit", top_k=5, max_tokens=60)
+        assert counter.count(context) <= 60
+        assert context.startswith("[Source 1:")
+        
+        packed = AuditRAGHelper(engine).pack_audit_context("kredit", ["fraud"], max_tokens=60)
+        assert packed.tokens <= 60
+        assert len({r.chunk.id for r in packed.results}) == len(packed.results)
+    
+    def test_context_without_budget_counts_nothing(self, monkeypatch):
+        """Test an unbudgeted generate_context neither counts tokens nor drops near-duplicates."""
+        from infrastructure.rag.context import TokenCounter
+        
+        engine = TestRAGEngine()._engine()
+        def no_counting(self, text):
+            raise AssertionError("token count without a budget")
+        monkeypatch.setattr(TokenCounter, "count", no_counting)
+        
+        results = engine.query("risiko kredit", top_k=5)
+        context = engine.generate_context("risiko kredit", top_k=5)
+        
+        assert context.count("[Source ") == len(results)
+        assert not engine.context_packer.counter._loaded
+    
+    def test_audit_context_keeps_repeats_without_budget(self):
+        """Test the unbudgeted audit context lists every section's results, repeats included."""
+        from infrastructure.rag import AuditRAGHelper
+        
+        engine = TestRAGEngine()._engine()
+        helper = AuditRAGHelper(engine)
+        
+        parts = []
+        for title, query, top_k in [
+            ("## Background Information", "kredit", 3),
+            ("\n## Risk Indicators", "kredit risk issues problems", 3),
+            ("\n## Existing Controls", "kredit control procedure", 3),
+            ("\n## Focus: fraud", "kredit fraud", 2)
+        ]:
+            results = engine.query(query, top_k=top_k)
+            if results:
+                parts.append(title)
+                parts += [f"From {r.source_document}:\n{r.chunk.content}" for r in results]
+        
+        context = helper.generate_audit_context("kredit", ["fraud"])
+        assert context == "\n\n".join(parts)
+        
+        unlimited = helper.pack_audit_context("kredit", ["fraud"])
+        assert unlimited.duplicates_dropped == 0
+        assert len(unlimited.results) > len({r.chunk.id for r in unlimited.results})
+        
+        budgeted = helper.pack_audit_context("kredit", ["fraud"], max_tokens=10_000)
+        assert len(budgeted.results) == len({r.chunk.id for r in budgeted.results})
+
+
+class TestKeywordExtractor:
+    """Test the single-pass metadata scanner."""
+    
+    def test_metadata_fields(self):
+        """Test one scan fills language, categories, regulations and risk indicators."""
+        from infrastructure.rag import DocumentProcessor
+        
+        metadata = DocumentProcessor()._extract_metadata(SAMPLE_POLICY, "policy.txt")
+        
+        assert metadata["language"] == "id"
+        assert "credit" in metadata["categories"]
+        assert metadata["regulations_mentioned"] == ["POJK No. 18/2016"]
+        assert metadata["risk_indicators"]["high_risk"] == ["fraud"]
+        assert metadata["risk_indicators"]["control_weakness"] == ["kelemahan"]
+    
+    def test_overlapping_keywords(self):
+        """Test keywords that share a start position are all reported."""
+        from infrastructure.rag.extraction import KeywordExtractor
+        
+        extractor = KeywordExtractor(
+            ["risk", "risk appetite", "pojk"],
+            function_words=["yang"],
+            regulation_patterns=[r"POJK\s*\d+/\d+"]
+        )
+        result = extractor.scan("Risk Appetite per POJK 18/2016 yang berlaku")
+        
+        assert result.keywords == {"risk", "risk appetite", "pojk"}
+        assert result.regulations == {"POJK 18/2016"}
+        assert result.function_words == {"yang"}
+
+
+class _StubEmbedding:
+    """Deterministic bag-of-characters embedding that counts calls."""
+    
+    def __init__(self):
+        self.calls = 0
+        self.texts = []
+    
+    def _vector(self, text):
+        vector = [0.0] * 26
+        for ch in text.lower():
+            if "a" <= ch <= "z":
+                vector[ord(ch) - ord("a")] += 1.0
+        return vector
+    
+    def embed(self, texts):
+        self.calls += 1
+        self.texts.extend(texts)
+        return [self._vector(t) for t in texts]
+    
+    def embed_query(self, query):
+        self.calls += 1
+        return self._vector(query)
+
+
+class TestRAGEngine:
+    """Test RAGEngine query paths."""
+    
+    def _engine(self):
+        from infrastructure.rag import RAGEngine
+        
+        engine = RAGEngine(chunk_size=200)
+        engine.embedding_provider = _StubEmbedding()
+        engine.index_document(
+            "Manajemen risiko kredit wajib dipantau. Kontrol akses sistem informasi harus diverifikasi. "
+            "Prosedur approval transaksi dilakukan oleh direksi. Temuan audit terkait fraud dilaporkan.",
+            "policy.txt"
+        )
+        engine.embedding_provider.calls = 0
+        return engine
+    
+    def test_query_many_matches_query(self):
+        """Test batched queries return what individual queries return."""
+        engine = self._engine()
+        queries = ["risiko kredit", "kontrol akses", "fraud"]
+        
+        batched = engine.query_many(queries, top_k=2)
+        assert engine.embedding_provider.calls == 1
+        
+        for query, results in zip(queries, batched):
+            single = engine.query(query, top_k=2)
+            assert [r.chunk.id for r in results] == [r.chunk.id for r in single]
+    
+    def test_audit_context_uses_single_embedding_call(self):
+        """Test audit context building embeds all sub-queries together."""
+        from infrastructure.rag import AuditRAGHelper
+        
+        engine = self._engine()
+        searches = []
+        search_many = engine._search_many
+        def recording_search_many(queries, top_k, *args):
+            searches.append((len(queries), top_k))
+            return search_many(queries, top_k, *args)
+        engine._search_many = recording_search_many
+        
+        context = AuditRAGHelper(engine).generate_audit_context("kredit", ["fraud", "akses"])
+        
+        assert engine.embedding_provider.calls == 1
+        assert "## Background Information" in context
+        assert searches == [(3, 3), (2, 2)]
+    
+    def test_index_stream_embeds_in_batches(self):
+        """Test streamed indexing embeds per batch and stores final metadata."""
+        engine = self._engine()
+        engine.clear()
+        
+        doc = engine.index_stream(iter(SAMPLE_POLICY.splitlines()), "stream.txt", batch_size=4)
+        
+        assert engine.embedding_provider.calls == -(-doc.chunk_count // 4)
+        unique_chunks = len({c.id for c in doc.chunks})
+        assert engine.vector_store.size == unique_chunks
+        assert len(engine.vector_store.embeddings) == unique_chunks
+        assert "credit" in engine.query("kredit", top_k=1)[0].chunk.metadata["categories"]
+    
+    def test_query_cache_hits_until_index_changes(self):
+        """Test repeated queries are served from cache and invalidated by indexing."""
+        engine = self._engine()
+        
+        first = engine.query("Risiko  kredit", top_k=2)
+        again = engine.query("risiko kredit ", top_k=2)
+        context = engine.generate_context("risiko kredit", top_k=2)
+        assert engine.generate_context("risiko kredit", top_k=2) == context
+        assert [r.chunk.id for r in again] == [r.chunk.id for r in first]
+        assert engine.embedding_provider.calls == 1
+        
+        generation = engine.generation
+        engine.index_document("Temuan baru terkait risiko kredit macet.", "memo.txt")
+        calls = engine.embedding_provider.calls
+        engine.query("Risiko kredit", top_k=2)
+        assert engine.embedding_provider.calls == calls  # query embedding is still cached
+        
+        stats = engine.get_stats()["query_cache"]
+        assert stats["hits"] >= 2 and stats["generation"] == generation + 1
+    
+    def test_index_many_batches_across_documents(self, tmp_path):
+        """Test bulk indexing of paths and blobs shares embedding batches and reports progress."""
+        engine = self._engine()
+        engine.clear()
+        path = tmp_path / "policy.txt"
+        path.write_text(SAMPLE_POLICY, encoding="utf-8")
+        sources = [str(path), ("memo.txt", "Temuan audit fraud kredit. Kontrol akses lemah."), ("blob.txt", b"Prosedur SOP operasional.")]
+        updates = []
+        
+        stats = engine.index_many(sources, max_workers=0, batch_size=1000, progress_callback=lambda s: updates.append(s.documents_done))
+        
+        assert engine.embedding_provider.calls == 1
+        assert stats.documents_done == 3 and not stats.failures
+        assert stats.chunks_stored == engine.vector_store.size
+        assert engine.vector_store.size == len(set(engine.vector_store.chunks))
+        assert updates[-1] == 3
+        assert set(stats.throughput()) >= {"parse_docs_per_s", "embed_chunks_per_s", "store_chunks_per_s"}
+    
+    def test_index_many_process_pool_records_failures(self, tmp_path):
+        """Test process-pool parsing indexes readable files and records unreadable ones."""
+        engine = self._engine()
+        engine.clear()
+        path = tmp_path / "policy.txt"
+        path.write_text(SAMPLE_POLICY, encoding="utf-8")
+        
+        stats = engine.index_many([str(path), str(tmp_path / "missing.txt")], max_workers=2)
+        
+        assert stats.documents_done == 2
+        assert [name for name, _ in stats.failures] == [str(tmp_path / "missing.txt")]
+        assert engine.vector_store.size > 0
+    
+    def test_index_many_keeps_same_named_files_apart(self, tmp_path):
+        """Test files sharing a basename in different folders are separate documents."""
+        engine = self._engine()
+        engine.clear()
+        paths = []
+        for year in ("2023", "2024"):
+            folder = tmp_path / year
+            folder.mkdir()
+            path = folder / "SOP.txt"
+            path.write_text(f"Laporan audit tahun {year}. Kontrol akses kredit diuji.", encoding="utf-8")
+            paths.append(str(path))
+        
+        stats = engine.index_many(paths + [("memo.txt", "Memo A."), ("memo.txt", "Memo B.", "unit-b/memo.txt")], max_workers=0)
+        
+        assert len(set(stats.document_ids)) == 4
+        contents = {c.content for c in engine.vector_store.chunks.values()}
+        assert any("2023" in c for c in contents) and any("2024" in c for c in contents)
+        assert {"Memo A.", "Memo B."} <= contents
+    
+    def test_index_many_process_pool_keeps_chunk_metadata(self, tmp_path):
+        """Test chunk metadata survives the trip back from worker processes."""
+        import json
+        
+        engine = self._engine()
+        engine.clear()
+        path = tmp_path / "pojk.txt"
+        path.write_text(SAMPLE_REGULATION, encoding="utf-8")
+        expected = engine.processor.process(SAMPLE_REGULATION, "pojk.txt")
+        
+        other = tmp_path / "memo.txt"
+        other.write_text("Temuan audit fraud kredit. Kontrol akses lemah.", encoding="utf-8")
+        
+        engine.index_many([str(path), str(other)], max_workers=2)
+        
+        stored = [c for c in engine.vector_store.chunks.values() if c.metadata["filename"] == "pojk.txt"]
+        def plain(chunks):
+            return [{k: v for k, v in c.metadata.items() if k != "processed_at"} for c in chunks]
+        
+        assert all(metadata in plain(expected.chunks) for metadata in plain(stored))
+        assert any("sections" in c.metadata for c in stored) and not all("sections" in c.metadata for c in stored)
+        assert "object at 0x" not in json.dumps([dict(c.metadata) for c in stored], default=str)
+
+
+
+class TestIncrementalIndexing:
+    """Test document versioning and incremental re-indexing."""
+    
+    SECTIONS = [
+        f"Pasal {i}. Bank wajib menerapkan manajemen risiko kredit tahap {i}. "
+        f"Kontrol akses sistem informasi ditinjau setiap {i} bulan."
+        for i in range(1, 9)
+    ]
+    
+    def _engine(self, **kwargs):
+        from infrastructure.rag import RAGEngine
+        
+        engine = RAGEngine(chunk_size=120, **kwargs)
+        engine.embedding_provider = _StubEmbedding()
+        return engine
+    
+    def test_unchanged_document_is_skipped(self):
+        """Test re-indexing identical content does no processing or embedding."""
+        engine = self._engine()
+        first = engine.index_document(" ".join(self.SECTIONS), "pojk.txt")
+        engine.embedding_provider.calls = 0
+        
+        second = engine.index_document(" ".join(self.SECTIONS), "pojk.txt")
+        
+        assert engine.embedding_provider.calls == 0
+        assert second.id == first.id
+        assert {c.id for c in second.chunks} == {c.id for c in first.chunks}
+    
+    def test_changed_document_embeds_only_new_chunks(self):
+        """Test a new version embeds new chunks and deletes stale ones."""
+        engine = self._engine()
+        doc = engine.index_document(" ".join(self.SECTIONS), "pojk.txt")
+        old_ids = {c.id for c in doc.chunks}
+        engine.embedding_provider.texts.clear()
+        
+        updated = self.SECTIONS[:-1] + ["Pasal 8. Ketentuan ini berlaku sejak diundangkan."]
+        new_doc = engine.index_document(" ".join(updated), "pojk.txt")
+        new_ids = {c.id for c in new_doc.chunks}
+        
+        assert new_doc.id == doc.id
+        assert engine.documents.get(doc.id).version == 2
+        assert 0 < len(engine.embedding_provider.texts) < len(new_ids)
+        assert set(engine.vector_store.chunks) == new_ids
+        assert not (old_ids - new_ids) & set(engine.vector_store.embeddings)
+    
+    def test_remove_document_keeps_shared_chunks(self):
+        """Test removing a document keeps chunks another document still uses."""
+        engine = self._engine()
+        a = engine.index_document(" ".join(self.SECTIONS), "a.txt")
+        b = engine.index_document(self.SECTIONS[0], "b.txt")
+        shared = {c.id for c in b.chunks}
+        
+        assert engine.remove_document(a.id)
+        assert not engine.remove_document(a.id)
+        assert set(engine.vector_store.chunks) == shared
+        
+        engine.remove_document(b.id)
+        assert engine.vector_store.size == 0
+    
+    def test_remove_document_reassigns_shared_chunk_metadata(self):
+        """Test chunks shared with a removed document take the remaining document's metadata."""
+        engine = self._engine()
+        engine.index_document(" ".join(self.SECTIONS[:2]), "a.txt", metadata={"unit": "a"})
+        b = engine.index_document(" ".join(self.SECTIONS), "b.txt", metadata={"unit": "b"})
+        
+        engine.remove_document(b.id)
+        
+        stored = list(engine.vector_store.chunks.values())
+        assert stored and all(c.metadata["filename"] == "a.txt" for c in stored)
+        assert all(c.metadata["unit"] == "a" for c in stored)
+        assert engine.vector_store.facet_index.match({"filename": "b.txt"}) == set()
+    
+    def test_small_edit_does_not_reappend_unchanged_rows(self, tmp_path):
+        """Test an edit only stores the changed chunk; the rest just get new metadata."""
+        engine = self._engine(persist_directory=str(tmp_path))
+        text = " ".join(self.SECTIONS)
+        engine.index_document(text, "pojk.txt")
+        rows = engine.vector_store.storage.rows
+        
+        for word in ("triwulan", "semester", "tahun"):
+            text = text.rsplit(" ", 1)[0] + f" {word}."
+            engine.index_document(text, "pojk.txt")
+        
+        assert engine.vector_store.storage.rows <= rows + 3
+        reopened = self._engine(persist_directory=str(tmp_path))
+        word_counts = {c.metadata["word_count"] for c in reopened.vector_store.chunks.values()}
+        assert word_counts == {len(text.split())}
+    
+    def test_index_many_embeds_chunks_shared_in_flight_once(self):
+        """Test a chunk shared by documents of one run is embedded once, whichever batch it lands in."""
+        engine = self._engine()
+        sources = [(f"doc{i}.txt", " ".join(self.SECTIONS[:4] + [f"Lampiran {i}."])) for i in range(3)]
+        
+        stats = engine.index_many(sources, max_workers=0, batch_size=2)
+        
+        texts = engine.embedding_provider.texts
+        assert len(texts) == len(set(texts)) == len(engine.vector_store.embeddings)
+        assert stats.chunks_embedded == len(texts)
+        assert len(engine.documents) == 3
+    
+    def test_failed_ingestion_registers_only_stored_documents(self, tmp_path):
+        """Test a run failing mid-way neither saves the registry nor skips unstored documents on retry."""
+        class _FailingEmbedding(_StubEmbedding):
+            def embed(self, texts):
+                if self.calls >= 1:
+                    raise RuntimeError("embedding service down")
+                return super().embed(texts)
+        
+        sources = [(f"doc{i}.txt", " ".join(f"{s} Dokumen {i}." for s in self.SECTIONS)) for i in range(3)]
+        clean = self._engine()
+        clean.index_many(sources, max_workers=0, batch_size=4)
+        
+        engine = self._engine(persist_directory=str(tmp_path))
+        engine.embedding_provider = _FailingEmbedding()
+        with pytest.raises(RuntimeError):
+            engine.index_many(sources, max_workers=0, batch_size=4)
+        
+        assert not (tmp_path / "documents.json").exists()
+        for record in engine.documents:
+            assert set(record.chunk_ids) <= set(engine.vector_store.embeddings)
+        
+        engine.embedding_provider = _StubEmbedding()
+        stats = engine.index_many(sources, max_workers=0, batch_size=4)
+        
+        assert stats.documents_unchanged < 3
+        assert set(engine.vector_store.chunks) == set(clean.vector_store.chunks)
+    
+    def test_registry_persists_with_index(self, tmp_path):
+        """Test a restarted persistent engine recognises unchanged documents."""
+        engine = self._engine(persist_directory=str(tmp_path))
+        engine.index_document(" ".join(self.SECTIONS), "pojk.txt")
+        
+        reopened = self._engine(persist_directory=str(tmp_path))
+        reopened.index_document(" ".join(self.SECTIONS), "pojk.txt")
+        
+        assert reopened.embedding_provider.calls == 0
+        assert reopened.get_stats()["total_documents"] == 1
+    
+    def test_near_duplicate_chunks_are_aliased(self):
+        """Test a near-identical chunk from another document is aliased, not embedded."""
+        sop_2023 = " ".join(self.SECTIONS[:2])
+        sop_2024 = sop_2023.replace("Kontrol akses", "KONTROL AKSES").replace(" bulan.", " bulan!")
+        
+        default = self._engine()
+        default.index_document(sop_2023, "sop_2023.txt")
+        assert default.index_document(sop_2024, "sop_2024.txt").aliases == {}
+        
+        engine = self._engine(dedup_threshold=0.9)
+        first = engine.index_document(sop_2023, "sop_2023.txt")
+        engine.embedding_provider.texts.clear()
+        second = engine.index_document(sop_2024, "sop_2024.txt")
+        
+        assert engine.embedding_provider.texts == []
+        assert set(second.aliases.values()) <= {c.id for c in first.chunks}
+        assert engine.get_stats()["near_duplicate_chunks"] == len(second.aliases) > 0
+        assert len(engine.query("kontrol akses", top_k=10)) == len(engine.vector_store.chunks)
+        
+        engine.remove_document(first.id)
+        assert set(second.aliases.values()) <= set(engine.vector_store.chunks)
+    
+    def test_new_version_not_aliased_to_replaced_chunks(self):
+        """Test an edited version of the same document stores its own text."""
+        engine = self._engine(dedup_threshold=0.9)
+        text = " ".join(self.SECTIONS[:2])
+        engine.index_document(text, "sop.txt")
+        
+        updated = engine.index_document(text.replace(" bulan.", " bulan!"), "sop.txt")
+        
+        assert updated.aliases == {}
+        assert {c.content for c in engine.vector_store.chunks.values()} == {c.content for c in updated.chunks}
+
+
+class TestFacetFilters:
+    """Test metadata-filtered retrieval."""
+    
+    def _engine(self):
+        from infrastructure.rag import RAGEngine
+        
+        engine = RAGEngine(chunk_size=200)
+        engine.embedding_provider = _StubEmbedding()
+        engine.index_document(
+            "Bank wajib melaksanakan program APU dan PPT sesuai POJK No. 12/POJK.01/2017. "
+            "Prosedur CDD dan KYC dilakukan untuk setiap nasabah yang baru.",
+            "aml.txt"
+        )
+        for i in range(5):
+            engine.index_document(
+                f"Credit risk review {i} covers loan approval and collateral for the credit portfolio.",
+                f"credit_{i}.txt"
+            )
+        return engine
+    
+    def test_filter_restricts_all_search_modes(self):
+        """Test search, keyword_search and hybrid_search honour the filter."""
+        engine = self._engine()
+        store = engine.vector_store
+        query = "credit risk nasabah"
+        embedding = engine.embedding_provider.embed_query(query)
+        aml = {"categories": "aml", "language": "id"}
+        
+        for results in (
+            store.search(embedding, 5, filter=aml),
+            store.keyword_search(query, 5, filter=aml),
+            store.hybrid_search(query, embedding, 5, filter=aml)
+        ):
+            assert results
+            assert {r.source_document for r in results} == {"aml.txt"}
+        
+        assert store.search(embedding, 5, filter={"filename": "missing.txt"}) == []
+        with pytest.raises(ValueError):
+            store.search(embedding, 5, filter={"unknown_field": "x"})
+    
+    def test_regulation_filter_matches_citation_variants(self):
+        """Test regulation filters match however the citation is written."""
+        engine = self._engine()
+        
+        results = engine.query("nasabah", top_k=3, filter={"regulations_mentioned": "POJK 12/2017"})
+        assert [r.source_document for r in results] == ["aml.txt"]
+        
+        variant = engine.query("nasabah", top_k=3, filter={"regulations_mentioned": ["pojk 12-2017", "PBI 1/2020"]})
+        assert [r.chunk.id for r in variant] == [r.chunk.id for r in results]
+        assert engine.query("nasabah", top_k=3, filter={"regulations_mentioned": "POJK 13/2017"}) == []
+    
+    def test_find_regulatory_references_uses_filter(self):
+        """Test regulatory lookup finds citing chunks outside the unfiltered top_k."""
+        from infrastructure.rag import AuditRAGHelper
+        
+        engine = self._engine()
+        references = AuditRAGHelper(engine).find_regulatory_references("POJK 12/2017", top_k=1)
+        
+        assert [r["source"] for r in references] == ["aml.txt"]
+
+
+class TestHybridFusion:
+    """Test fused hybrid retrieval."""
+    
+    def test_early_termination_matches_full_fusion(self):
+        """Test adaptive-depth fusion returns what fusing the full rankings returns."""
+        import random
+        from infrastructure.rag.fusion import SemanticScores, fuse_rankings
+        
+        rng = np.random.default_rng(0)
+        random.seed(0)
+        for _ in range(50):
+            n = int(rng.integers(5, 300))
+            ids = [f"c{i}" for i in range(n)]
+            semantic = SemanticScores(rng.normal(size=n).astype(np.float32), ids, {c: i for i, c in enumerate(ids)})
+            keyword = {c: float(rng.random()) for c in random.sample(ids, int(rng.integers(0, n)))}
+            for method in ("rrf", "linear"):
+                fast = fuse_rankings(semantic, keyword, 5, method=method)
+                full = fuse_rankings(semantic, keyword, 5, method=method, overfetch=10 ** 6)
+                assert [c for c, _ in fast] == [c for c, _ in full]
+    
+    def test_hybrid_prefers_chunks_ranked_by_both_signals(self):
+        """Test hybrid search ranks a chunk strong in both signals first, with scores in [0, 1]."""
+        from infrastructure.rag import DocumentChunk, NumpyVectorStore
+        
+        store = NumpyVectorStore()
+        chunks = [DocumentChunk(id=text, content=text) for text in ("kredit macet", "fraud kredit", "akses sistem")]
+        store.add(chunks, [[1.0, 0.0], [0.9, 0.1], [0.0, 1.0]])
+        
+        for fusion in ("rrf", "linear"):
+            store.fusion = fusion
+            results = store.hybrid_search("fraud", [1.0, 0.05], top_k=3)
+            assert results[0].chunk.content == "fraud kredit"
+            assert all(0 <= r.score <= 1.0 for r in results)
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
+
+
+class _LengthCrossEncoder:
+    """Fake cross-encoder preferring longer chunks, optionally slow."""
+    
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.pairs = 0
+    
+    def predict(self, pairs, batch_size=32):
+        import time
+        time.sleep(self.delay)
+        self.pairs += len(pairs)
+        return [len(content) / 10.0 for _, content in pairs]
+
+
+class TestCrossEncoderReranker:
+    """Test the optional re-ranking stage."""
+    
+    def test_rerank_reorders_and_caches_pairs(self):
+        """Test candidates are re-scored once and cut to top_k."""
+        from infrastructure.rag.rerank import CrossEncoderReranker
+        
+        model = _LengthCrossEncoder()
+        reranker = CrossEncoderReranker(model=model, batch_size=2)
+        results = [_result(f"c{i}", "x" * (i + 1), 1.0 - i / 10) for i in range(5)]
+        
+        ranked = reranker.rerank("kontrol akses", results, top_k=2)
+        assert [r.chunk.id for r in ranked] == ["c4", "c3"]
+        assert all(0.0 < r.score < 1.0 for r in ranked)
+        assert results[4].score == pytest.approx(0.6)
+        
+        reranker.rerank("Kontrol  akses", results, top_k=2)
+        assert model.pairs == 5
+    
+    def test_over_budget_keeps_retrieval_order(self):
+        """Test a query that cannot be scored in budget falls back to the retrieval ranking."""
+        from infrastructure.rag.rerank import CrossEncoderReranker
+        
+        reranker = CrossEncoderReranker(model=_LengthCrossEncoder(delay=0.02), batch_size=1, latency_budget_ms=5)
+        results = [_result(f"c{i}", "x" * (i + 1), 1.0 - i / 10) for i in range(5)]
+        
+        assert [r.chunk.id for r in reranker.rerank("fraud", results, top_k=2)] == ["c0", "c1"]
+        assert reranker.get_stats()["skipped_over_budget"] == 1
+    
+    def test_engine_query_reranks_candidates(self):
+        """Test RAGEngine.query retrieves extra candidates and returns re-ranked top_k."""
+        from infrastructure.rag.rerank import CrossEncoderReranker
+        
+        engine = TestIncrementalIndexing()._engine(dedup_threshold=None)
+        engine.index_document(" ".join(TestIncrementalIndexing.SECTIONS), "pojk.txt")
+        engine.reranker = CrossEncoderReranker(model=_LengthCrossEncoder(), candidates=10)
+        
+        results = engine.query("manajemen risiko kredit", top_k=2)
+        assert len(results) == 2
+        assert len(results[0].chunk.content) >= len(results[1].chunk.content)
+        assert engine.get_stats()["reranker"]["reranked"] == 1